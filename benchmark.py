@@ -0,0 +1,162 @@
+import numpy as np
+from src.turbomach_analyser import Engine, EngineBatch
+from src.turbomach_analyser.stage import Stage
+from src.utils import formatter as f
+import engine_design as ed
+import engine_iteration as ei
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+
+def get_sweep_grid():
+    # Fixed 3^8 grid so sweep throughput is comparable between runs
+    return {
+        'hpt_min_blade_length': np.linspace(0.019, 0.023, 3, endpoint=True),
+        'hpt_work_coefficient': np.linspace(1.76, 2, 3, endpoint=True),
+        'hpt_angular_velocity': np.linspace(600, 900, 3, endpoint=True),
+        'lpc_diffusion_factor': np.linspace(0.1, 0.2, 3, endpoint=True),
+        'hpc_diffusion_factor': np.linspace(0.1, 0.2, 3, endpoint=True),
+        'hpt_lift_coeff': np.linspace(0.7, 0.9, 3, endpoint=True),
+        'lpc_reaction_mean': np.linspace(0.3, 0.8, 3, endpoint=True),
+        'hpc_reaction_mean': np.linspace(0.35, 0.8, 3, endpoint=True),
+    }
+
+
+def build_engine():
+    return Engine(**ed.get_constants(),
+                  **ed.get_engine_constants(),
+                  **ed.get_engine_variables())
+
+
+def get_stage_kwargs(engine):
+    hpc_stage = engine.hpc.stages[0]
+    hpt_stage = engine.hpt.stages[0]
+    constants = ed.get_engine_constants()
+    compressor_kwargs = dict(is_compressor_stage=True,
+                             is_low_pressure=False,
+                             number=1,
+                             work_coeff=engine.hpc.work_coeff,
+                             axial_velocity=hpc_stage.axial_velocity,
+                             angular_velocity=hpc_stage.angular_velocity,
+                             hub_diameter=hpc_stage.hub_diameter,
+                             tip_diameter=hpc_stage.tip_diameter,
+                             reaction_mean=hpc_stage.reaction['mean'],
+                             diffusion_factor=hpc_stage.diffusion_factor['mean'])
+    hpt_kwargs = dict(is_compressor_stage=False,
+                      is_low_pressure=False,
+                      number=1,
+                      work_coeff=engine.hpt.work_coeff,
+                      axial_velocity=hpt_stage.axial_velocity,
+                      angular_velocity=hpt_stage.angular_velocity,
+                      hub_diameter=hpt_stage.hub_diameter,
+                      tip_diameter=hpt_stage.tip_diameter,
+                      reaction_mean=hpt_stage.reaction['mean'],
+                      cooling=engine.hpt.cooling,
+                      stag_temp=hpt_stage.stag_temp,
+                      lift_coeff=hpt_stage.lift_coeff['mean'],
+                      disk_depth=constants['hpt_disk_depth'],
+                      blade_density=constants['hpt_blade_density'],
+                      poissons_ratio=constants['hpt_poissons_ratio'],
+                      yield_strength_dict=constants['hpt_yield_strength_dict'],
+                      SPEC_HEAT_RATIO=ed.get_constants()['SPEC_HEAT_RATIO'],
+                      GAS_CONST=ed.get_constants()['GAS_CONST'])
+    return compressor_kwargs, hpt_kwargs
+
+
+def sweep_scalar(var_dicts):
+    for var_dict in var_dicts:
+        try:
+            engine = Engine(**ei.get_constants(),
+                            **ei.get_engine_constants(),
+                            **var_dict,
+                            fail_fast=True)
+            # Only valid engines are scored, as in the sweep
+            if engine.is_valid:
+                engine.score
+        except ValueError:
+            pass
+
+
+def score_engine(engine):
+    # The score is cached on the engine, so clear it to time the lazy computation
+    engine.__dict__.pop('score', None)
+    return engine.score
+
+
+def sweep_batch(var_dicts):
+    EngineBatch(**ei.get_constants(),
+                **ei.get_engine_constants(),
+                **{k: np.array([d[k] for d in var_dicts]) for k in var_dicts[0]})
+
+
+def get_benchmarks(output_dir):
+    """
+    Returns the benchmarks as {name: (function, number of points per call)}.
+    """
+    engine = build_engine()
+    compressor_kwargs, hpt_kwargs = get_stage_kwargs(engine)
+    var_dicts = list(ei.generate_possible_var_dicts(get_sweep_grid()))
+    return {
+        'engine_construction': (build_engine, 1),
+        'compressor_stage_construction': (lambda: Stage(**compressor_kwargs), 1),
+        'hpt_stage_construction': (lambda: Stage(**hpt_kwargs), 1),
+        'engine_score': (lambda: score_engine(engine), 1),
+        'save_obj_to_file': (lambda: f.save_obj_to_file(engine, f'{output_dir}/engine.json'), 1),
+        'sweep_scalar': (lambda: sweep_scalar(var_dicts), len(var_dicts)),
+        'sweep_batch': (lambda: sweep_batch(var_dicts), len(var_dicts)),
+    }
+
+
+def run_benchmarks(repeat=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, (function, no_of_points) in get_benchmarks(output_dir).items():
+            timer = timeit.Timer(function)
+            # Enough calls per repeat to take at least 0.2 s
+            number, _ = timer.autorange()
+            # The fastest repeat is the least disturbed by other processes
+            seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+            results[name] = {'seconds': seconds,
+                             'points_per_second': no_of_points / seconds}
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=0.2):
+    """
+    Returns the benchmarks that are more than threshold slower than the baseline.
+    """
+    return {name: result['seconds'] / baseline[name]['seconds'] - 1
+            for name, result in results.items()
+            if name in baseline and result['seconds'] > (1 + threshold) * baseline[name]['seconds']}
+
+
+def main(baseline_path, threshold=0.2, update_baseline=False):
+    results = run_benchmarks()
+    baseline = None
+    if os.path.isfile(baseline_path):
+        with open(baseline_path, 'r') as file:
+            baseline = json.load(file)
+    for name, result in results.items():
+        change = '' if not baseline or name not in baseline else \
+            f' ({result["seconds"] / baseline[name]["seconds"] - 1:+.1%})'
+        print(f'{name:32}{result["seconds"] * 1e3:12.4f} ms'
+              f'{result["points_per_second"]:14.1f} points/s{change}')
+    regressions = compare_to_baseline(results, baseline or {}, threshold)
+    for name, slowdown in regressions.items():
+        print(f'REGRESSION: {name} is {slowdown:.1%} slower than the baseline')
+    if baseline is None or update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as file:
+            json.dump(results, file, indent=4)
+        print(f'Saved baseline to {baseline_path}')
+    return regressions
+
+
+if __name__ == '__main__':
+    baseline_path = './data/Benchmarks/baseline.json'
+
+    regressions = main(baseline_path, threshold=0.2)
+    sys.exit(1 if regressions else 0)
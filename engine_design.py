@@ -1,6 +1,21 @@
 import numpy as np
 from src.turbomach_analyser import Engine
-from src.utils import plots, formatter as f
+from src.utils import (plots,
+                       formatter as f,
+                       result_store as rs)
+from src.utils.engine_archive import EngineArchive
+from src.utils.results_catalog import ResultsCatalog
+from src.utils.materials import MaterialTable
+from tqdm import tqdm
+
+# Sorted once rather than for every engine designed with these constants
+HPT_YIELD_STRENGTH = MaterialTable({20: 1100e6,
+                                    540: 982e6,
+                                    600: 960e6,
+                                    650: 894e6,
+                                    700: 760e6,
+                                    760: 555e6,
+                                    820: 408e6})
 
 
 def get_constants():
@@ -45,13 +60,7 @@ def get_engine_constants():
         'hpt_disk_depth': 0.15,
         'hpt_blade_density': 8193.25,
         'hpt_poissons_ratio': 0.27,
-        'hpt_yield_strength_dict': {20: 1100e6,
-                                    540: 982e6,
-                                    600: 960e6,
-                                    650: 894e6,
-                                    700: 760e6,
-                                    760: 555e6,
-                                    820: 408e6},
+        'hpt_yield_strength_dict': HPT_YIELD_STRENGTH,
         'lpt_lift_coeff': 0.85,
     }
 
@@ -70,18 +79,59 @@ def get_engine_variables():
 
 
 def get_engine_vars_from_file(valid_variables_path):
-    valid_variables_list = f.read_hashed_file_to_dict_list(
-        valid_variables_path, sort_key='engine_score', reverse=True)
-    # Get the engine variables with the highest score
-    valid_variables_list[0].pop('engine_score', None)
-    return valid_variables_list[0]
+    # Get the engine variables with the highest score in one pass over the file
+    _, best_vars = f.summarise_vars_file(valid_variables_path).top[0]
+    best_vars.pop(rs.SCORE_KEY)
+    return best_vars
+
 
+def get_engine_vars_from_catalog(valid_variables_path, catalog_path, **variable_ranges):
+    """
+    Returns the highest scoring engine variables of a valid result store within
+    variable_ranges (key=(low, high), None for an open end), queried from the results
+    catalog at catalog_path. The store is ingested into the catalog if it has changed.
+    """
+    with ResultsCatalog(catalog_path) as catalog:
+        table = catalog.ingest(valid_variables_path)
+        best = catalog.top(table, **variable_ranges)
+    if not best:
+        raise ValueError(
+            f'No valid engine variables within {variable_ranges}.')
+    best[0].pop(rs.SCORE_KEY)
+    return best[0]
 
-def main(engine_data_dir_path, engine_variables_path=None):
+
+def archive_valid_engines(valid_variables_path, archive_path):
+    """
+    Designs every engine in a valid result store and adds it to the engine archive at
+    archive_path, named by its variable values, with its score and variables in the
+    archive index.
+    """
+    _, valid_columns = rs.load_results(valid_variables_path)
+    scores = valid_columns.pop(rs.SCORE_KEY)
+    with EngineArchive(archive_path, mode='a') as archive:
+        for i in tqdm(range(len(scores)), desc='Archiving', unit='engine'):
+            engine_variables = {k: float(v[i]) for k, v in valid_columns.items()}
+            name = f.hash_dict_vals(engine_variables)
+            if name in archive:
+                continue
+            engine = Engine(**get_constants(), **get_engine_constants(),
+                            **engine_variables)
+            archive.add(name, engine,
+                        engine_score=float(scores[i]), **engine_variables)
+        return len(archive)
+
+
+def main(engine_data_dir_path, engine_variables_path=None, catalog_path=None, **variable_ranges):
     engine_name = 'TEST_ENGINE' if not engine_variables_path else engine_variables_path.split(
         '/')[-1].split('.')[0]
-    engine_variables = get_engine_vars_from_file(
-        engine_variables_path) if engine_variables_path else get_engine_variables()
+    if not engine_variables_path:
+        engine_variables = get_engine_variables()
+    elif catalog_path or variable_ranges:
+        engine_variables = get_engine_vars_from_catalog(
+            engine_variables_path, catalog_path or ':memory:', **variable_ranges)
+    else:
+        engine_variables = get_engine_vars_from_file(engine_variables_path)
     engine = Engine(**get_constants(), **get_engine_constants(),
                     **engine_variables)
     components = [engine.fan, engine.lpc, engine.hpc, engine.hpt, engine.lpt]
@@ -97,8 +147,13 @@ if __name__ == '__main__':
     engine_data_dir_path = f'./data/EngineData'
 
     # Run optimal engine design:
-    engine_variables_path = f'./data/VariablesData/Valid/hdf_hrm_hav_hlc_hmbl_hwc_ldf_lrm.csv'
+    engine_variables_path = f'./data/VariablesData/Valid/hdf_hrm_hav_hlc_hmbl_hwc_ldf_lrm.results'
     main(engine_data_dir_path, engine_variables_path)
 
+    # # Run the best engine design with a slow HPT, queried from a results catalog:
+    # main(engine_data_dir_path, engine_variables_path,
+    #      catalog_path='./data/VariablesData/results.sqlite',
+    #      hpt_angular_velocity=(None, 800))
+
     # # Run test engine design:
     # main(engine_data_dir_path)
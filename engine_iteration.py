@@ -1,10 +1,40 @@
 import numpy as np
-from src.turbomach_analyser import Engine
-from src.utils import formatter as f
+import flight_phases_analysis
+from src.turbomach_analyser import Engine, EngineBatch, ComponentCache
+from src.utils import (dual,
+                       formatter as f,
+                       instrumentation as instr,
+                       result_store as rs)
+from src.utils.journal import SweepJournal
+from src.utils.materials import MaterialTable
+from src.utils.refinement import AdaptiveRefinement
+from src.utils.rejections import RejectionStats
+from src.utils.sensitivity import (SobolAnalysis,
+                                   summarise_indices)
+from src.utils.optimiser import DifferentialEvolution
+from src.utils.surrogate import (KNNClassifier,
+                                 FeasibilityPrefilter)
 import itertools
+import os
 import time
+from concurrent.futures import (ProcessPoolExecutor,
+                                FIRST_COMPLETED,
+                                wait)
+from contextlib import nullcontext
 from tqdm import tqdm
 
+# Components shared by many grid points are only built once per process
+component_cache = ComponentCache(maxsize=4096)
+# Sorted once for the whole sweep; HPT stages outside the table are rejected, not raised
+HPT_YIELD_STRENGTH = MaterialTable({20: 1100e6,
+                                    540: 982e6,
+                                    600: 960e6,
+                                    650: 894e6,
+                                    700: 760e6,
+                                    760: 555e6,
+                                    820: 408e6},
+                                   out_of_range='reject')
+
 
 def get_constants():
     return {
@@ -48,13 +78,7 @@ def get_engine_constants():
         'hpt_disk_depth': 0.15,
         'hpt_blade_density': 8193.25,
         'hpt_poissons_ratio': 0.27,
-        'hpt_yield_strength_dict': {20: 1100e6,
-                                    540: 982e6,
-                                    600: 960e6,
-                                    650: 894e6,
-                                    700: 760e6,
-                                    760: 555e6,
-                                    820: 408e6},
+        'hpt_yield_strength_dict': HPT_YIELD_STRENGTH,
         'lpt_lift_coeff': 0.85,
     }
 
@@ -73,28 +97,17 @@ def __get_variable_ranges():
 
 
 def __get_variable_ranges_from_file(valid_variables_path, per_var_iterations):
-    valid_variables_list = f.read_hashed_file_to_dict_list(
-        valid_variables_path)
-    # Remove the engine score from all dictionaries
-    [valid_variables.pop('engine_score', None)
-     for valid_variables in valid_variables_list]
+    # One pass over the file for the minimum and maximum of each variable
+    summary = f.summarise_vars_file(valid_variables_path, top_k=0)
     result = {}
-    # Find the minimum and maximum values for each key
-    for d in valid_variables_list:
-        for key, value in d.items():
-            if key not in result:
-                result[key] = {"min": value, "max": value}
-            else:
-                if value < result[key]["min"]:
-                    result[key]["min"] = value
-                if value > result[key]["max"]:
-                    result[key]["max"] = value
-
-    # Create the final dictionary with np.linspace for each key
-    for key, value in result.items():
+    # Create a np.linspace between the minimum and maximum values of each key
+    for key in summary.mins:
+        # Skip the engine score
+        if key == rs.SCORE_KEY:
+            continue
         result[key] = np.linspace(
-            value["min"],
-            value["max"],
+            summary.mins[key],
+            summary.maxs[key],
             per_var_iterations,
             endpoint=True)
         # Convert to set and back to list to remove duplicates
@@ -109,105 +122,492 @@ def generate_possible_var_dicts(var_ranges_dict):
             for p in itertools.product(*var_ranges_dict.values()))
 
 
+def __get_component_var_keys(var_ranges_dict):
+    component_var_keys = {name: [k for k in var_ranges_dict if k.startswith(f'{name}_')]
+                          for name in ['hpt', 'lpc', 'hpc']}
+    # The hpc runs on the hpt shaft
+    if 'hpt_angular_velocity' in var_ranges_dict:
+        component_var_keys['hpc'].append('hpt_angular_velocity')
+    uncovered_keys = set(var_ranges_dict) - \
+        set().union(*component_var_keys.values())
+    if uncovered_keys:
+        raise ValueError(
+            f'Variables {sorted(uncovered_keys)} do not belong to a single component.')
+    return {name: keys for name, keys in component_var_keys.items() if keys}
+
+
+def __check_component(name, var_dict):
+    try:
+        _, rejection = Engine.check_components([name],
+                                               **get_constants(),
+                                               **get_engine_constants(),
+                                               **var_dict,
+                                               fail_fast=True,
+                                               component_cache=component_cache)
+        return rejection
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+
+def generate_factorized_var_dicts(var_ranges_dict):
+    """
+    Evaluates the sub-grid of each component on its own and returns the var dicts of
+    the whole grid, how many there are, and a function returning the rejection of the
+    first invalid component of a var dict (None if every component is valid). Only
+    the var dicts without a component rejection need to be built as full engines.
+    """
+    component_rejections = []
+    for name, keys in __get_component_var_keys(var_ranges_dict).items():
+        sub_ranges = {k: var_ranges_dict[k] for k in keys}
+        no_sub_iterations = get_no_iterations(sub_ranges)
+        rejections = {tuple(var_dict.values()): __check_component(name, var_dict)
+                      for var_dict in tqdm(generate_possible_var_dicts(sub_ranges),
+                                           total=no_sub_iterations,
+                                           desc=f'{name.upper()} grid',
+                                           unit='var_dict')}
+        no_valid = sum(rejection is None for rejection in rejections.values())
+        print(f'{no_valid} of {no_sub_iterations} {name.upper()} configurations are valid')
+        component_rejections.append((keys, rejections))
+
+    def get_component_rejection(var_dict):
+        # Components are checked in the order the Engine builds them
+        for keys, rejections in component_rejections:
+            rejection = rejections[tuple(var_dict[k] for k in keys)]
+            if rejection is not None:
+                return rejection
+        return None
+
+    return generate_possible_var_dicts(var_ranges_dict), get_no_iterations(var_ranges_dict), get_component_rejection
+
+
 def get_no_iterations(var_ranges_dict):
     return np.prod([len(x) for x in var_ranges_dict.values()])
 
 
+def read_vars_file(vars_path):
+    if rs.is_result_store(vars_path):
+        return rs.results_to_hashed_vals(vars_path)
+    # Fall back to the csv files written before the result stores
+    return f.read_vars_file(f'{os.path.splitext(vars_path)[0]}.csv')
+
+
 def read_vars_files(tried_vars_path, valid_vars_path):
-    tried_var_key_hash, tried_var_vals_hash_set = f.read_vars_file(
+    tried_var_key_hash, tried_var_vals_hash_set = read_vars_file(
         tried_vars_path)
-    valid_var_key_hash, valid_var_vals_hash_set = f.read_vars_file(
+    valid_var_key_hash, valid_var_vals_hash_set = read_vars_file(
         valid_vars_path)
     return tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set
 
 
+def __evaluate_var_dict(var_dict):
+    try:
+        engine = Engine(**get_constants(),
+                        **get_engine_constants(),
+                        **var_dict,
+                        fail_fast=True,
+                        component_cache=component_cache)
+        # Only valid engines are scored
+        return (True, engine.score, None) if engine.is_valid else (False, None, engine.rejection)
+    except Exception as e:
+        return False, None, f'{type(e).__name__}: {e}'
+
+
+def __evaluate_var_dicts_batch(var_dicts):
+    var_cols = {k: np.array([d[k] for d in var_dicts]) for k in var_dicts[0]}
+    engines = EngineBatch(**get_constants(),
+                          **get_engine_constants(),
+                          **var_cols)
+    return zip(engines.is_valid, engines.score, engines.rejection)
+
+
+def __evaluate_chunk(chunk, batch_size=None):
+    var_dicts = [var_dict for _, var_dict in chunk]
+    if batch_size is None:
+        results = map(__evaluate_var_dict, var_dicts)
+    else:
+        results = itertools.chain.from_iterable(
+            __evaluate_var_dicts_batch(var_dicts[i:i + batch_size])
+            for i in range(0, len(var_dicts), batch_size))
+    return [(var_val_hash, bool(is_valid), score if is_valid else None, rejection)
+            for (var_val_hash, _), (is_valid, score, rejection) in zip(chunk, results)]
+
+
+def __evaluate_samples_batch(keys, samples):
+    # Variables override the engine constants, so constants can be analysed too
+    engines = EngineBatch(**get_constants(),
+                          **{**get_engine_constants(), **dict(zip(keys, samples.T))})
+    return engines.is_valid, engines.score
+
+
 def __run_iteration(no_iterations: int,
                     all_possible_vars_dicts,
                     tried_var_vals_hash_set: set,
                     valid_var_vals_hash_set: set,
                     tried_var_key_hash: str,
                     valid_var_key_hash: str,
-                    var_key_hash: str):
+                    var_key_hash: str,
+                    batch_size: int = None,
+                    workers: int = None,
+                    chunk_size: int = None,
+                    journal: SweepJournal = None,
+                    prefilter: FeasibilityPrefilter = None,
+                    rejections: RejectionStats = None,
+                    get_component_rejection=None):
+    parallel = workers is not None and workers > 1
+    if chunk_size is None:
+        chunk_size = batch_size or (
+            256 if parallel or prefilter is not None else 1)
     with tqdm(total=no_iterations,
               desc='Processing',
-              unit='var_dict',) as pbar:
-        with tqdm(total=no_iterations,
-                  desc='Accepted  ',
-                  unit='var_dict',
-                  position=1,
-                  colour='CYAN') as valid_pbar:
-            valid_pbar.update(len(valid_var_vals_hash_set))
-            for var_dict in all_possible_vars_dicts:
-                var_val_hash = f.hash_dict_vals(var_dict)
-                if var_val_hash not in tried_var_vals_hash_set or var_key_hash != tried_var_key_hash:
-                    tried_var_vals_hash_set.add(var_val_hash)
-                    try:
-                        engine = Engine(**get_constants(),
-                                        **get_engine_constants(),
-                                        **var_dict)
-                        if engine.is_valid:
-                            valid_var_vals_hash_set.add(
-                                var_val_hash + f',{engine.score}')
-                            valid_pbar.update(1)
-                    except:
-                        pass
+              unit='var_dict',) as pbar, \
+            tqdm(total=no_iterations,
+                 desc='Accepted  ',
+                 unit='var_dict',
+                 position=1,
+                 colour='CYAN') as valid_pbar, \
+            (ProcessPoolExecutor(max_workers=workers) if parallel else nullcontext()) as executor:
+        valid_pbar.update(len(valid_var_vals_hash_set))
+        futures = {}
+
+        def merge(results, chunk):
+            for (var_val_hash, is_valid, score, rejection), (_, var_dict) in zip(results, chunk):
+                if rejections is not None:
+                    rejections.record(var_dict, rejection)
+                if is_valid:
+                    valid_var_vals_hash_set.add(var_val_hash + f',{score}')
+                    valid_pbar.update(1)
+                if journal is not None:
+                    journal.append(var_val_hash, is_valid, score)
+                if prefilter is not None:
+                    prefilter.record(var_val_hash, is_valid)
+            pbar.update(len(results))
+            if journal is not None and journal.is_due_for_compaction():
+                # Points still being evaluated must stay untried in the snapshot
+                in_flight = {var_val_hash for chunk in futures.values()
+                             for var_val_hash, _ in chunk}
+                journal.compact(tried_var_vals_hash_set - in_flight,
+                                valid_var_vals_hash_set)
+
+        def collect(max_in_flight):
+            while len(futures) > max_in_flight:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(future.result(), futures.pop(future))
+
+        def evaluate_pending(pending):
+            if prefilter is not None:
+                evaluated = prefilter.filter(pending)
+                # Skipped points stay untried so a later run can still evaluate them
+                tried_var_vals_hash_set.difference_update(
+                    {var_val_hash for var_val_hash, _ in pending} - {var_val_hash for var_val_hash, _ in evaluated})
+                pbar.update(len(pending) - len(evaluated))
+                pending = evaluated
+                if not pending:
+                    return
+            if parallel:
+                futures[executor.submit(
+                    __evaluate_chunk, pending, batch_size)] = pending
+                # Bound the chunks in flight so the grid is never fully materialised
+                collect(2 * workers)
+            else:
+                merge(__evaluate_chunk(pending, batch_size), pending)
+
+        pending = []
+        for var_dict in all_possible_vars_dicts:
+            var_val_hash = f.hash_dict_vals(var_dict)
+            if var_val_hash not in tried_var_vals_hash_set or var_key_hash != tried_var_key_hash:
+                tried_var_vals_hash_set.add(var_val_hash)
+                rejection = get_component_rejection(var_dict) if get_component_rejection is not None else None
+                if rejection is not None:
+                    # Points with an invalid component are tried without building the engine
+                    merge([(var_val_hash, False, None, rejection)], [(var_val_hash, var_dict)])
+                    continue
+                pending.append((var_val_hash, var_dict))
+                if len(pending) >= chunk_size:
+                    evaluate_pending(pending)
+                    pending = []
+            else:
                 pbar.update(1)
+        if pending:
+            evaluate_pending(pending)
+        collect(0)
     if var_key_hash != tried_var_key_hash:
         tried_var_key_hash = var_key_hash
         valid_var_key_hash = var_key_hash + ',engine_score'
     return tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set
 
 
-def complete_run(tried_vars_dir: str, valid_vars_dir: str, var_ranges_dict, per_var_iterations=None):
+def __open_run(tried_vars_dir: str, valid_vars_dir: str, var_ranges_dict, flush_every, compact_every):
     var_key_hash = f.hash_dict_keys(var_ranges_dict)
     var_key_hash_compact = f.compact_hash_dict_keys(var_ranges_dict)
-    tried_vars_path = f'{tried_vars_dir}/{var_key_hash_compact}.csv'
-    valid_vars_path = f'{valid_vars_dir}/{var_key_hash_compact}.csv'
+    tried_vars_path = f'{tried_vars_dir}/{var_key_hash_compact}.results'
+    valid_vars_path = f'{valid_vars_dir}/{var_key_hash_compact}.results'
+    journal = SweepJournal(f'{tried_vars_dir}/{var_key_hash_compact}.journal',
+                           var_key_hash,
+                           tried_vars_path,
+                           valid_vars_path,
+                           flush_every=flush_every,
+                           compact_every=compact_every)
+
+    tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set = read_vars_files(
+        tried_vars_path, valid_vars_path)
+    # Resume from the points journalled by an interrupted run
+    journal_tried_var_vals_hash_set, journal_valid_var_vals_hash_set = journal.replay()
+    if journal.no_of_records:
+        print(f'Resuming from {journal.no_of_records} journalled iterations')
+        tried_var_vals_hash_set |= journal_tried_var_vals_hash_set
+        valid_var_vals_hash_set |= journal_valid_var_vals_hash_set
+        tried_var_key_hash = var_key_hash
+        valid_var_key_hash = var_key_hash + ',engine_score'
+        journal.compact(tried_var_vals_hash_set, valid_var_vals_hash_set)
+    elif tried_var_key_hash == var_key_hash and not rs.is_result_store(tried_vars_path):
+        # Migrate the csv files of earlier runs to result stores
+        journal.compact(tried_var_vals_hash_set, valid_var_vals_hash_set)
+    return journal, tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set
+
+
+def __get_prefilter(tried_vars_path, var_ranges_dict, threshold, exploration, seed=None):
+    if not rs.is_result_store(tried_vars_path):
+        print('No tried results to train the prefilter on, evaluating every point')
+        return None
+    _, tried_columns = rs.load_results(tried_vars_path)
+    model = KNNClassifier(seed=seed).fit(np.column_stack([tried_columns[k] for k in var_ranges_dict]),
+                                         tried_columns[rs.VALIDITY_KEY])
+    return FeasibilityPrefilter(model, var_ranges_dict, threshold, exploration, seed)
 
+
+def complete_run(tried_vars_dir: str, valid_vars_dir: str, var_ranges_dict, per_var_iterations=None, batch_size=None, workers=None, chunk_size=None, flush_every=1000, compact_every=100000, factorized=False, prefilter_threshold=None, exploration=0.05, instrument=False):
+    var_key_hash = f.hash_dict_keys(var_ranges_dict)
+    journal, tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set = __open_run(
+        tried_vars_dir, valid_vars_dir, var_ranges_dict, flush_every, compact_every)
     if per_var_iterations is not None:
         var_ranges_dict = __get_variable_ranges_from_file(
-            valid_vars_path, per_var_iterations)
+            journal.valid_vars_path, per_var_iterations)
+
+    get_component_rejection = None
+    if factorized:
+        all_possible_vars_dicts, no_iterations, get_component_rejection = generate_factorized_var_dicts(
+            var_ranges_dict)
+    else:
+        all_possible_vars_dicts = generate_possible_var_dicts(var_ranges_dict)
+        no_iterations = get_no_iterations(var_ranges_dict)
+
+    prefilter = None
+    if prefilter_threshold is not None and tried_var_key_hash == var_key_hash:
+        prefilter = __get_prefilter(
+            journal.tried_vars_path, var_ranges_dict, prefilter_threshold, exploration)
+
+    rejections = RejectionStats()
+    # Timings are recorded per process, so they only cover the serial scalar sweep
+    try:
+        with instr.recording() if instrument else nullcontext():
+            tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set = __run_iteration(
+                no_iterations, all_possible_vars_dicts, tried_var_vals_hash_set, valid_var_vals_hash_set, tried_var_key_hash, valid_var_key_hash, var_key_hash, batch_size, workers, chunk_size, journal, prefilter, rejections, get_component_rejection)
+    finally:
+        journal.close()
+    if instrument:
+        print(instr.summary())
+    if rejections.no_evaluated:
+        print(rejections.summary())
+        rejections.save(
+            f'{os.path.splitext(journal.tried_vars_path)[0]}.rejections.json')
+    if prefilter is not None:
+        print(prefilter.summary())
+    if batch_size is None and (workers is None or workers <= 1):
+        print(f'Component cache: {component_cache.cache_info()}')
+
+    journal.compact(tried_var_vals_hash_set, valid_var_vals_hash_set)
 
-    all_possible_vars_dicts = generate_possible_var_dicts(var_ranges_dict)
-    tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set = read_vars_files(
-        tried_vars_path, valid_vars_path)
-    no_iterations = get_no_iterations(var_ranges_dict)
+    return len(valid_var_vals_hash_set)
 
-    tried_var_key_hash, tried_var_vals_hash_set, valid_var_key_hash, valid_var_vals_hash_set = __run_iteration(
-        no_iterations, all_possible_vars_dicts, tried_var_vals_hash_set, valid_var_vals_hash_set, tried_var_key_hash, valid_var_key_hash, var_key_hash)
 
-    f.hashed_vals_to_csv(tried_var_key_hash,
-                         tried_var_vals_hash_set,
-                         tried_vars_path)
-    f.hashed_vals_to_csv(valid_var_key_hash,
-                         valid_var_vals_hash_set,
-                         valid_vars_path)
+def adaptive_run(tried_vars_dir: str, valid_vars_dir: str, var_ranges_dict, budget: int, batch_size=None, round_size=256, max_depth=32, flush_every=1000, compact_every=100000):
+    """
+    Refines the valid region found by an earlier run of the same variables, spending
+    at most budget engine evaluations. Points are recorded in the same tried and
+    valid result stores as complete_run.
+    """
+    var_key_hash = f.hash_dict_keys(var_ranges_dict)
+    journal, tried_var_key_hash, tried_var_vals_hash_set, _, valid_var_vals_hash_set = __open_run(
+        tried_vars_dir, valid_vars_dir, var_ranges_dict, flush_every, compact_every)
+    if tried_var_key_hash != var_key_hash:
+        raise ValueError(
+            'Adaptive refinement needs the results of an earlier run of the same variables.')
+    _, valid_columns = rs.load_results(journal.valid_vars_path)
+    refinement = AdaptiveRefinement(var_ranges_dict,
+                                    np.column_stack(
+                                        [valid_columns[k] for k in var_ranges_dict]),
+                                    max_depth=max_depth)
+    valid_var_vals_hashes = {var_vals_hash.rsplit(',', 1)[0]
+                             for var_vals_hash in valid_var_vals_hash_set}
+    no_evaluations = 0
+    try:
+        with tqdm(total=budget, desc='Refining', unit='var_dict') as pbar:
+            while len(refinement) and no_evaluations < budget:
+                # At most one evaluation per cell, so a round never overshoots the budget
+                var_dicts = refinement.ask(min(round_size, budget - no_evaluations))
+                var_vals_hashes = [f.hash_dict_vals(var_dict)
+                                   for var_dict in var_dicts]
+                pending = []
+                for var_val_hash, var_dict in zip(var_vals_hashes, var_dicts):
+                    if var_val_hash not in tried_var_vals_hash_set:
+                        tried_var_vals_hash_set.add(var_val_hash)
+                        pending.append((var_val_hash, var_dict))
+                for var_val_hash, is_valid, score, _ in __evaluate_chunk(pending, batch_size):
+                    if is_valid:
+                        valid_var_vals_hash_set.add(var_val_hash + f',{score}')
+                        valid_var_vals_hashes.add(var_val_hash)
+                    journal.append(var_val_hash, is_valid, score)
+                refinement.tell([var_val_hash in valid_var_vals_hashes
+                                 for var_val_hash in var_vals_hashes])
+                no_evaluations += len(pending)
+                pbar.update(len(pending))
+                if journal.is_due_for_compaction():
+                    journal.compact(tried_var_vals_hash_set,
+                                    valid_var_vals_hash_set)
+    finally:
+        journal.close()
+
+    journal.compact(tried_var_vals_hash_set, valid_var_vals_hash_set)
 
     return len(valid_var_vals_hash_set)
 
 
-def first_run(tried_vars_dir: str, valid_vars_dir: str):
+def optimise_run(tried_vars_dir: str, valid_vars_dir: str, var_ranges_dict, budget: int, seed=None, population_size=64, flush_every=1000, compact_every=100000):
+    """
+    Maximises the engine score over the box spanned by var_ranges_dict with
+    differential evolution, treating is_valid as a constraint. Each generation is
+    evaluated as one EngineBatch and recorded in the tried and valid result stores.
+    Returns the best var dict, its score and whether it is valid.
+    """
+    keys = list(var_ranges_dict)
+    journal, _, tried_var_vals_hash_set, _, valid_var_vals_hash_set = __open_run(
+        tried_vars_dir, valid_vars_dir, var_ranges_dict, flush_every, compact_every)
+    optimiser = DifferentialEvolution([np.min(var_ranges_dict[k]) for k in keys],
+                                      [np.max(var_ranges_dict[k]) for k in keys],
+                                      population_size=population_size,
+                                      seed=seed)
+    no_evaluations = 0
+    try:
+        with tqdm(total=budget, desc='Optimising', unit='var_dict') as pbar:
+            while no_evaluations + population_size <= budget:
+                trials = optimiser.ask()
+                engines = EngineBatch(**get_constants(),
+                                      **get_engine_constants(),
+                                      **dict(zip(keys, trials.T)))
+                optimiser.tell(engines.score, engines.is_valid)
+                for trial, is_valid, score in zip(trials, engines.is_valid, engines.score):
+                    var_val_hash = f.hash_dict_vals(dict(zip(keys, trial)))
+                    if var_val_hash in tried_var_vals_hash_set:
+                        continue
+                    tried_var_vals_hash_set.add(var_val_hash)
+                    if is_valid:
+                        valid_var_vals_hash_set.add(var_val_hash + f',{score}')
+                    journal.append(var_val_hash, is_valid,
+                                   score if is_valid else None)
+                no_evaluations += population_size
+                pbar.update(population_size)
+                pbar.set_postfix(best_score=optimiser.best[1])
+                if journal.is_due_for_compaction():
+                    journal.compact(tried_var_vals_hash_set,
+                                    valid_var_vals_hash_set)
+    finally:
+        journal.close()
+
+    journal.compact(tried_var_vals_hash_set, valid_var_vals_hash_set)
+
+    best_vars, best_score, best_is_valid = optimiser.best
+    return dict(zip(keys, best_vars)), best_score, best_is_valid
+
+
+def get_engine_gradients(var_dict):
+    """
+    Designs the engine of var_dict once with dual numbers and returns its score, its
+    constraint margins and the gradients of both with respect to the variables, as
+    (score, {key: derivative}, margins, {code: {key: derivative}}).
+    """
+    keys = list(var_dict)
+    engine = Engine(**get_constants(),
+                    **get_engine_constants(),
+                    **dual.variables(var_dict))
+    margins = engine.get_constraint_margins()
+    return (float(engine.score),
+            dual.get_gradient_dict(engine.score, keys),
+            {code: float(margin) for code, margin in margins.items()},
+            {code: dual.get_gradient_dict(margin, keys) for code, margin in margins.items()})
+
+
+def evaluate_phases(var_dicts, max_tip_mach_no, min_safety_factor=1, flight_analysis=None):
+    """
+    Evaluates the engines of var_dicts as one EngineBatch at every flight phase (the
+    phases of flight_phases_analysis by default) and returns their PhaseEvaluation,
+    whose is_valid has one row per phase and one column per engine.
+    """
+    if flight_analysis is None:
+        flight_analysis = flight_phases_analysis.get_flight_analysis()
+    var_cols = {k: np.array([d[k] for d in var_dicts]) for k in var_dicts[0]}
+    engines = EngineBatch(**get_constants(),
+                          **{**get_engine_constants(), **var_cols})
+    return flight_analysis.evaluate_engine(engines, max_tip_mach_no, min_safety_factor)
+
+
+def sensitivity_run(var_ranges_dict, no_of_samples=1024, batch_size=1024, workers=None, seed=None):
+    """
+    Sobol sensitivity of is_valid and the engine score to every variable in
+    var_ranges_dict (which may also hold engine constants), over the box spanned by
+    their ranges. The no_of_samples * (variables + 2) Saltelli samples are evaluated
+    as EngineBatches of batch_size, in parallel with workers. Designs that raise are
+    left out of the score indices. Prints and returns the indices of both outputs.
+    """
+    keys = list(var_ranges_dict)
+    analysis = SobolAnalysis([np.min(var_ranges_dict[k]) for k in keys],
+                             [np.max(var_ranges_dict[k]) for k in keys],
+                             no_of_samples=no_of_samples,
+                             seed=seed)
+    batches = [analysis.samples[i:i + batch_size]
+               for i in range(0, analysis.no_of_evaluations, batch_size)]
+    parallel = workers is not None and workers > 1
+    with (ProcessPoolExecutor(max_workers=workers) if parallel else nullcontext()) as executor:
+        results = executor.map(__evaluate_samples_batch, itertools.repeat(keys), batches) if parallel \
+            else map(__evaluate_samples_batch, itertools.repeat(keys), batches)
+        results = list(tqdm(results, total=len(batches), desc='Evaluating', unit='batch'))
+    is_valid = np.concatenate([batch_is_valid for batch_is_valid, _ in results])
+    scores = np.concatenate([batch_scores for _, batch_scores in results])
+    indices = {rs.VALIDITY_KEY: analysis.get_indices(is_valid),
+               rs.SCORE_KEY: analysis.get_indices(scores)}
+    print(summarise_indices(keys, indices))
+    return indices
+
+
+def first_run(tried_vars_dir: str, valid_vars_dir: str, batch_size=None, workers=None, chunk_size=None, factorized=False):
     print('\nRunning first iteration')
     var_ranges_dict = __get_variable_ranges()
     no_valid_iterations = complete_run(
-        tried_vars_dir, valid_vars_dir, var_ranges_dict)
+        tried_vars_dir, valid_vars_dir, var_ranges_dict, batch_size=batch_size, workers=workers, chunk_size=chunk_size, factorized=factorized)
     print(f'No of valid iterations: {no_valid_iterations}')
     print('Completed first iteration')
 
 
-def second_run(tried_vars_dir: str, valid_vars_dir: str, per_var_iterations: int):
+def second_run(tried_vars_dir: str, valid_vars_dir: str, per_var_iterations: int, batch_size=None, workers=None, chunk_size=None, factorized=False, budget=None):
     print('\nRunning second iteration')
     var_ranges_dict = __get_variable_ranges()
-    no_valid_iterations = complete_run(
-        tried_vars_dir, valid_vars_dir, var_ranges_dict, per_var_iterations)
+    if budget is not None:
+        # Refine around the valid engines instead of re-gridding their bounding box
+        no_valid_iterations = adaptive_run(
+            tried_vars_dir, valid_vars_dir, var_ranges_dict, budget, batch_size)
+    else:
+        no_valid_iterations = complete_run(
+            tried_vars_dir, valid_vars_dir, var_ranges_dict, per_var_iterations, batch_size, workers, chunk_size, factorized=factorized)
     print(f'No of valid iterations: {no_valid_iterations}')
     print('Completed second iteration')
 
 
-def main(tried_vars_dir: str, valid_vars_dir: str, second_iteration: False, second_per_var_iterations: int):
-    first_run(tried_vars_dir, valid_vars_dir)
+def main(tried_vars_dir: str, valid_vars_dir: str, second_iteration: False, second_per_var_iterations: int, batch_size=None, workers=None, chunk_size=None, factorized=False, second_budget=None):
+    first_run(tried_vars_dir, valid_vars_dir, batch_size,
+              workers, chunk_size, factorized)
     if second_iteration:
-        second_run(tried_vars_dir, valid_vars_dir, second_per_var_iterations)
+        second_run(tried_vars_dir, valid_vars_dir,
+                   second_per_var_iterations, batch_size, workers, chunk_size, factorized, second_budget)
 
 
 if __name__ == '__main__':
@@ -219,10 +619,13 @@ if __name__ == '__main__':
          valid_variables_dir,
          second_iteration=True,
          second_per_var_iterations=6)
+    # Pass workers (e.g. os.cpu_count()) to spread the sweep across processes
+    # Pass second_budget (e.g. 100000) to refine adaptively instead of on a grid
+    # Pass batch_size (e.g. 4096) to evaluate chunks of designs with EngineBatch
 
     # Get variable ranges from valid results:
     # print(__get_variable_ranges_from_file(
-    #     './data/VariablesData/Valid/cdf_hav_hmbl_hwc_lmbl_lwc_mbl_tlc.csv', 5))
+    #     './data/VariablesData/Valid/cdf_hav_hmbl_hwc_lmbl_lwc_mbl_tlc.results', 5))
 
     et = time.time()
     print(f'\nruntime: {f.format_elapsed_time(et - st)}')
@@ -53,11 +53,16 @@ def get_phases_data():
     }
 
 
-def main():
+def get_flight_analysis():
     flight_analysis = FlightAnalysis(*get_constants())
     for phase_name, phase_conditions in get_phases_data().items():
         flight_analysis.add_phase(phase_name, phase_conditions)
-        analysed_phase = flight_analysis.phases[phase_name]
+    return flight_analysis
+
+
+def main():
+    flight_analysis = get_flight_analysis()
+    for phase_name, analysed_phase in flight_analysis.phases.items():
         print(f'{formatter.humanise_str(phase_name)}:')
         print(f"Mach No: {analysed_phase.mach_no}")
         print(f"Minimum Engine Diameter: {analysed_phase.diameter}")
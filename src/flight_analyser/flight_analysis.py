@@ -1,4 +1,21 @@
+from collections import namedtuple
+import numpy as np
 from ..flight_analyser.phase import Phase
+from ..utils import thermo
+
+# Off-design state of one or many engines at every phase, in the order of phase_names.
+# Arrays have shape (phases,) for an Engine and (phases, designs) for an EngineBatch;
+# tip_mach_nos and work_coeffs map component names to the highest value of any stage
+# (and, for work coefficients, any blade location), safety_factors holds the lowest
+# HPT stress safety factor of any stage
+PhaseEvaluation = namedtuple('PhaseEvaluation', ['phase_names',
+                                                 'mass_flow',
+                                                 'mass_flow_corrected',
+                                                 'corrected_flow_ratio',
+                                                 'tip_mach_nos',
+                                                 'work_coeffs',
+                                                 'safety_factors',
+                                                 'is_valid'])
 
 
 class FlightAnalysis:
@@ -18,3 +35,70 @@ class FlightAnalysis:
                       self.pressure_sea,
                       **phase_conditions)
         self.phases[phase_name] = phase
+
+    def get_envelope(self, **envelope_conditions):
+        return Phase.envelope(self.spec_heat_ratio,
+                              self.gas_const,
+                              self.density_sea,
+                              self.temp_sea,
+                              self.pressure_sea,
+                              **envelope_conditions)
+
+    def evaluate_engine(self, engine, max_tip_mach_no, min_safety_factor=1, design_phase='cruise'):
+        """
+        Evaluates an Engine, or every design of an EngineBatch, at all phases at once.
+        The engine is designed at design_phase with its own mass_flow; at every other
+        phase it passes the phase's mass flow, scaled to the engine's diameter where the
+        phase fixes one. Pressure and temperature ratios are held, so blade speeds follow
+        the corrected flow: tip Mach numbers scale with the corrected flow ratio, work
+        coefficients with its inverse square, and HPT stresses with the square of the
+        shaft speed. max_tip_mach_no should leave a margin over the design tip Mach
+        numbers, which the Engine already holds to 1.3. The Engine holds the HPT to a
+        safety factor of 1.5 at the design point, so by default the phases only need its
+        blades not to yield. A phase without a diameter also needs the engine to be at
+        least its minimum diameter.
+        """
+        names = list(self.phases)
+        phases = [self.phases[name] for name in names]
+        ndim = np.ndim(engine.mass_flow)
+
+        def column(attr):
+            return np.array([getattr(p, attr) for p in phases], dtype=float).reshape((-1,) + (1,) * ndim)
+
+        has_diameter = np.array([p.is_diameter_fixed for p in phases]).reshape(column('diameter').shape)
+        design = self.phases[design_phase]
+        total_mass_flow = engine.mass_flow * (1 + engine.bypass_ratio)
+        design_mass_flow_corrected = thermo.get_corrected_mass_flow(
+            total_mass_flow, design.pressure_intake, design.temp_intake, self.pressure_sea, self.temp_sea)
+        area_ratio = (engine.diameter / column('diameter'))**2
+        scale = np.where(has_diameter, area_ratio, 1)
+        is_design_phase = np.array([name == design_phase for name in names]).reshape(has_diameter.shape)
+        mass_flow = np.where(is_design_phase, total_mass_flow, column('mass_flow') * scale)
+        mass_flow_corrected = thermo.get_corrected_mass_flow(
+            mass_flow, column('pressure_intake'), column('temp_intake'), self.pressure_sea, self.temp_sea)
+        corrected_flow_ratio = mass_flow_corrected / design_mass_flow_corrected
+        shaft_speed_ratio = corrected_flow_ratio * (column('temp_intake') / design.temp_intake)**0.5
+
+        for c in [engine.lpc, engine.hpc, engine.hpt, engine.lpt]:
+            # An Engine built with fail_fast may not have built its stages
+            if hasattr(c, 'build_stages'):
+                c.build_stages()
+        tip_mach_nos = {'Fan': engine.fan.tip_mach_no * corrected_flow_ratio}
+        for t in [engine.hpt, engine.lpt]:
+            tip_mach_nos[t.name] = self.__get_max_over_stages(t.tip_mach_nos, t) * corrected_flow_ratio
+        work_coeffs = {c.name: self.__get_max_over_stages(np.max(c.stages.work_coeff, axis=-1), c) /
+                       corrected_flow_ratio**2
+                       for c in [engine.lpc, engine.hpc, engine.hpt, engine.lpt]}
+        safety_factors = -self.__get_max_over_stages(-engine.hpt.stages.stress_safety_factor, engine.hpt) / \
+            shaft_speed_ratio**2
+        is_valid = (has_diameter | (engine.diameter >= column('diameter'))) & \
+            (safety_factors >= min_safety_factor)
+        for tip_mach_no in tip_mach_nos.values():
+            is_valid = is_valid & (tip_mach_no <= max_tip_mach_no)
+        return PhaseEvaluation(names, mass_flow, mass_flow_corrected, corrected_flow_ratio,
+                               tip_mach_nos, work_coeffs, safety_factors, is_valid)
+
+    @staticmethod
+    def __get_max_over_stages(values, component):
+        # EngineBatch components pad their stages, which the stage mask leaves out
+        return np.max(np.where(component.stages.stage_mask, values, -np.inf), axis=-1)
@@ -34,7 +34,8 @@ class Phase:
         self.velocity_intake = thermo.get_velocity_from_mach_no(
             self.mach_no_intake, self.temp_intake, SPEC_HEAT_RATIO, GAS_CONST)
 
-        if 'diameter' in kwargs:
+        self.is_diameter_fixed = 'diameter' in kwargs
+        if self.is_diameter_fixed:
             self.diameter = kwargs['diameter']
             self.area = geom.get_area_from_diameter(self.diameter)
             self.mass_flow = thermo.get_mass_flow(
@@ -46,6 +47,18 @@ class Phase:
             self.diameter, self.area, self.mass_flow, self.mass_flow_corrected = self.__get_min_engine_size(
                 PRESSURE_SEA, TEMP_SEA)
 
+    @classmethod
+    def envelope(cls, SPEC_HEAT_RATIO, GAS_CONST, DENSITY_SEA, TEMP_SEA, PRESSURE_SEA, **kwargs):
+        """
+        Returns one Phase over a whole operating envelope. kwargs are the same as for a
+        single phase, but any of them may be arrays, e.g. a Mach number and altitude
+        ratio grid, and are broadcast together, so every attribute is an array of the
+        broadcast shape computed in one pass.
+        """
+        kwargs = dict(zip(kwargs, np.broadcast_arrays(
+            *[np.asarray(v, dtype=float) for v in kwargs.values()])))
+        return cls(SPEC_HEAT_RATIO, GAS_CONST, DENSITY_SEA, TEMP_SEA, PRESSURE_SEA, **kwargs)
+
     def __get_param_freestream(self, param_sea, param_ratio):
         return param_sea * param_ratio
 
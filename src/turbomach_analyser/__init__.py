@@ -1 +1,3 @@
 from .engine import Engine
+from .engine_batch import EngineBatch
+from .component_cache import ComponentCache
@@ -0,0 +1,51 @@
+from collections import (OrderedDict,
+                         namedtuple)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _freeze(value):
+    # Makes an argument hashable so it can be part of a cache key
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ComponentCache:
+    """
+    Bounded LRU cache of built engine components, keyed on the component class and
+    the exact arguments it is built with. Components are shared between the engines
+    that hit the same key, so engines may only complete their stages (build_stages)
+    and must not otherwise modify them. A component whose stages failed to build is
+    evicted on its next hit and built again.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__components = OrderedDict()
+
+    def get(self, component_cls, **kwargs):
+        key = (component_cls, _freeze(kwargs))
+        if key in self.__components and getattr(self.__components[key], 'is_error', False):
+            del self.__components[key]
+        if key in self.__components:
+            self.hits += 1
+            self.__components.move_to_end(key)
+            return self.__components[key]
+        self.misses += 1
+        component = component_cls(**kwargs)
+        self.__components[key] = component
+        if self.maxsize is not None and len(self.__components) > self.maxsize:
+            self.__components.popitem(last=False)
+        return component
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__components))
+
+    def cache_clear(self):
+        self.__components.clear()
+        self.hits = self.misses = 0
@@ -1,6 +1,7 @@
 from .turbo_component import (TurboComponent)
-from .stage import Stage
+from .stage_array import StageArray
 from ..utils import (geometry as geom,
+                     instrumentation as instr,
                      thermo)
 import numpy as np
 
@@ -22,6 +23,7 @@ class Compressor(TurboComponent):
                  GAS_CONST=287,
                  SPEC_HEAT_CAPACITY=1005,
                  check_dp=5,
+                 build_stages=True,
                  ** kwargs):
         super().__init__(mass_flow,
                          axial_velocity,
@@ -41,7 +43,8 @@ class Compressor(TurboComponent):
         self.angular_velocity = angular_velocity
         self.tangential_speed = geom.get_tangential_speed(
             angular_velocity, self.mean_radius * 2)
-        self.hub_diameters, self.tip_diameters, self.hub_tip_ratios, self.areas, self.blade_lengths = self.__get_geometry_of_stages()
+        with instr.timed(f'{self.name}.geometry_of_stages'):
+            self.hub_diameters, self.tip_diameters, self.hub_tip_ratios, self.areas, self.blade_lengths = self.__get_geometry_of_stages()
         # self.tip_mach_nos = self.__get_tip_mach_nos(SPEC_HEAT_RATIO, GAS_CONST)
         self.d_stag_enthalpy = thermo.get_delta_stag_enthalpy(
             self.T0_exit - self.T0_inlet, SPEC_HEAT_CAPACITY)
@@ -49,20 +52,46 @@ class Compressor(TurboComponent):
         # NOTE: FIX WORK COEFF
         self.work_coeff = 0.5
         # self.work_coeff = self.__get_work_coefficient(SPEC_HEAT_CAPACITY)
-        self.stages = [Stage(is_compressor_stage=True,
-                             is_low_pressure=self.is_low_pressure,
-                             number=i + 1,
-                             work_coeff=self.work_coeff,
-                             axial_velocity=self.axial_velocity,
-                             angular_velocity=self.angular_velocity,
-                             hub_diameter=self.hub_diameters[i],
-                             tip_diameter=self.tip_diameters[i],
-                             reaction_mean=reaction_mean,
-                             diffusion_factor=diffusion_factor,
-                             check_dp=check_dp,
-                             SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                             GAS_CONST=GAS_CONST,) for i in range(self.no_of_stages)]
-        self.is_valid = self.__check_validity(check_dp)
+        self.stages = None
+        stage_kwargs = dict(reaction_mean=reaction_mean,
+                            diffusion_factor=diffusion_factor,
+                            check_dp=check_dp,
+                            SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                            GAS_CONST=GAS_CONST)
+        if build_stages:
+            self.__build_stages(**stage_kwargs)
+        else:
+            # Stages are built on demand by build_stages
+            self.__stage_kwargs = stage_kwargs
+            with instr.timed(f'{self.name}.check_validity'):
+                self.is_valid = self.__check_validity(check_dp)
+
+    def build_stages(self):
+        if self.stages is None:
+            self.__build_stages(**self.__stage_kwargs)
+            del self.__stage_kwargs
+
+    def __build_stages(self,
+                       reaction_mean,
+                       diffusion_factor,
+                       check_dp,
+                       SPEC_HEAT_RATIO,
+                       GAS_CONST):
+        with instr.timed(f'{self.name}.build_stages'):
+            self.stages = StageArray(is_compressor_stage=True,
+                                     is_low_pressure=self.is_low_pressure,
+                                     work_coeff=self.work_coeff,
+                                     axial_velocity=self.axial_velocity,
+                                     angular_velocity=self.angular_velocity,
+                                     hub_diameters=self.hub_diameters,
+                                     tip_diameters=self.tip_diameters,
+                                     reaction_mean=reaction_mean,
+                                     diffusion_factor=diffusion_factor,
+                                     check_dp=check_dp,
+                                     SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                     GAS_CONST=GAS_CONST)
+        with instr.timed(f'{self.name}.check_validity'):
+            self.is_valid = self.__check_validity(check_dp)
 
     def __str__(self):
         properties = {f'{self.name} tip diameter: {self.tip_diameters}',
@@ -73,6 +102,20 @@ class Compressor(TurboComponent):
                       f'{self.name} annulus areas:{self.areas}', }
         return self.name + super().__str__() + ':' + '\n' + '\n'.join(properties)
 
+    def get_constraint_margins(self):
+        """
+        Returns {code: margin} for the rules of the compressor that are inequalities,
+        positive when a rule is met, with every stage rule at its worst stage.
+        """
+        self.build_stages()
+        margins = {f'{self.name}.stage_pressure_ratio': 1.3 - self.per_stage_pressure_ratio}
+        if not self.is_low_pressure:
+            margins[f'{self.name}.shaft_clearance'] = self.mean_radius - \
+                self.blade_lengths[0] / 2 - 0.15
+        margins.update({f'{self.name}.{rule}': np.min(margin)
+                        for rule, margin in self.stages.get_margins().items()})
+        return margins
+
     def __get_geometry_of_stages(self):
         inlet_hub_d = geom.get_hub_diameter_from_mean_radius(
             self.mean_radius, self.area_inlet)
@@ -93,24 +136,28 @@ class Compressor(TurboComponent):
         return self.d_stag_enthalpy / (self.no_of_stages * self.tangential_speed ** 2)
 
     def __check_validity(self, check_dp):
+        self.rejection = self.__get_rejection(check_dp)
+        return self.rejection is None
+
+    def __get_rejection(self, check_dp):
         # Axial set at 190 for compressors:
         if self.axial_velocity != 190:
-            return False
+            return f'{self.name}.axial_velocity'
         # Pressure ratio across compressor stages can't exceed 1.3
         if self.per_stage_pressure_ratio > 1.3:
-            return False
+            return f'{self.name}.stage_pressure_ratio'
         # Mean radius stays contants across stages:
-        if not len(set(round(stage.mean_radius, check_dp)
-                       for stage in self.stages)) <= 1:
-            return False
+        stage_mean_radii = 0.25 * (self.tip_diameters + self.hub_diameters)
+        if not np.unique(np.round(stage_mean_radii, check_dp)).size <= 1:
+            return f'{self.name}.mean_radius'
         # For HPC:
         if not self.is_low_pressure:
             # HPC can't be too close to the shaft
             # NOTE: idk what too close means: assume 0.15m
-            if self.mean_radius - self.stages[0].blade_height / 2 < 0.15:
-                return False
+            if self.mean_radius - self.blade_lengths[0] / 2 < 0.15:
+                return f'{self.name}.shaft_clearance'
 
         # All stages must be valid
-        if not all(stage.is_valid for stage in self.stages):
-            return False
-        return True
+        if self.stages is not None and not np.all(self.stages.is_valid):
+            return self.stages.get_rejection(self.name)
+        return None
@@ -1,8 +1,20 @@
 import numpy as np
+from functools import cached_property
 from .compressor import Compressor
 from .turbine import Turbine
 from .fan import Fan
-from ..utils import (activation as act)
+from ..utils import (activation as act,
+                     instrumentation as instr)
+from ..utils.materials import MaterialTable
+
+# Built once at import, so engines using the default never build their own table
+DEFAULT_HPT_YIELD_STRENGTH = MaterialTable({20: 1100,
+                                            540: 982,
+                                            600: 960,
+                                            650: 894,
+                                            700: 760,
+                                            760: 555,
+                                            820: 408})
 
 
 class Engine:
@@ -48,111 +60,248 @@ class Engine:
                  hpt_disk_depth=0.01,
                  hpt_blade_density=2700,
                  hpt_poissons_ratio=0.27,
-                 hpt_yield_strength_dict={20: 1100,
-                                          540: 982,
-                                          600: 960,
-                                          650: 894,
-                                          700: 760,
-                                          760: 555,
-                                          820: 408},
+                 hpt_yield_strength_dict=DEFAULT_HPT_YIELD_STRENGTH,
+                 hpt_disk_solver=None,
                  GAS_CONST=1.4,
                  SPEC_HEAT_RATIO=287,
                  TEMP_SEA=288.15,
                  SPEC_HEAT_CAPACITY=1005,
-                 check_dp=5):
+                 check_dp=5,
+                 fail_fast=False,
+                 component_cache=None,
+                 component_names=None):
         self.mass_flow = mass_flow
         self.diameter = engine_diameter
         self.bypass_ratio = bypass_ratio
         self.overall_pressure_ratio = overall_pressure_ratio
-        self.fan = Fan(engine_diameter=engine_diameter,
-                       tip_mach_no=fan_tip_mach_no,
-                       hub_tip_ratio=fan_hub_tip_ratio,
-                       inner_fan_pressure_ratio=inner_fan_pressure_ratio,
-                       outer_fan_pressure_ratio=outer_fan_pressure_ratio,
-                       bypass_ratio=bypass_ratio,
-                       SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                       GAS_CONST=GAS_CONST,
-                       TEMP_SEA=TEMP_SEA)
-        self.hpt = Turbine(is_low_pressure=False,
-                           mass_flow=self.mass_flow,
-                           axial_velocity=turbine_axial_velocity,
-                           pressure_ratio=P_044/P_041,
-                           P0_exit=P_044,
-                           T0_exit=T_044,
-                           T0_inlet=T_041,
-                           angular_velocity=hpt_angular_velocity,
-                           isentropic_efficiency=turbine_isentropic_efficiency,
-                           work_coefficient=hpt_work_coefficient,
-                           min_blade_length=hpt_min_blade_length,
-                           reaction_mean=turbine_reaction_mean,
-                           lift_coeff=hpt_lift_coeff,
-                           disk_depth=hpt_disk_depth,
-                           blade_density=hpt_blade_density,
-                           poissons_ratio=hpt_poissons_ratio,
-                           yield_strength_dict=hpt_yield_strength_dict,
-                           SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                           GAS_CONST=GAS_CONST,
-                           SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
-                           check_dp=5)
-        self.lpt = Turbine(is_low_pressure=True,
-                           mass_flow=self.mass_flow,
-                           axial_velocity=turbine_axial_velocity,
-                           pressure_ratio=P_05/P_045,
-                           P0_exit=P_05,
-                           T0_exit=T_05,
-                           T0_inlet=T_045,
-                           angular_velocity=self.fan.angular_velocity,
-                           isentropic_efficiency=turbine_isentropic_efficiency,
-                           work_coefficient=lpt_work_coefficient,
-                           min_blade_length=lpt_min_blade_length,
-                           reaction_mean=turbine_reaction_mean,
-                           lift_coeff=lpt_lift_coeff,
-                           SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                           GAS_CONST=GAS_CONST,
-                           SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
-                           check_dp=check_dp)
-        self.lpc = Compressor(is_low_pressure=True,
-                              mass_flow=self.mass_flow,
-                              axial_velocity=comp_axial_velocity,
-                              pressure_ratio=lpc_pressure_ratio/inner_fan_pressure_ratio,
-                              P0_exit=P_025,
-                              T0_exit=T_025,
-                              T0_inlet=self.__get_T_021(),
-                              angular_velocity=self.fan.angular_velocity,
-                              mean_radius=self.fan.inner_fan_mean_radius,
-                              per_stage_pressure_ratio=per_stage_pressure_ratio,
-                              reaction_mean=lpc_reaction_mean,
-                              diffusion_factor=lpc_diffusion_factor,
-                              SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                              GAS_CONST=GAS_CONST,
-                              SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
-                              check_dp=check_dp)
-        self.hpc = Compressor(is_low_pressure=False,
-                              mass_flow=self.mass_flow,
-                              axial_velocity=comp_axial_velocity,
-                              pressure_ratio=overall_pressure_ratio/lpc_pressure_ratio,
-                              P0_exit=P_03,
-                              T0_exit=T_03,
-                              T0_inlet=T_025,
-                              angular_velocity=hpt_angular_velocity,
-                              final_blade_length=min_blade_length,
-                              per_stage_pressure_ratio=per_stage_pressure_ratio,
-                              reaction_mean=hpc_reaction_mean,
-                              diffusion_factor=hpc_diffusion_factor,
-                              SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                              GAS_CONST=GAS_CONST,
-                              SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
-                              check_dp=check_dp)
-        self.is_valid = self.__check_validity()
-        self.score = self.__get_score()
+        # A plain dict is made a table here rather than by the HPT stages
+        hpt_yield_strength_dict = MaterialTable.from_dict(hpt_yield_strength_dict)
+
+        def build(component_cls, **kwargs):
+            if component_cache is None:
+                return component_cls(**kwargs)
+            return component_cache.get(component_cls, **kwargs)
+
+        builders = {}
+        builders['fan'] = lambda: build(Fan, engine_diameter=engine_diameter,
+                                        tip_mach_no=fan_tip_mach_no,
+                                        hub_tip_ratio=fan_hub_tip_ratio,
+                                        inner_fan_pressure_ratio=inner_fan_pressure_ratio,
+                                        outer_fan_pressure_ratio=outer_fan_pressure_ratio,
+                                        bypass_ratio=bypass_ratio,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        TEMP_SEA=TEMP_SEA)
+        builders['hpt'] = lambda: build(Turbine, is_low_pressure=False,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=turbine_axial_velocity,
+                                        pressure_ratio=P_044/P_041,
+                                        P0_exit=P_044,
+                                        T0_exit=T_044,
+                                        T0_inlet=T_041,
+                                        angular_velocity=hpt_angular_velocity,
+                                        isentropic_efficiency=turbine_isentropic_efficiency,
+                                        work_coefficient=hpt_work_coefficient,
+                                        min_blade_length=hpt_min_blade_length,
+                                        reaction_mean=turbine_reaction_mean,
+                                        lift_coeff=hpt_lift_coeff,
+                                        disk_depth=hpt_disk_depth,
+                                        blade_density=hpt_blade_density,
+                                        poissons_ratio=hpt_poissons_ratio,
+                                        yield_strength_dict=hpt_yield_strength_dict,
+                                        disk_solver=hpt_disk_solver,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=5,
+                                        build_stages=not fail_fast)
+        builders['lpt'] = lambda: build(Turbine, is_low_pressure=True,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=turbine_axial_velocity,
+                                        pressure_ratio=P_05/P_045,
+                                        P0_exit=P_05,
+                                        T0_exit=T_05,
+                                        T0_inlet=T_045,
+                                        angular_velocity=self.fan.angular_velocity,
+                                        isentropic_efficiency=turbine_isentropic_efficiency,
+                                        work_coefficient=lpt_work_coefficient,
+                                        min_blade_length=lpt_min_blade_length,
+                                        reaction_mean=turbine_reaction_mean,
+                                        lift_coeff=lpt_lift_coeff,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=check_dp,
+                                        build_stages=not fail_fast)
+        builders['lpc'] = lambda: build(Compressor, is_low_pressure=True,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=comp_axial_velocity,
+                                        pressure_ratio=lpc_pressure_ratio/inner_fan_pressure_ratio,
+                                        P0_exit=P_025,
+                                        T0_exit=T_025,
+                                        T0_inlet=self.__get_T_021(),
+                                        angular_velocity=self.fan.angular_velocity,
+                                        mean_radius=self.fan.inner_fan_mean_radius,
+                                        per_stage_pressure_ratio=per_stage_pressure_ratio,
+                                        reaction_mean=lpc_reaction_mean,
+                                        diffusion_factor=lpc_diffusion_factor,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=check_dp,
+                                        build_stages=not fail_fast)
+        builders['hpc'] = lambda: build(Compressor, is_low_pressure=False,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=comp_axial_velocity,
+                                        pressure_ratio=overall_pressure_ratio/lpc_pressure_ratio,
+                                        P0_exit=P_03,
+                                        T0_exit=T_03,
+                                        T0_inlet=T_025,
+                                        angular_velocity=hpt_angular_velocity,
+                                        final_blade_length=min_blade_length,
+                                        per_stage_pressure_ratio=per_stage_pressure_ratio,
+                                        reaction_mean=hpc_reaction_mean,
+                                        diffusion_factor=hpc_diffusion_factor,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=check_dp,
+                                        build_stages=not fail_fast)
+
+        if instr.is_enabled():
+            builders = {name: self.__timed_builder(f'Engine.build_{name}', builder)
+                        for name, builder in builders.items()}
+
+        self.component_names = component_names
+        if component_names is not None:
+            # Only the named components are checked, without the engine-level checks
+            self.is_valid = self.__build_components(builders, component_names)
+            return
+        if fail_fast:
+            self.fan = self.hpt = self.lpt = self.lpc = self.hpc = None
+            # Kept so the score can complete the engine on first access
+            self.__builders = builders
+            self.is_valid = self.__build_fail_fast()
+            return
+        for name, builder in builders.items():
+            setattr(self, name, builder())
+        with instr.timed('Engine.check_validity'):
+            self.is_valid = self.__check_validity()
+        self.score
         return
 
+    @classmethod
+    def check_components(cls, names, **kwargs):
+        """
+        Builds and checks only the named components of the engine of kwargs, without
+        the engine-level checks, and returns (is_valid, rejection).
+        """
+        engine = cls(**kwargs, component_names=names)
+        return engine.is_valid, engine.rejection
+
+    @cached_property
+    def score(self):
+        self.__check_complete()
+        if hasattr(self, '_Engine__builders'):
+            self.__complete()
+        with instr.timed('Engine.score'):
+            return self.__get_score()
+
+    def get_constraint_margins(self):
+        """
+        Returns {rejection code: margin} for the rules of the engine and its
+        turbomachines that are inequalities, positive when a rule is met and negative
+        when it is broken. Stage rules are taken at the worst stage, under codes such
+        as 'HPC.diffusion_factor'. Engines designed with dual variables give margins
+        with gradients.
+        """
+        self.__check_complete()
+        if hasattr(self, '_Engine__builders'):
+            self.__complete()
+        inner_fan_mean_radius = self.fan.inner_fan_mean_radius
+        turbine_pressure_ratios = self.lpt.pressure_ratio * self.hpt.pressure_ratio
+        margins = {'Engine.diameter': 3.5 - self.diameter,
+                   'Engine.lpt_radius': 1.3 * inner_fan_mean_radius - self.lpt.mean_radius,
+                   'Engine.lpt_below_hpt': self.lpt.mean_radius - self.hpt.mean_radius,
+                   'Engine.lpc_below_hpc': self.lpc.mean_radius - self.hpc.mean_radius,
+                   'Engine.lpc_radius': 1.2 * inner_fan_mean_radius - self.lpc.mean_radius,
+                   'Engine.pressure_ratio_mismatch': min(turbine_pressure_ratios, self.overall_pressure_ratio) /
+                   max(turbine_pressure_ratios, self.overall_pressure_ratio) - 0.9}
+        for turbo_machine in [self.lpc, self.hpc, self.lpt, self.hpt]:
+            margins.update(turbo_machine.get_constraint_margins())
+        return margins
+
+    @staticmethod
+    def __timed_builder(name, builder):
+        def build():
+            with instr.timed(name):
+                return builder()
+        return build
+
+    def __build_fail_fast(self):
+        # Cheapest checks first, stopping at the first failure
+        if self.diameter > 3.5:
+            self.rejection = 'Engine.diameter'
+            return False
+        if self.bypass_ratio != 7:
+            self.rejection = 'Engine.bypass_ratio'
+            return False
+        self.fan = self.__builders['fan']()
+        for name in ['hpt', 'lpt', 'lpc', 'hpc']:
+            setattr(self, name, self.__builders[name]())
+            if not getattr(self, name).is_valid:
+                self.rejection = getattr(self, name).rejection
+                return False
+        with instr.timed('Engine.check_validity'):
+            is_valid = self.__check_validity()
+        if not is_valid:
+            return False
+        # Stages last, in increasing order of cost
+        for turbo_machine in [self.lpc, self.hpc, self.lpt, self.hpt]:
+            turbo_machine.build_stages()
+            if not turbo_machine.is_valid:
+                self.rejection = turbo_machine.rejection
+                return False
+        return True
+
+    def __check_complete(self):
+        if self.component_names is not None:
+            raise ValueError(f'The engine only has the components {self.component_names}, '
+                             'so it has no score or engine-level margins.')
+
+    def __build_components(self, builders, names):
+        # The lpt and lpc are built from the fan
+        self.hpt = self.lpt = self.lpc = self.hpc = None
+        self.fan = builders['fan']()
+        self.rejection = None
+        for name in names:
+            component = builders[name]()
+            setattr(self, name, component)
+            if hasattr(component, 'build_stages'):
+                component.build_stages()
+            if not component.is_valid:
+                self.rejection = component.rejection
+                return False
+        return True
+
+    def __complete(self):
+        for name, build in self.__builders.items():
+            if getattr(self, name) is None:
+                setattr(self, name, build())
+        for turbo_machine in [self.lpc, self.hpc, self.lpt, self.hpt]:
+            turbo_machine.build_stages()
+        del self.__builders
+
     def __get_T_021(self):
         # TODO
         # thermo.get_static_temp
         return 260.73
 
     def __check_validity(self):
+        self.rejection = self.__get_rejection()
+        return self.rejection is None
+
+    def __get_rejection(self):
         # TODO
         compressors = [self.lpc, self.hpc]
         turbines = [self.lpt, self.hpt]
@@ -161,37 +310,37 @@ class Engine:
         # engine must have at least 0.5m clearance from ground
         # NOTE: this means engine diameter can't be more than 3.5m
         if self.diameter > 3.5:
-            return False
+            return 'Engine.diameter'
         # Bypass ratio is 7
         if self.bypass_ratio != 7:
-            return False
+            return 'Engine.bypass_ratio'
         # Mean radius of lpc can't be more than 30% higher than inner fan
             # NOTE:(idk about the 30% but let's just say it is)
         if self.lpt.mean_radius > 1.3 * self.fan.inner_fan_mean_radius:
-            return False
+            return 'Engine.lpt_radius'
         # Mean radius of lpt can't be less than mean radius of hpt
         if self.lpt.mean_radius < self.hpt.mean_radius:
-            return False
+            return 'Engine.lpt_below_hpt'
         # Mean radius of lpc can't be less than mean radius of hpc
         if self.lpc.mean_radius < self.hpc.mean_radius:
-            return False
+            return 'Engine.lpc_below_hpc'
         # Mean radius of lpc can't be more than 20% higher than inner fan
             # NOTE:(idk about the 20% but let's just say it is)
         if self.lpc.mean_radius > 1.2 * self.fan.inner_fan_mean_radius:
-            return False
+            return 'Engine.lpc_radius'
         # OPR and turbine pressure ratio should roughly match
-        turbine_pressure_ratios = np.prod(
-            np.array([t.pressure_ratio for t in turbines]))
+        turbine_pressure_ratios = self.lpt.pressure_ratio * self.hpt.pressure_ratio
         higher_pressure_ratio = max(
             turbine_pressure_ratios, self.overall_pressure_ratio)
         lower_pressure_ratio = min(
             turbine_pressure_ratios, self.overall_pressure_ratio)
         if lower_pressure_ratio / higher_pressure_ratio < 0.9:
-            return False
+            return 'Engine.pressure_ratio_mismatch'
         # All turbo machines should be valid:
-        if not all([t.is_valid for t in turbo_machines]):
-            return False
-        return True
+        for t in turbo_machines:
+            if not t.is_valid:
+                return t.rejection
+        return None
 
     def __get_score(self):
         compressors = [self.lpc, self.hpc]
@@ -233,8 +382,8 @@ class Engine:
                                       max_y=10)
         max_score += 10
         # Award points for high mean tip mach number:
-        mean_tip_mach_nos = np.mean(
-            np.array([self.fan.tip_mach_no, max(self.lpt.tip_mach_nos), max(self.hpt.tip_mach_nos)]))
+        mean_tip_mach_nos = (self.fan.tip_mach_no + max(self.lpt.tip_mach_nos) +
+                             max(self.hpt.tip_mach_nos)) / 3
         score += act.smooth_step_up(mean_tip_mach_nos,
                                     start=0.6,
                                     end=1.2,
@@ -242,8 +391,7 @@ class Engine:
                                     max_y=2)
         max_score += 2
         # Award points fot similar OPR and turbine pressure ratio:
-        turbine_pressure_ratios = np.prod(
-            np.array([t.pressure_ratio for t in turbines]))
+        turbine_pressure_ratios = self.lpt.pressure_ratio * self.hpt.pressure_ratio
         higher_pressure_ratio = max(
             turbine_pressure_ratios, self.overall_pressure_ratio)
         lower_pressure_ratio = min(
@@ -254,7 +402,8 @@ class Engine:
                                       min_y=-20,
                                       max_y=20)
         max_score += 20
-        # Award points for low average work coefficients and flow coefficients:
+        # Award points for low average work coefficients and flow coefficients,
+        # over every stage and location of each turbo machine at once:
         for t in turbines:
             if t.is_low_pressure:
                 optimal_work_coeff_range = (0.8, 1.8)
@@ -262,47 +411,43 @@ class Engine:
             else:
                 optimal_work_coeff_range = (1, 2.4)
                 optimal_flow_coeff_range = (0.7, 11)
-            for stage in t.stages:
-                for location in ['mean', 'hub', 'tip']:
-                    score += act.smooth_step_down(stage.work_coeff[location],
-                                                  start=optimal_work_coeff_range[0],
-                                                  end=optimal_work_coeff_range[1],
-                                                  min_y=0,
-                                                  max_y=0.1)
-                    score += act.smooth_step_down(stage.flow_coeff[location],
-                                                  start=optimal_flow_coeff_range[0],
-                                                  end=optimal_flow_coeff_range[1],
-                                                  min_y=0,
-                                                  max_y=0.1)
-                    # award points for zweifel efficiency
-                    zwei_eff = np.abs(stage.lift_coeff[location] - 0.8)
-                    score += act.smooth_step_down(zwei_eff,
-                                                  start=0,
-                                                  end=0.5,
-                                                  min_y=-0.1,
-                                                  max_y=0.1)
-                    max_score += 0.3
+            score += np.sum(act.smooth_step_down(t.stages.work_coeff,
+                                                 start=optimal_work_coeff_range[0],
+                                                 end=optimal_work_coeff_range[1],
+                                                 min_y=0,
+                                                 max_y=0.1))
+            score += np.sum(act.smooth_step_down(t.stages.flow_coeff,
+                                                 start=optimal_flow_coeff_range[0],
+                                                 end=optimal_flow_coeff_range[1],
+                                                 min_y=0,
+                                                 max_y=0.1))
+            # award points for zweifel efficiency
+            zwei_eff = np.abs(t.stages.lift_coeff - 0.8)
+            score += np.sum(act.smooth_step_down(zwei_eff,
+                                                 start=0,
+                                                 end=0.5,
+                                                 min_y=-0.1,
+                                                 max_y=0.1))
+            max_score += 0.9 * len(t.stages)
         for c in compressors:
             optimal_work_coeff_range = (0.35, 0.5)
             optimal_flow_coeff_range = (0.4, 0.7)
-            for stage in c.stages:
-                for location in ['mean', 'hub', 'tip']:
-                    score += act.smooth_step_down(stage.work_coeff[location],
-                                                  start=optimal_work_coeff_range[0],
-                                                  end=optimal_work_coeff_range[1],
-                                                  min_y=0,
-                                                  max_y=0.1)
-                    score += act.smooth_step_down(stage.flow_coeff[location],
-                                                  start=optimal_flow_coeff_range[0],
-                                                  end=optimal_flow_coeff_range[1],
-                                                  min_y=0,
-                                                  max_y=0.1)
-                    # award points for df criterion
-                    df_eff = np.abs(stage.diffusion_factor[location] - 0.45)
-                    score += act.smooth_step_down(df_eff,
-                                                  start=0,
-                                                  end=0.2,
-                                                  min_y=0,
-                                                  max_y=0.1)
-                    max_score += 0.3
+            score += np.sum(act.smooth_step_down(c.stages.work_coeff,
+                                                 start=optimal_work_coeff_range[0],
+                                                 end=optimal_work_coeff_range[1],
+                                                 min_y=0,
+                                                 max_y=0.1))
+            score += np.sum(act.smooth_step_down(c.stages.flow_coeff,
+                                                 start=optimal_flow_coeff_range[0],
+                                                 end=optimal_flow_coeff_range[1],
+                                                 min_y=0,
+                                                 max_y=0.1))
+            # award points for df criterion
+            df_eff = np.abs(c.stages.diffusion_factor - 0.45)
+            score += np.sum(act.smooth_step_down(df_eff,
+                                                 start=0,
+                                                 end=0.2,
+                                                 min_y=0,
+                                                 max_y=0.1))
+            max_score += 0.9 * len(c.stages)
         return 100 * score / max_score
@@ -0,0 +1,601 @@
+import numpy as np
+from .engine import DEFAULT_HPT_YIELD_STRENGTH
+from .stage_array import StageArray
+from ..utils import (activation as act,
+                     geometry as geom,
+                     thermo)
+from ..utils.materials import MaterialTable
+
+
+def _linspace(start, stop, num, max_num):
+    # Row-wise np.linspace(start, stop, num) padded to max_num columns
+    i = np.arange(max_num)
+    div = np.maximum(num - 1, 1)[:, None]
+    values = i * ((stop - start)[:, None] / div) + start[:, None]
+    return np.where(i == (num - 1)[:, None], stop[:, None], values)
+
+
+def _get_rejection(checks):
+    # The code of the first failed check of every design, or None; checks are
+    # (code, is_met) pairs in the order the scalar model applies them
+    rejection = np.full(np.shape(checks[0][1]), None, dtype=object)
+    for code, is_met in reversed(checks):
+        rejection = np.where(is_met, rejection, np.asarray(code, dtype=object))
+    return rejection
+
+
+def _smooth_step_down(x, start, end, min_y, max_y):
+    return act.smooth_step_down(np.ravel(x), start, end, min_y, max_y).reshape(np.shape(x))
+
+
+def _smooth_step_up(x, start, end, min_y, max_y):
+    return act.smooth_step_up(np.ravel(x), start, end, min_y, max_y).reshape(np.shape(x))
+
+
+class _FanBatch:
+    def __init__(self,
+                 engine_diameter,
+                 tip_mach_no,
+                 hub_tip_ratio,
+                 inner_fan_pressure_ratio,
+                 outer_fan_pressure_ratio,
+                 bypass_ratio,
+                 SPEC_HEAT_RATIO=1.4,
+                 GAS_CONST=287,
+                 TEMP_SEA=288.15):
+        self.name = 'Fan'
+        self.hub_tip_ratio = hub_tip_ratio
+        self.tip_diameter = engine_diameter
+        self.hub_diameter = self.hub_tip_ratio * self.tip_diameter
+        self.inner_fan_tip_diameter = self.tip_diameter * \
+            ((1 + bypass_ratio * self.hub_tip_ratio**2) / (1 + bypass_ratio))**0.5
+        self.inner_fan_mean_radius = (
+            self.inner_fan_tip_diameter + self.hub_diameter) / 4
+        self.inner_fan_pressure_ratio = inner_fan_pressure_ratio
+        self.outer_fan_pressure_ratio = outer_fan_pressure_ratio
+        self.pressure_ratio = inner_fan_pressure_ratio * outer_fan_pressure_ratio
+        self.tip_mach_no = tip_mach_no
+        speed_of_sound = thermo.get_speed_of_sound(
+            0.75*TEMP_SEA, SPEC_HEAT_RATIO, GAS_CONST)
+        self.angular_velocity = geom.get_angular_velocity(
+            speed_of_sound * self.tip_mach_no, self.tip_diameter)
+        self.is_valid = (self.inner_fan_pressure_ratio <= 1.9) & (
+            self.tip_mach_no <= 1.3)
+
+
+class _TurboComponentBatch:
+    def __init__(self,
+                 mass_flow,
+                 axial_velocity,
+                 pressure_ratio,
+                 P0_exit,
+                 T0_exit,
+                 T0_inlet,
+                 SPEC_HEAT_RATIO=1.4,
+                 GAS_CONST=287):
+        self.mass_flow = mass_flow
+        self.axial_velocity = axial_velocity
+        self.pressure_ratio = pressure_ratio
+        self.T0_inlet = T0_inlet
+        self.T0_exit = T0_exit
+        self.P0_exit = P0_exit
+        self.P0_inlet = P0_exit / pressure_ratio
+        stag_density_exit = thermo.get_stag_density(
+            self.P0_exit, self.T0_exit, GAS_CONST)
+        stag_density_inlet = thermo.get_stag_density(
+            self.P0_inlet, self.T0_inlet, GAS_CONST)
+        static_temp_exit = thermo.get_static_temp(
+            self.T0_exit, self.axial_velocity, SPEC_HEAT_RATIO, GAS_CONST)
+        static_temp_inlet = thermo.get_static_temp(
+            self.T0_inlet, self.axial_velocity, SPEC_HEAT_RATIO, GAS_CONST)
+        axial_mach_no_exit = thermo.get_mach_no_from_velocity(
+            self.axial_velocity, static_temp_exit, SPEC_HEAT_RATIO, GAS_CONST)
+        axial_mach_no_inlet = thermo.get_mach_no_from_velocity(
+            self.axial_velocity, static_temp_inlet, SPEC_HEAT_RATIO, GAS_CONST)
+        self.density_exit = thermo.get_static_density(
+            stag_density_exit, axial_mach_no_exit, SPEC_HEAT_RATIO)
+        self.density_inlet = thermo.get_static_density(
+            stag_density_inlet, axial_mach_no_inlet, SPEC_HEAT_RATIO)
+        self.area_exit = self.mass_flow / \
+            (self.density_exit * self.axial_velocity)
+        self.area_inlet = self.mass_flow / \
+            (self.density_inlet * self.axial_velocity)
+
+    def _set_geometry_of_stages(self):
+        inlet_hub_d = geom.get_hub_diameter_from_mean_radius(
+            self.mean_radius, self.area_inlet)
+        exit_hub_d = geom.get_hub_diameter_from_mean_radius(
+            self.mean_radius, self.area_exit)
+        inlet_tip_d = geom.get_tip_diameter_from_mean_radius(
+            self.mean_radius, self.area_inlet)
+        exit_tip_d = geom.get_tip_diameter_from_mean_radius(
+            self.mean_radius, self.area_exit)
+        self.hub_diameters = _linspace(
+            inlet_hub_d, exit_hub_d, self.no_of_stages, self.max_no_of_stages)
+        self.tip_diameters = _linspace(
+            inlet_tip_d, exit_tip_d, self.no_of_stages, self.max_no_of_stages)
+        self.blade_lengths = (self.tip_diameters - self.hub_diameters) / 2
+
+    def _get_no_of_stages(self, n_stages, min_no_of_stages):
+        # Designs whose stage count the scalar model can't build are flagged as errors
+        is_error = ~np.isfinite(n_stages) | (n_stages > 1e3)
+        no_of_stages = np.ceil(np.where(is_error, min_no_of_stages, n_stages))
+        is_error |= no_of_stages < min_no_of_stages
+        no_of_stages = np.where(is_error, min_no_of_stages,
+                                no_of_stages).astype(int)
+        return no_of_stages, is_error
+
+    def _constant_mean_radius(self, check_dp):
+        stage_mean_radii = np.round(
+            0.25 * (self.tip_diameters + self.hub_diameters), check_dp)
+        return np.all((stage_mean_radii == stage_mean_radii[:, :1]) | ~self.stage_mask, axis=1)
+
+
+class _TurbineBatch(_TurboComponentBatch):
+    def __init__(self,
+                 is_low_pressure,
+                 mass_flow,
+                 axial_velocity,
+                 pressure_ratio,
+                 P0_exit,
+                 T0_exit,
+                 T0_inlet,
+                 angular_velocity,
+                 min_blade_length,
+                 isentropic_efficiency=0.92,
+                 work_coefficient=2.2,
+                 reaction_mean=0.5,
+                 lift_coeff=0.8,
+                 SPEC_HEAT_RATIO=1.4,
+                 GAS_CONST=287,
+                 SPEC_HEAT_CAPACITY=1005,
+                 check_dp=5,
+                 disk_depth=None,
+                 blade_density=None,
+                 poissons_ratio=None,
+                 yield_strength_dict=None,
+                 disk_solver=None):
+        super().__init__(mass_flow,
+                         axial_velocity,
+                         pressure_ratio,
+                         P0_exit,
+                         T0_exit,
+                         T0_inlet,
+                         SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                         GAS_CONST=GAS_CONST)
+        self.is_low_pressure = is_low_pressure
+        self.name = 'LPT' if is_low_pressure else 'HPT'
+        self.blade_length = min_blade_length
+        self.mean_radius = geom.get_mean_radius_from_blade_length(
+            min_blade_length, self.area_inlet)
+        self.d_stag_enthalpy = thermo.get_delta_stag_enthalpy(
+            T0_inlet - T0_exit, SPEC_HEAT_CAPACITY)
+        self.work_coeff = work_coefficient
+        self.angular_velocity = angular_velocity
+        n_stages = self.d_stag_enthalpy / (self.work_coeff * (
+            self.area_inlet * self.angular_velocity / (2 * np.pi * self.blade_length))**2)
+        # A single stage turbine divides by zero in the scalar model
+        self.no_of_stages, self.is_error = self._get_no_of_stages(n_stages, 2)
+        self.max_no_of_stages = int(self.no_of_stages.max(initial=2))
+        self.stage_mask = np.arange(
+            self.max_no_of_stages) < self.no_of_stages[:, None]
+        self.d_stag_temp_per_stage = (
+            self.T0_inlet - self.T0_exit) / (self.no_of_stages - 1)
+        self.isentropic_efficiency = isentropic_efficiency
+        self.pressure_ratios = self.__get_pressure_ratios(SPEC_HEAT_RATIO)
+        self._set_geometry_of_stages()
+        self.pressure_ratio = np.prod(
+            np.where(self.stage_mask, self.pressure_ratios, 1), axis=1)
+        self.tip_mach_nos = self.__get_tip_mach_nos(SPEC_HEAT_RATIO, GAS_CONST)
+        self.cooling = None
+        if not self.is_low_pressure:
+            self.cooling = 650 - thermo.get_static_temp(
+                self.T0_inlet, self.axial_velocity, SPEC_HEAT_RATIO, GAS_CONST)
+        stage_index = np.arange(self.max_no_of_stages)
+        self.stages = StageArray(is_compressor_stage=False,
+                                 is_low_pressure=self.is_low_pressure,
+                                 work_coeff=self.work_coeff[:, None],
+                                 axial_velocity=self.axial_velocity[:, None],
+                                 angular_velocity=self.angular_velocity[:, None],
+                                 hub_diameters=self.hub_diameters,
+                                 tip_diameters=self.tip_diameters,
+                                 reaction_mean=reaction_mean[:, None],
+                                 stag_temps=self.T0_inlet[:, None] - stage_index *
+                                 self.d_stag_temp_per_stage[:, None],
+                                 lift_coeff=lift_coeff[:, None],
+                                 disk_depth=None if disk_depth is None else disk_depth[:, None],
+                                 blade_density=None if blade_density is None else blade_density[:, None],
+                                 poissons_ratio=None if poissons_ratio is None else poissons_ratio[:, None],
+                                 yield_strength_dict=yield_strength_dict,
+                                 cooling=None if self.cooling is None else self.cooling[:, None],
+                                 check_dp=check_dp,
+                                 SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                 GAS_CONST=GAS_CONST,
+                                 stage_mask=self.stage_mask,
+                                 disk_solver=disk_solver)
+        self.is_error |= np.any(self.stages.is_error, axis=1)
+        self.is_valid = self.__check_validity(check_dp) & ~self.is_error
+
+    def __get_pressure_ratios(self, SPEC_HEAT_RATIO):
+        stag_temps = _linspace(self.T0_inlet, self.T0_exit,
+                               self.no_of_stages + 1, self.max_no_of_stages + 1)
+        return 1 / (1 - self.d_stag_temp_per_stage[:, None] / (self.isentropic_efficiency[:, None] * 0.5 * (
+            stag_temps[:, 1:] + stag_temps[:, :-1])))**(SPEC_HEAT_RATIO / (SPEC_HEAT_RATIO - 1))
+
+    def __get_tip_mach_nos(self, SPEC_HEAT_RATIO, GAS_CONST):
+        u_tips = geom.get_tangential_speed(
+            self.angular_velocity[:, None], self.tip_diameters)
+        stag_temps = _linspace(self.T0_inlet, self.T0_exit,
+                               self.no_of_stages, self.max_no_of_stages)
+        static_temps = thermo.get_static_temp(
+            stag_temps, self.axial_velocity[:, None], SPEC_HEAT_RATIO, GAS_CONST)
+        speed_of_sounds = thermo.get_speed_of_sound(
+            static_temps, SPEC_HEAT_RATIO, GAS_CONST)
+        return u_tips / speed_of_sounds
+
+    def __check_validity(self, check_dp):
+        checks = []
+        # Designs the scalar model can't build
+        checks.append((f'{self.name}.error', ~self.is_error))
+        # Axial velocity should be 150 m/s
+        checks.append((f'{self.name}.axial_velocity', self.axial_velocity == 150))
+        # Per-stage pressure ratio should be less than 2.5
+        checks.append((f'{self.name}.stage_pressure_ratio',
+                       np.all((self.pressure_ratios <= 2.5) | ~self.stage_mask, axis=1)))
+        # Mean radius stays contants across stages:
+        checks.append((f'{self.name}.mean_radius', self._constant_mean_radius(check_dp)))
+        if self.is_low_pressure:
+            # LPT can't be too close to the shaft
+            last_blade_height = np.take_along_axis(
+                self.stages.blade_height, self.no_of_stages[:, None] - 1, axis=1)[:, 0]
+            checks.append((f'{self.name}.shaft_clearance',
+                           ~(self.mean_radius - last_blade_height / 2 < 0.15)))
+        else:
+            # can't have more than 3 stages in hpt
+            checks.append((f'{self.name}.no_of_stages', self.no_of_stages <= 3))
+        # Mach number at blade tips cannot surpass 1.3
+        checks.append((f'{self.name}.tip_mach_no',
+                       np.all((self.tip_mach_nos <= 1.3) | ~self.stage_mask, axis=1)))
+        # All stages must be valid
+        checks.append((self.stages.get_rejections(self.name),
+                       np.all(self.stages.is_valid | ~self.stage_mask, axis=1)))
+        self.rejection = _get_rejection(checks)
+        return np.all([is_met for _, is_met in checks[1:]], axis=0)
+
+
+class _CompressorBatch(_TurboComponentBatch):
+    def __init__(self,
+                 is_low_pressure,
+                 mass_flow,
+                 axial_velocity,
+                 pressure_ratio,
+                 P0_exit,
+                 T0_exit,
+                 T0_inlet,
+                 angular_velocity,
+                 per_stage_pressure_ratio=1.3,
+                 reaction_mean=0.5,
+                 diffusion_factor=0.45,
+                 SPEC_HEAT_RATIO=1.4,
+                 GAS_CONST=287,
+                 SPEC_HEAT_CAPACITY=1005,
+                 check_dp=5,
+                 final_blade_length=None,
+                 mean_radius=None):
+        super().__init__(mass_flow,
+                         axial_velocity,
+                         pressure_ratio,
+                         P0_exit,
+                         T0_exit,
+                         T0_inlet,
+                         SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                         GAS_CONST=GAS_CONST)
+        self.is_low_pressure = is_low_pressure
+        self.name = 'LPC' if is_low_pressure else 'HPC'
+        self.per_stage_pressure_ratio = per_stage_pressure_ratio
+        self.no_of_stages, self.is_error = self._get_no_of_stages(
+            np.log(self.pressure_ratio) / np.log(per_stage_pressure_ratio), 1)
+        self.max_no_of_stages = int(self.no_of_stages.max(initial=1))
+        self.stage_mask = np.arange(
+            self.max_no_of_stages) < self.no_of_stages[:, None]
+        self.mean_radius = geom.get_mean_radius_from_blade_length(
+            final_blade_length, self.area_exit) if final_blade_length is not None else mean_radius
+        self.angular_velocity = angular_velocity
+        self._set_geometry_of_stages()
+        self.work_coeff = np.full_like(self.mean_radius, 0.5)
+        self.stages = StageArray(is_compressor_stage=True,
+                                 is_low_pressure=self.is_low_pressure,
+                                 work_coeff=self.work_coeff[:, None],
+                                 axial_velocity=self.axial_velocity[:, None],
+                                 angular_velocity=self.angular_velocity[:, None],
+                                 hub_diameters=self.hub_diameters,
+                                 tip_diameters=self.tip_diameters,
+                                 reaction_mean=reaction_mean[:, None],
+                                 diffusion_factor=diffusion_factor[:, None],
+                                 check_dp=check_dp,
+                                 SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                 GAS_CONST=GAS_CONST,
+                                 stage_mask=self.stage_mask)
+        self.is_valid = self.__check_validity(check_dp) & ~self.is_error
+
+    def __check_validity(self, check_dp):
+        checks = []
+        # Designs the scalar model can't build
+        checks.append((f'{self.name}.error', ~self.is_error))
+        # Axial set at 190 for compressors:
+        checks.append((f'{self.name}.axial_velocity', self.axial_velocity == 190))
+        # Pressure ratio across compressor stages can't exceed 1.3
+        checks.append((f'{self.name}.stage_pressure_ratio',
+                       np.broadcast_to(~(self.per_stage_pressure_ratio > 1.3), self.axial_velocity.shape)))
+        # Mean radius stays contants across stages:
+        checks.append((f'{self.name}.mean_radius', self._constant_mean_radius(check_dp)))
+        if not self.is_low_pressure:
+            # HPC can't be too close to the shaft
+            checks.append((f'{self.name}.shaft_clearance',
+                           ~(self.mean_radius - self.stages.blade_height[:, 0] / 2 < 0.15)))
+        # All stages must be valid
+        checks.append((self.stages.get_rejections(self.name),
+                       np.all(self.stages.is_valid | ~self.stage_mask, axis=1)))
+        self.rejection = _get_rejection(checks)
+        return np.all([is_met for _, is_met in checks[1:]], axis=0)
+
+
+class EngineBatch:
+    """
+    Evaluates many engine designs at once. Every argument accepted by Engine may be
+    given as an array; arrays are broadcast against each other and each element is
+    one design point.
+    """
+
+    def __init__(self,
+                 mass_flow,
+                 engine_diameter=2.6,
+                 bypass_ratio=7,
+                 overall_pressure_ratio=40,
+                 fan_hub_tip_ratio=0.35,
+                 fan_tip_mach_no=1.3,
+                 inner_fan_pressure_ratio=1.8,
+                 outer_fan_pressure_ratio=2.5,
+                 comp_axial_velocity=190,
+                 turbine_axial_velocity=150,
+                 lpc_pressure_ratio=2.5,
+                 per_stage_pressure_ratio=1.3,
+                 lpt_work_coefficient=2,
+                 hpt_work_coefficient=1.95,
+                 hpt_angular_velocity=900,
+                 hpt_min_blade_length=0.02,
+                 turbine_isentropic_efficiency=0.9,
+                 P_025=91802,
+                 T_025=331.86,
+                 P_03=1468830,
+                 T_03=758.17,
+                 P_041=1424765,
+                 T_041=1677.70,
+                 P_044=410468,
+                 T_044=1268.72,
+                 P_045=402258,
+                 T_045=1268.72,
+                 P_05=82688,
+                 T_05=892.91,
+                 min_blade_length=0.01,
+                 lpt_min_blade_length=0.012,
+                 lpc_reaction_mean=0.5,
+                 hpc_reaction_mean=0.5,
+                 turbine_reaction_mean=0.5,
+                 lpc_diffusion_factor=0.45,
+                 hpc_diffusion_factor=0.45,
+                 lpt_lift_coeff=1,
+                 hpt_lift_coeff=1,
+                 hpt_disk_depth=0.01,
+                 hpt_blade_density=2700,
+                 hpt_poissons_ratio=0.27,
+                 hpt_yield_strength_dict=DEFAULT_HPT_YIELD_STRENGTH,
+                 hpt_disk_solver=None,
+                 GAS_CONST=1.4,
+                 SPEC_HEAT_RATIO=287,
+                 TEMP_SEA=288.15,
+                 SPEC_HEAT_CAPACITY=1005,
+                 check_dp=5):
+        (mass_flow, engine_diameter, bypass_ratio, overall_pressure_ratio, fan_hub_tip_ratio,
+         fan_tip_mach_no, inner_fan_pressure_ratio, outer_fan_pressure_ratio, comp_axial_velocity,
+         turbine_axial_velocity, lpc_pressure_ratio, per_stage_pressure_ratio, lpt_work_coefficient,
+         hpt_work_coefficient, hpt_angular_velocity, hpt_min_blade_length,
+         turbine_isentropic_efficiency, P_025, T_025, P_03, T_03, P_041, T_041, P_044, T_044,
+         P_045, T_045, P_05, T_05, min_blade_length, lpt_min_blade_length, lpc_reaction_mean,
+         hpc_reaction_mean, turbine_reaction_mean, lpc_diffusion_factor, hpc_diffusion_factor,
+         lpt_lift_coeff, hpt_lift_coeff, hpt_disk_depth, hpt_blade_density,
+         hpt_poissons_ratio) = [np.atleast_1d(np.asarray(x, dtype=float)).ravel() for x in np.broadcast_arrays(
+             mass_flow, engine_diameter, bypass_ratio, overall_pressure_ratio, fan_hub_tip_ratio,
+             fan_tip_mach_no, inner_fan_pressure_ratio, outer_fan_pressure_ratio, comp_axial_velocity,
+             turbine_axial_velocity, lpc_pressure_ratio, per_stage_pressure_ratio, lpt_work_coefficient,
+             hpt_work_coefficient, hpt_angular_velocity, hpt_min_blade_length,
+             turbine_isentropic_efficiency, P_025, T_025, P_03, T_03, P_041, T_041, P_044, T_044,
+             P_045, T_045, P_05, T_05, min_blade_length, lpt_min_blade_length, lpc_reaction_mean,
+             hpc_reaction_mean, turbine_reaction_mean, lpc_diffusion_factor, hpc_diffusion_factor,
+             lpt_lift_coeff, hpt_lift_coeff, hpt_disk_depth, hpt_blade_density, hpt_poissons_ratio)]
+        self.size = len(mass_flow)
+        self.mass_flow = mass_flow
+        self.diameter = engine_diameter
+        self.bypass_ratio = bypass_ratio
+        self.overall_pressure_ratio = overall_pressure_ratio
+        hpt_yield_strength_dict = MaterialTable.from_dict(hpt_yield_strength_dict)
+        with np.errstate(all='ignore'):
+            self.fan = _FanBatch(engine_diameter=engine_diameter,
+                                 tip_mach_no=fan_tip_mach_no,
+                                 hub_tip_ratio=fan_hub_tip_ratio,
+                                 inner_fan_pressure_ratio=inner_fan_pressure_ratio,
+                                 outer_fan_pressure_ratio=outer_fan_pressure_ratio,
+                                 bypass_ratio=bypass_ratio,
+                                 SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                 GAS_CONST=GAS_CONST,
+                                 TEMP_SEA=TEMP_SEA)
+            self.hpt = _TurbineBatch(is_low_pressure=False,
+                                     mass_flow=self.mass_flow,
+                                     axial_velocity=turbine_axial_velocity,
+                                     pressure_ratio=P_044/P_041,
+                                     P0_exit=P_044,
+                                     T0_exit=T_044,
+                                     T0_inlet=T_041,
+                                     angular_velocity=hpt_angular_velocity,
+                                     isentropic_efficiency=turbine_isentropic_efficiency,
+                                     work_coefficient=hpt_work_coefficient,
+                                     min_blade_length=hpt_min_blade_length,
+                                     reaction_mean=turbine_reaction_mean,
+                                     lift_coeff=hpt_lift_coeff,
+                                     disk_depth=hpt_disk_depth,
+                                     blade_density=hpt_blade_density,
+                                     poissons_ratio=hpt_poissons_ratio,
+                                     yield_strength_dict=hpt_yield_strength_dict,
+                                     disk_solver=hpt_disk_solver,
+                                     SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                     GAS_CONST=GAS_CONST,
+                                     SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                     check_dp=5)
+            self.lpt = _TurbineBatch(is_low_pressure=True,
+                                     mass_flow=self.mass_flow,
+                                     axial_velocity=turbine_axial_velocity,
+                                     pressure_ratio=P_05/P_045,
+                                     P0_exit=P_05,
+                                     T0_exit=T_05,
+                                     T0_inlet=T_045,
+                                     angular_velocity=self.fan.angular_velocity,
+                                     isentropic_efficiency=turbine_isentropic_efficiency,
+                                     work_coefficient=lpt_work_coefficient,
+                                     min_blade_length=lpt_min_blade_length,
+                                     reaction_mean=turbine_reaction_mean,
+                                     lift_coeff=lpt_lift_coeff,
+                                     SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                     GAS_CONST=GAS_CONST,
+                                     SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                     check_dp=check_dp)
+            self.lpc = _CompressorBatch(is_low_pressure=True,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=comp_axial_velocity,
+                                        pressure_ratio=lpc_pressure_ratio/inner_fan_pressure_ratio,
+                                        P0_exit=P_025,
+                                        T0_exit=T_025,
+                                        T0_inlet=np.full_like(T_025, 260.73),
+                                        angular_velocity=self.fan.angular_velocity,
+                                        mean_radius=self.fan.inner_fan_mean_radius,
+                                        per_stage_pressure_ratio=per_stage_pressure_ratio,
+                                        reaction_mean=lpc_reaction_mean,
+                                        diffusion_factor=lpc_diffusion_factor,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=check_dp)
+            self.hpc = _CompressorBatch(is_low_pressure=False,
+                                        mass_flow=self.mass_flow,
+                                        axial_velocity=comp_axial_velocity,
+                                        pressure_ratio=overall_pressure_ratio/lpc_pressure_ratio,
+                                        P0_exit=P_03,
+                                        T0_exit=T_03,
+                                        T0_inlet=T_025,
+                                        angular_velocity=hpt_angular_velocity,
+                                        final_blade_length=min_blade_length,
+                                        per_stage_pressure_ratio=per_stage_pressure_ratio,
+                                        reaction_mean=hpc_reaction_mean,
+                                        diffusion_factor=hpc_diffusion_factor,
+                                        SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                        GAS_CONST=GAS_CONST,
+                                        SPEC_HEAT_CAPACITY=SPEC_HEAT_CAPACITY,
+                                        check_dp=check_dp)
+            self.is_error = self.hpt.is_error | self.lpt.is_error | \
+                self.lpc.is_error | self.hpc.is_error
+            self.is_valid = self.__check_validity() & ~self.is_error
+            self.score = np.where(self.is_error, np.nan, self.__get_score())
+
+    @property
+    def no_of_stages(self):
+        return {c.name: c.no_of_stages for c in [self.lpc, self.hpc, self.hpt, self.lpt]}
+
+    @property
+    def mean_radii(self):
+        return {c.name: c.mean_radius for c in [self.lpc, self.hpc, self.hpt, self.lpt]}
+
+    def __get_turbine_pressure_ratios(self):
+        return self.lpt.pressure_ratio * self.hpt.pressure_ratio
+
+    def __check_validity(self):
+        # Designs the scalar model can't build raise while their components are built
+        checks = [(t.rejection, ~t.is_error) for t in [self.hpt, self.lpt, self.lpc, self.hpc]]
+        # engine must have at least 0.5m clearance from ground
+        checks.append(('Engine.diameter', ~(self.diameter > 3.5)))
+        # Bypass ratio is 7
+        checks.append(('Engine.bypass_ratio', self.bypass_ratio == 7))
+        # Mean radius of lpt can't be more than 30% higher than inner fan
+        checks.append(('Engine.lpt_radius',
+                       ~(self.lpt.mean_radius > 1.3 * self.fan.inner_fan_mean_radius)))
+        # Mean radius of lpt can't be less than mean radius of hpt
+        checks.append(('Engine.lpt_below_hpt', ~(self.lpt.mean_radius < self.hpt.mean_radius)))
+        # Mean radius of lpc can't be less than mean radius of hpc
+        checks.append(('Engine.lpc_below_hpc', ~(self.lpc.mean_radius < self.hpc.mean_radius)))
+        # Mean radius of lpc can't be more than 20% higher than inner fan
+        checks.append(('Engine.lpc_radius',
+                       ~(self.lpc.mean_radius > 1.2 * self.fan.inner_fan_mean_radius)))
+        # OPR and turbine pressure ratio should roughly match
+        turbine_pressure_ratios = self.__get_turbine_pressure_ratios()
+        higher_pressure_ratio = np.maximum(
+            turbine_pressure_ratios, self.overall_pressure_ratio)
+        lower_pressure_ratio = np.minimum(
+            turbine_pressure_ratios, self.overall_pressure_ratio)
+        checks.append(('Engine.pressure_ratio_mismatch',
+                       ~(lower_pressure_ratio / higher_pressure_ratio < 0.9)))
+        # All turbo machines should be valid:
+        for t in [self.lpc, self.hpc, self.lpt, self.hpt]:
+            checks.append((t.rejection, t.is_valid))
+        # The code of the first rule each design breaks, as the scalar Engine reports it
+        self.rejection = _get_rejection(checks)
+        return np.all([is_met for _, is_met in checks[4:]], axis=0)
+
+    def __get_score(self):
+        compressors = [self.lpc, self.hpc]
+        turbines = [self.lpt, self.hpt]
+        score = 0
+        max_score = 0
+        # Award points for fewer stages:
+        score += _smooth_step_down(self.lpc.no_of_stages, 1, 4, 0, 1)
+        score += _smooth_step_down(self.hpc.no_of_stages, 9, 14, 0, 3)
+        score += _smooth_step_down(self.hpt.no_of_stages, 0, 3, -3, 3)
+        score += _smooth_step_down(self.lpt.no_of_stages, 3, 6, 0, 1)
+        max_score += 1 + 3 + 3 + 1
+        # Award points for similar hpc and hpt mean radii:
+        score += _smooth_step_down(np.abs(self.hpc.mean_radius - self.hpt.mean_radius),
+                                   0, self.diameter / 10, 0, 10)
+        max_score += 10
+        # Award points for high mean tip mach number:
+        max_tip_mach_nos = [np.max(np.where(t.stage_mask, t.tip_mach_nos, -np.inf), axis=1)
+                            for t in [self.lpt, self.hpt]]
+        mean_tip_mach_nos = (self.fan.tip_mach_no + max_tip_mach_nos[0] +
+                             max_tip_mach_nos[1]) / 3
+        score += _smooth_step_up(mean_tip_mach_nos, 0.6, 1.2, 0, 2)
+        max_score += 2
+        # Award points fot similar OPR and turbine pressure ratio:
+        turbine_pressure_ratios = self.__get_turbine_pressure_ratios()
+        higher_pressure_ratio = np.maximum(
+            turbine_pressure_ratios, self.overall_pressure_ratio)
+        lower_pressure_ratio = np.minimum(
+            turbine_pressure_ratios, self.overall_pressure_ratio)
+        score += _smooth_step_down(lower_pressure_ratio / higher_pressure_ratio,
+                                   0.9, 1, -20, 20)
+        max_score += 20
+        # Award points for low average work coefficients and flow coefficients:
+        for t in turbines:
+            if t.is_low_pressure:
+                optimal_work_coeff_range = (0.8, 1.8)
+                optimal_flow_coeff_range = (0.5, 0.65)
+            else:
+                optimal_work_coeff_range = (1, 2.4)
+                optimal_flow_coeff_range = (0.7, 11)
+            stage_score = _smooth_step_down(t.stages.work_coeff, *optimal_work_coeff_range, 0, 0.1) + \
+                _smooth_step_down(t.stages.flow_coeff, *optimal_flow_coeff_range, 0, 0.1) + \
+                _smooth_step_down(np.abs(t.stages.lift_coeff - 0.8), 0, 0.5, -0.1, 0.1)
+            score += np.sum(np.where(t.stage_mask[..., None], stage_score, 0), axis=(1, 2))
+            max_score += 0.9 * t.no_of_stages
+        for c in compressors:
+            stage_score = _smooth_step_down(c.stages.work_coeff, 0.35, 0.5, 0, 0.1) + \
+                _smooth_step_down(c.stages.flow_coeff, 0.4, 0.7, 0, 0.1) + \
+                _smooth_step_down(np.abs(c.stages.diffusion_factor - 0.45), 0, 0.2, 0, 0.1)
+            score += np.sum(np.where(c.stage_mask[..., None], stage_score, 0), axis=(1, 2))
+            max_score += 0.9 * c.no_of_stages
+        return 100 * score / max_score
@@ -0,0 +1,449 @@
+from collections.abc import Sequence
+import numpy as np
+from ..utils import (disk_stress as ds,
+                     dual,
+                     geometry as geom,
+                     instrumentation as instr,
+                     thermo)
+from ..utils.materials import MaterialTable
+
+LOCATIONS = ('mean', 'hub', 'tip')
+# Blade angles in the order of the second to last axis of StageArray.blade_angles
+COMPRESSOR_ANGLES = ('alpha_1', 'alpha_2', 'beta_1', 'beta_2')
+TURBINE_ANGLES = ('alpha_2', 'alpha_3', 'beta_2', 'beta_3')
+# Validity rules of a stage, in the order of their bits in StageArray.rejection_mask
+STAGE_RULES = ('blade_height',
+               'stag_enthalpy',
+               'beta_2_above_beta_1',
+               'flow_turning',
+               'negative_alpha',
+               'diffusion_factor',
+               'compressor_solidity',
+               'flow_deflection',
+               'lift_coeff',
+               'hub_reaction',
+               'tip_reaction',
+               'turbine_solidity',
+               'safety_factor',
+               'surface_temp')
+
+
+def get_rejected_rules(rejection_mask):
+    """
+    Returns the names of the stage rules set in a rejection mask.
+    """
+    return [rule for i, rule in enumerate(STAGE_RULES) if int(rejection_mask) >> i & 1]
+
+
+class StageArray(Sequence):
+    """
+    Struct-of-arrays representation of the stages of a turbomachine.
+
+    Stage quantities have the shape of hub_diameters (..., stages); quantities that
+    vary radially have an extra trailing axis ordered as LOCATIONS. Per-component
+    arguments must broadcast against hub_diameters, so a batch of components is
+    given as (designs, 1) columns. Indexing returns a read-only Stage view.
+
+    Only the arrays needed by later calculations are stored, in slots; blade angles
+    are one (..., stages, angles, LOCATIONS) array, and quantities that follow
+    directly from the stored ones are computed when accessed.
+    """
+
+    __slots__ = ('is_compressor_stage', 'is_low_pressure', 'hub_diameter', 'tip_diameter',
+                 'stage_mask', 'mean_radius', 'blade_height', 'angular_velocity',
+                 'axial_velocity', 'mean_tangential_speed', 'radius', 'flow_coeff',
+                 'diffusion_factor', 'lift_coeff', 'blade_angles', 'solidity', 'work_coeff',
+                 'reaction', 'no_of_blades', 'is_error', 'stag_temp', 'temp', 'density',
+                 'poissons_ratio', 'disk_internal_radius', 'surface_temp',
+                 'yield_strength_table', 'is_surface_temp_out_of_range', 'yield_strength',
+                 'disk_thickness_estimate', 'force_at_rim', 'r', 'r_mask', 'radial_stress',
+                 'hoop_stress', 'max_von_misses_stress', 'stress_safety_factor',
+                 'disk_thickness', 'rejection_mask', 'is_valid')
+
+    def __init__(self,
+                 is_compressor_stage,
+                 is_low_pressure,
+                 work_coeff,
+                 axial_velocity,
+                 angular_velocity,
+                 hub_diameters,
+                 tip_diameters,
+                 reaction_mean=0.5,
+                 cooling=None,
+                 stag_temps=None,
+                 diffusion_factor=None,
+                 lift_coeff=None,
+                 disk_depth=None,
+                 blade_density=None,
+                 poissons_ratio=None,
+                 yield_strength_dict=None,
+                 check_dp=5,
+                 SPEC_HEAT_RATIO=1.4,
+                 GAS_CONST=287,
+                 stage_mask=None,
+                 disk_solver=None):
+        self.is_compressor_stage = is_compressor_stage
+        self.is_low_pressure = is_low_pressure
+        # Dual numbers are kept, so the stages can be differentiated
+        self.hub_diameter = dual.asarray(hub_diameters, dtype=float)
+        self.tip_diameter = dual.asarray(tip_diameters, dtype=float)
+        shape = self.hub_diameter.shape
+        self.stage_mask = np.ones(shape, dtype=bool) if stage_mask is None else stage_mask
+        self.mean_radius = 0.25 * (self.tip_diameter + self.hub_diameter)
+        self.blade_height = 0.5 * (self.tip_diameter - self.hub_diameter)
+        self.angular_velocity = np.broadcast_to(angular_velocity, shape)
+        self.axial_velocity = np.broadcast_to(axial_velocity, shape)
+        self.mean_tangential_speed = geom.get_tangential_speed(
+            self.angular_velocity, self.mean_radius * 2)
+        self.radius = np.stack([self.mean_radius,
+                                self.hub_diameter / 2,
+                                self.tip_diameter / 2], axis=-1)
+        self.flow_coeff = self.__get_flow_coeffs()
+        work_coeff_mean = np.broadcast_to(work_coeff, shape)
+        reaction_mean = np.broadcast_to(reaction_mean, shape)
+        self.diffusion_factor = self.lift_coeff = None
+        if is_compressor_stage:
+            diffusion_factor_mean = np.broadcast_to(diffusion_factor, shape)
+        else:
+            lift_coeff_mean = np.broadcast_to(lift_coeff, shape)
+        # NOTE: consider setting first and last stage inlet/exit angles to 0
+        self.blade_angles = self.__get_blade_angles(
+            work_coeff_mean, reaction_mean)
+        # The inlet and outlet flow angles are the first two angles
+        alpha_in = self.blade_angles[..., 0, :]
+        alpha_out = self.blade_angles[..., 1, :]
+        self.solidity = self.__get_solidity(alpha_in[..., 0],
+                                            alpha_out[..., 0],
+                                            diffusion_factor_mean if is_compressor_stage else lift_coeff_mean)
+        # Hub and tip loading follows from the free vortex blade angles
+        flow_coeff = self.flow_coeff[..., 1:]
+        t_in = np.tan(alpha_in[..., 1:])
+        t_out = np.tan(alpha_out[..., 1:])
+        c_in = np.cos(alpha_in[..., 1:])
+        s = self.solidity[..., None]
+        radial_work_coeff = flow_coeff * \
+            (t_out - t_in) if is_compressor_stage else flow_coeff * (t_in - t_out)
+        self.work_coeff = np.concatenate(
+            [work_coeff_mean[..., None], radial_work_coeff], axis=-1)
+        self.reaction = np.concatenate(
+            [reaction_mean[..., None], 1 - 0.5 * flow_coeff * (t_out + t_in)], axis=-1)
+        if is_compressor_stage:
+            c_out = np.cos(alpha_out[..., 1:])
+            self.diffusion_factor = np.concatenate(
+                [diffusion_factor_mean[..., None],
+                 (t_out - t_in) / (2 * c_in * s) - c_in / c_out + 1], axis=-1)
+        else:
+            self.lift_coeff = np.concatenate(
+                [lift_coeff_mean[..., None],
+                 np.abs(2 * c_in**2 * (t_out - t_in) / s)], axis=-1)
+        self.no_of_blades = 2 * np.pi * self.mean_radius * self.solidity * \
+            self.rotor_aspect_ratio / self.blade_height
+        self.is_error = np.zeros(shape, dtype=bool)
+        if self.is_hpt:
+            self.stag_temp = np.broadcast_to(stag_temps, shape)
+            self.temp = thermo.get_static_temp(
+                self.stag_temp, self.axial_velocity, SPEC_HEAT_RATIO, GAS_CONST)
+            self.density = np.broadcast_to(blade_density, shape)
+            self.poissons_ratio = np.broadcast_to(poissons_ratio, shape)
+            self.disk_internal_radius = self.hub_diameter / 2 - disk_depth
+            self.surface_temp = self.temp + cooling
+            self.yield_strength = self.__get_yield_strength(
+                yield_strength_dict)
+            self.disk_thickness_estimate = self.rotor_chord_length * 2
+            self.force_at_rim = self.__get_force_at_rim()
+            if disk_solver is None:
+                with instr.timed('StageArray.disk_stresses'):
+                    self.r, self.r_mask = self.__get_disk_radii()
+                    self.radial_stress, self.hoop_stress = self.__get_radial_and_hoop_stresses()
+            else:
+                with instr.timed('StageArray.disk_stresses'):
+                    self.r, self.radial_stress, self.hoop_stress, _, disk_thickness = disk_solver.solve(
+                        self.density, self.poissons_ratio, self.angular_velocity, self.disk_internal_radius,
+                        self.hub_diameter / 2, self.no_of_blades * self.force_at_rim / (2 * np.pi),
+                        self.disk_thickness_estimate)
+                self.r_mask = np.ones(self.r.shape, dtype=bool)
+            self.max_von_misses_stress = np.max(
+                np.where(self.r_mask, self.von_misses_stress, -np.inf), axis=-1)
+            self.stress_safety_factor = self.yield_strength / self.max_von_misses_stress
+            # The solver thickness profile is the one its stresses were solved for
+            self.disk_thickness = self.__get_disk_thickness() if disk_solver is None else disk_thickness
+        with instr.timed('StageArray.check_validity'):
+            self.is_valid = self.__check_validity(check_dp)
+
+    def __len__(self):
+        return self.hub_diameter.shape[-1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('stage index out of range')
+        from .stage import Stage
+        return Stage.from_array(self, index)
+
+    @property
+    def is_hpt(self):
+        return not self.is_compressor_stage and not self.is_low_pressure
+
+    @property
+    def angle_keys(self):
+        return COMPRESSOR_ANGLES if self.is_compressor_stage else TURBINE_ANGLES
+
+    @property
+    def blade_angles_rad(self):
+        return {key: self.blade_angles[..., i, :] for i, key in enumerate(self.angle_keys)}
+
+    @property
+    def d_stag_enthalpy(self):
+        return self.work_coeff * (self.angular_velocity[..., None] * self.radius)**2
+
+    @property
+    def rotor_aspect_ratio(self):
+        return self.get_aspect_ratio('rotor')
+
+    @property
+    def rotor_chord_length(self):
+        return self.blade_height / self.rotor_aspect_ratio
+
+    @property
+    def rotor_thickness(self):
+        return 1.2 * self.rotor_chord_length
+
+    @property
+    def stator_aspect_ratio(self):
+        return self.get_aspect_ratio('stator')
+
+    @property
+    def stator_chord_length(self):
+        return self.blade_height / self.stator_aspect_ratio
+
+    @property
+    def stator_thickness(self):
+        return 1.2 * self.stator_chord_length
+
+    @property
+    def von_misses_stress(self):
+        return ds.get_von_misses_stress(self.radial_stress, self.hoop_stress)
+
+    def get_aspect_ratio(self, blade_type='stator'):
+        if self.is_compressor_stage:
+            return 1.75
+        if blade_type == 'stator':
+            # lpt or hpt stage
+            return 2.5 if self.is_low_pressure else 1.5
+        return 3 if self.is_low_pressure else 2.5
+
+    def __get_flow_coeffs(self):
+        # u = w * r at the mean, hub and tip radii
+        return self.axial_velocity[..., None] / (self.angular_velocity[..., None] * self.radius)
+
+    def __get_blade_angles(self, work_coeff, reaction):
+        flow_coeff = self.flow_coeff[..., 0]
+        term_1 = (work_coeff + 2 * reaction) / (2 * flow_coeff)
+        term_2 = (work_coeff - 2 * reaction) / (2 * flow_coeff)
+        if self.is_compressor_stage:
+            mean_angles = {'alpha_1': np.arctan((1 / flow_coeff) - term_1),
+                           'alpha_2': np.arctan((1 / flow_coeff) + term_2),
+                           'beta_1': np.arctan(-term_1),
+                           'beta_2': np.arctan(term_2)}
+        else:
+            mean_angles = {'alpha_2': np.arctan((1 / flow_coeff) + term_2),
+                           'alpha_3': np.arctan((1 / flow_coeff) - term_1),
+                           'beta_2': np.arctan(term_2),
+                           'beta_3': np.arctan(-term_1)}
+        r_m = self.radius[..., :1]
+        r = self.radius[..., 1:]
+        blade_angles = {}
+        for key, val in mean_angles.items():
+            if key.startswith('alpha'):
+                radial = np.arctan((r_m / r) * np.tan(val[..., None]))
+            else:
+                suffix = key.split('_')[1]
+                alpha = blade_angles[f'alpha_{suffix}'][..., 1:]
+                radial = np.arctan(-1/self.flow_coeff[..., 1:] + np.tan(alpha))
+            blade_angles[key] = np.concatenate(
+                [val[..., None], radial], axis=-1)
+        return np.stack([blade_angles[key] for key in self.angle_keys], axis=-2)
+
+    def __get_solidity(self, alpha_in, alpha_out, loading):
+        c1 = np.cos(alpha_in)
+        c2 = np.cos(alpha_out)
+        t2 = np.tan(alpha_out)
+        t1 = np.tan(alpha_in)
+        if self.is_compressor_stage:
+            df = loading
+            return c2 * (t2 - t1) / (2 * c1 * (df * c2 - c2 + c1))
+        z = loading
+        # Note this only works for 50% reaction because 3 === 1 for 50% reaction
+        return np.abs((2 / z) * c1**2 * (t2 - t1))
+
+    def __get_yield_strength(self, yield_strength_dict):
+        self.yield_strength_table = MaterialTable.from_dict(yield_strength_dict)
+        self.is_surface_temp_out_of_range = ~self.yield_strength_table.is_in_range(
+            self.surface_temp) & self.stage_mask
+        if self.yield_strength_table.out_of_range == 'raise':
+            # Temperatures outside the table can't be interpolated
+            self.is_error |= self.is_surface_temp_out_of_range
+        return self.yield_strength_table(self.surface_temp)
+
+    def __get_force_at_rim(self):
+        rho = self.density
+        c = self.rotor_chord_length
+        t = self.rotor_thickness
+        w = self.angular_velocity
+        r0 = self.hub_diameter / 2
+        h = self.blade_height
+        return rho * c * t * h * w**2 * (r0 + h / 2)
+
+    def __get_disk_radii(self, radial_step=0.01):
+        # Pads np.arange(r_i, r_o, radial_step) of every stage to a common length
+        r_i = self.disk_internal_radius
+        r_o = self.hub_diameter / 2
+        no_of_points = np.ceil((r_o - r_i) / radial_step)
+        delta = (r_i + radial_step) - r_i
+        j = np.arange(int(np.nanmax(np.where(self.stage_mask, no_of_points, 1),
+                                    initial=1)))
+        return r_i[..., None] + j * delta[..., None], j < no_of_points[..., None]
+
+    def __get_radial_and_hoop_stresses(self):
+        v = self.poissons_ratio[..., None]
+        p = self.density[..., None]
+        w = self.angular_velocity[..., None]
+        r_i = self.disk_internal_radius[..., None]
+        r_o = self.hub_diameter[..., None] / 2
+        r = self.r
+        n = self.no_of_blades[..., None]
+        pi = np.pi
+        f_rim = self.force_at_rim[..., None]
+        h = self.disk_thickness_estimate[..., None]
+        term_1 = p * w**2 * (3 + v) / 8
+        term_2 = r_i**2 + r_o**2
+        term_3 = r_i**2 * r_o**2 / r**2
+        term_4 = r**2 * (1 + 3*v) / (3 + v)
+        term_5 = n * f_rim * r_o / (2 * pi * h * (r_o**2 - r_i**2))
+        term_6 = (r_i / r)**2
+        radial_stress = term_1 * \
+            (term_2 - term_3 - r**2) + term_5 * (1 - term_6)
+        hoop_stress = term_1 * \
+            (term_2 + term_3 - term_4) + term_5 * (1 + term_6)
+        return radial_stress, hoop_stress
+
+    def __get_disk_thickness(self):
+        p = self.density[..., None]
+        w = self.angular_velocity[..., None]
+        s = self.max_von_misses_stress[..., None]
+        r_o = self.hub_diameter[..., None] / 2
+        B = p * w**2 / (2 * s)
+        return self.disk_thickness_estimate[..., None] * np.exp(B * (r_o**2 - self.r**2))
+
+    def get_margins(self):
+        """
+        Returns {rule: margin of every stage} for the rules that are inequalities,
+        positive when a stage meets the rule and negative when it breaks it, at its
+        worst blade location. Angle margins are in degrees.
+        """
+        angles = {key: np.rad2deg(val)
+                  for key, val in self.blade_angles_rad.items()}
+        margins = {'blade_height': self.blade_height - 0.01}
+        if self.is_compressor_stage:
+            margins['beta_2_above_beta_1'] = np.min(np.abs(angles['beta_1']) -
+                                                    np.abs(angles['beta_2']), axis=-1)
+            margins['flow_turning'] = np.min(
+                45 - np.abs(angles['beta_1'] - angles['beta_2']), axis=-1)
+            margins['negative_alpha'] = np.min(
+                np.minimum(angles['alpha_1'], angles['alpha_2']), axis=-1)
+            margins['diffusion_factor'] = np.min(0.5 - self.diffusion_factor, axis=-1)
+            margins['compressor_solidity'] = np.minimum(self.solidity - 0.67, 1.33 - self.solidity)
+        else:
+            flow_deflection = np.abs(angles['alpha_2'] - angles['alpha_3'])
+            margins['flow_deflection'] = np.min(
+                np.minimum(flow_deflection - 75, 120 - flow_deflection), axis=-1)
+            margins['lift_coeff'] = np.min(
+                np.minimum(self.lift_coeff - 0.7, 0.9 - self.lift_coeff), axis=-1)
+            margins['hub_reaction'] = self.reaction[..., 1]
+            margins['tip_reaction'] = 1 - self.reaction[..., 2]
+            margins['turbine_solidity'] = np.minimum(self.solidity - 1, 2 - self.solidity)
+            if self.is_hpt:
+                margins['safety_factor'] = self.stress_safety_factor - 1.5
+        return margins
+
+    def get_rejection(self, name):
+        """
+        Returns the code of the first broken rule of the first invalid stage, as
+        '<name>.stage_<number>.<rule>', or None if every stage is valid.
+        """
+        invalid_stages = np.flatnonzero(self.rejection_mask)
+        if not invalid_stages.size:
+            return None
+        i = invalid_stages[0]
+        return f'{name}.stage_{i + 1}.{get_rejected_rules(self.rejection_mask[i])[0]}'
+
+    def get_rejections(self, name):
+        """
+        Vectorised get_rejection over the leading axes of a batch of components:
+        returns an object array of the code of every component, or None.
+        """
+        rejection_mask = np.where(self.stage_mask, self.rejection_mask, 0)
+        rejections = np.full(rejection_mask.shape[:-1], None, dtype=object)
+        is_rejected = np.any(rejection_mask != 0, axis=-1)
+        first_stages = np.argmax(rejection_mask != 0, axis=-1)
+        first_masks = np.take_along_axis(rejection_mask, first_stages[..., None], axis=-1)[..., 0]
+        for index in zip(*np.nonzero(is_rejected)):
+            rejections[index] = (f'{name}.stage_{first_stages[index] + 1}.'
+                                 f'{get_rejected_rules(first_masks[index])[0]}')
+        return rejections
+
+    def __check_validity(self, check_dp):
+        self.rejection_mask = np.zeros(self.blade_height.shape, dtype=np.uint16)
+
+        def reject(rule, is_valid):
+            self.rejection_mask |= np.where(
+                is_valid, 0, 1 << STAGE_RULES.index(rule)).astype(np.uint16)
+
+        # blade heights cannot be below 10mm
+        reject('blade_height', ~(self.blade_height < 0.01))
+        # a1 and a3=0 for first stage of lpc and last stage of hpc respectively
+
+        # stagnation enthalpy change stays constant for any location
+        d_stag_enthalpy = np.round(self.d_stag_enthalpy, check_dp)
+        reject('stag_enthalpy', np.all(d_stag_enthalpy ==
+                                       d_stag_enthalpy[..., :1], axis=-1))
+        angles = {key: np.rad2deg(val)
+                  for key, val in self.blade_angles_rad.items()}
+        # if a compressor stage:
+        if self.is_compressor_stage:
+            # abs(b2) has to be less that abs(b1):
+            reject('beta_2_above_beta_1', ~np.any(np.abs(angles['beta_2']) >
+                                                  np.abs(angles['beta_1']), axis=-1))
+            # b1-b2<45 for compressors
+            reject('flow_turning', ~np.any(
+                np.abs(angles['beta_1'] - angles['beta_2']) > 45, axis=-1))
+            # a1 and a2 have to be positive:
+            reject('negative_alpha', ~np.any((angles['alpha_1'] <= 0) |
+                                             (angles['alpha_2'] <= 0), axis=-1))
+            # Diffusion factor for compressors to be max 0.5
+            reject('diffusion_factor', ~np.any(self.diffusion_factor > 0.5, axis=-1))
+            reject('compressor_solidity', (0.67 <= self.solidity) & (self.solidity <= 1.33))
+        # if a turbine stage:
+        else:
+            # 75<a1-a2<120 for turbine (flow deflection)
+            flow_deflection = np.abs(angles['alpha_2'] - angles['alpha_3'])
+            reject('flow_deflection', np.all((75 < flow_deflection) &
+                                             (flow_deflection < 120), axis=-1))
+            # lift coefficient for turbines to be about 0.8
+            reject('lift_coeff', np.all((0.7 <= self.lift_coeff) &
+                                        (self.lift_coeff <= 0.9), axis=-1))
+            # reaction has to be greater than 0 at hub for turbines
+            reject('hub_reaction', ~(self.reaction[..., 1] < 0))
+            # reaction has to be less than 1 at tip for turbines
+            reject('tip_reaction', ~(self.reaction[..., 2] > 1))
+            # solidity for turbines is between 1 and 2
+            reject('turbine_solidity', (1 <= self.solidity) & (self.solidity <= 2))
+            # Safety factor on turbine blades to be atleast 1.5-2
+            if self.is_hpt:
+                reject('safety_factor', ~(self.stress_safety_factor < 1.5))
+                if self.yield_strength_table.out_of_range == 'reject':
+                    reject('surface_temp', ~self.is_surface_temp_out_of_range)
+        return self.rejection_mask == 0
@@ -1,7 +1,8 @@
 from .turbo_component import TurboComponent
 from ..utils import (geometry as geom,
+                     instrumentation as instr,
                      thermo)
-from .stage import Stage
+from .stage_array import StageArray
 import numpy as np
 
 
@@ -27,6 +28,8 @@ class Turbine(TurboComponent):
                  blade_density=None,
                  poissons_ratio=None,
                  yield_strength_dict=None,
+                 disk_solver=None,
+                 build_stages=True,
                  **kwargs):
         super().__init__(mass_flow,
                          axial_velocity,
@@ -50,7 +53,8 @@ class Turbine(TurboComponent):
             self.T0_inlet - self.T0_exit) / (self.no_of_stages-1)
         self.isentropic_efficiency = isentropic_efficiency
         self.pressure_ratios = self.__get_pressure_ratios(SPEC_HEAT_RATIO)
-        self.hub_diameters, self.tip_diameters, self.hub_tip_ratios, self.areas, self.blade_lengths = self.__get_geometry_of_stages()
+        with instr.timed(f'{self.name}.geometry_of_stages'):
+            self.hub_diameters, self.tip_diameters, self.hub_tip_ratios, self.areas, self.blade_lengths = self.__get_geometry_of_stages()
         self.pressure_ratio = np.prod(self.pressure_ratios)
         self.tip_mach_nos = self.__get_tip_mach_nos(SPEC_HEAT_RATIO, GAS_CONST)
         self.mean_tangential_speed = geom.get_tangential_speed(
@@ -64,27 +68,72 @@ class Turbine(TurboComponent):
             self.cooling = 650 - \
                 thermo.get_static_temp(
                     self.T0_inlet, self.axial_velocity, SPEC_HEAT_RATIO, GAS_CONST)
-        self.stages = [Stage(is_compressor_stage=False,
-                             is_low_pressure=self.is_low_pressure,
-                             number=i + 1,
-                             work_coeff=self.work_coeff,
-                             axial_velocity=self.axial_velocity,
-                             angular_velocity=self.angular_velocity,
-                             hub_diameter=self.hub_diameters[i],
-                             tip_diameter=self.tip_diameters[i],
-                             reaction_mean=reaction_mean,
-                             stag_temp=self.T0_inlet - i * self.d_stag_temp_per_stage,
-                             lift_coeff=lift_coeff,
-                             disk_depth=disk_depth,
-                             blade_density=blade_density,
-                             poissons_ratio=poissons_ratio,
-                             yield_strength_dict=yield_strength_dict,
-                             cooling=self.cooling if not self.is_low_pressure else None,
-                             check_dp=check_dp,
-                             SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
-                             GAS_CONST=GAS_CONST,
-                             ) for i in range(self.no_of_stages)]
-        self.is_valid = self.__check_validity(check_dp)
+        self.stages = None
+        self.is_error = False
+        stage_kwargs = dict(reaction_mean=reaction_mean,
+                            lift_coeff=lift_coeff,
+                            disk_depth=disk_depth,
+                            blade_density=blade_density,
+                            poissons_ratio=poissons_ratio,
+                            yield_strength_dict=yield_strength_dict,
+                            disk_solver=disk_solver,
+                            check_dp=check_dp,
+                            SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                            GAS_CONST=GAS_CONST)
+        if build_stages:
+            self.__build_stages(**stage_kwargs)
+        else:
+            # Stages are built on demand by build_stages
+            self.__stage_kwargs = stage_kwargs
+            with instr.timed(f'{self.name}.check_validity'):
+                self.is_valid = self.__check_validity(check_dp)
+
+    def build_stages(self):
+        if self.stages is None:
+            self.__build_stages(**self.__stage_kwargs)
+            del self.__stage_kwargs
+
+    def __build_stages(self,
+                       reaction_mean,
+                       lift_coeff,
+                       disk_depth,
+                       blade_density,
+                       poissons_ratio,
+                       yield_strength_dict,
+                       disk_solver,
+                       check_dp,
+                       SPEC_HEAT_RATIO,
+                       GAS_CONST):
+        with instr.timed(f'{self.name}.build_stages'):
+            stages = StageArray(is_compressor_stage=False,
+                                is_low_pressure=self.is_low_pressure,
+                                work_coeff=self.work_coeff,
+                                axial_velocity=self.axial_velocity,
+                                angular_velocity=self.angular_velocity,
+                                hub_diameters=self.hub_diameters,
+                                tip_diameters=self.tip_diameters,
+                                reaction_mean=reaction_mean,
+                                stag_temps=self.T0_inlet -
+                                np.arange(self.no_of_stages) *
+                                self.d_stag_temp_per_stage,
+                                lift_coeff=lift_coeff,
+                                disk_depth=disk_depth,
+                                blade_density=blade_density,
+                                poissons_ratio=poissons_ratio,
+                                yield_strength_dict=yield_strength_dict,
+                                cooling=self.cooling if not self.is_low_pressure else None,
+                                check_dp=check_dp,
+                                SPEC_HEAT_RATIO=SPEC_HEAT_RATIO,
+                                GAS_CONST=GAS_CONST,
+                                disk_solver=disk_solver)
+        # Stages that can't be built are not kept, so build_stages raises again
+        if np.any(stages.is_error):
+            self.is_error = True
+            raise ValueError(
+                "Input temperature is outside the provided temperature range.")
+        self.stages = stages
+        with instr.timed(f'{self.name}.check_validity'):
+            self.is_valid = self.__check_validity(check_dp)
 
     def __str__(self):
         properties = {f'{self.name} no of stages: {self.no_of_stages}',
@@ -99,6 +148,23 @@ class Turbine(TurboComponent):
                       f'{self.name} pressure ratio: {self.pressure_ratio}'}
         return self.name + super().__str__() + ':' + '\n' + '\n'.join(properties)
 
+    def get_constraint_margins(self):
+        """
+        Returns {code: margin} for the rules of the turbine that are inequalities,
+        positive when a rule is met, with every stage rule at its worst stage.
+        """
+        self.build_stages()
+        margins = {f'{self.name}.stage_pressure_ratio': 2.5 - np.max(self.pressure_ratios),
+                   f'{self.name}.tip_mach_no': 1.3 - np.max(self.tip_mach_nos)}
+        if self.is_low_pressure:
+            margins[f'{self.name}.shaft_clearance'] = self.mean_radius - \
+                self.blade_lengths[-1] / 2 - 0.15
+        else:
+            margins[f'{self.name}.no_of_stages'] = 3 - self.no_of_stages
+        margins.update({f'{self.name}.{rule}': np.min(margin)
+                        for rule, margin in self.stages.get_margins().items()})
+        return margins
+
     def __get_no_of_stages(self):
         n_stages = self.d_stag_enthalpy / (self.work_coeff * (
             self.area_inlet * self.angular_velocity / (2 * np.pi * self.blade_length))**2)
@@ -141,35 +207,39 @@ class Turbine(TurboComponent):
         return tip_mach_nos
 
     def __check_validity(self, check_dp):
+        self.rejection = self.__get_rejection(check_dp)
+        return self.rejection is None
+
+    def __get_rejection(self, check_dp):
         # Axial velocity should be 150 m/s
         if self.axial_velocity != 150:
-            return False
+            return f'{self.name}.axial_velocity'
         # Per-stage pressure ratio should be less than 2.5
         if not all(pr <= 2.5 for pr in self.pressure_ratios):
-            return False
+            return f'{self.name}.stage_pressure_ratio'
         # Mean radius stays contants across stages:
-        if not len(set(round(stage.mean_radius, check_dp)
-                       for stage in self.stages)) <= 1:
-            return False
+        stage_mean_radii = 0.25 * (self.tip_diameters + self.hub_diameters)
+        if not np.unique(np.round(stage_mean_radii, check_dp)).size <= 1:
+            return f'{self.name}.mean_radius'
 
         # For LPT:
         if self.is_low_pressure:
             # LPT can't be too close to the shaft
             # # NOTE: idk what too close means: assume 0.15m
-            if self.mean_radius - self.stages[-1].blade_height / 2 < 0.15:
-                return False
+            if self.mean_radius - self.blade_lengths[-1] / 2 < 0.15:
+                return f'{self.name}.shaft_clearance'
         # For HPT:
         else:
             # can't have more than 3 stages in hpt
-            if len(self.stages) > 3:
-                return False
+            if self.no_of_stages > 3:
+                return f'{self.name}.no_of_stages'
 
         # Mach number at blade tips cannot surpass 1.3
         if not all(tip_mach_no <= 1.3 for tip_mach_no in self.tip_mach_nos):
-            return False
+            return f'{self.name}.tip_mach_no'
 
         # All stages must be valid
-        if not all(stage.is_valid for stage in self.stages):
-            return False
+        if self.stages is not None and not np.all(self.stages.is_valid):
+            return self.stages.get_rejection(self.name)
 
-        return True
+        return None
@@ -1,34 +1,32 @@
+import numbers
 import numpy as np
 import matplotlib.pyplot as plt
+from . import dual
 
 
 def smooth_step_up(x, start, end, min_y, max_y):
     height = max_y - min_y
-    # Convert x to a numpy array if it's a float
-    if isinstance(x, float):
-        x = np.array([x])
-    # Calculate the normalized value of x
-    t = (x - start) / (end - start)
+    if isinstance(x, numbers.Real):
+        # Scalar fast path, without building arrays
+        t = min(max((x - start) / (end - start), 0), 1)
+        return height * (t * t * (3 - 2 * t)) + min_y
+    # Calculate the normalized value of x, clipped to the step
+    t = np.clip((dual.asarray(x) - start) / (end - start), 0, 1)
     # Apply the smooth step function
-    smooth_t = t * t * (3 - 2 * t)
-    # Calculate the value of the step function
-    step_value = np.where(x < start, 0, np.where(
-        x >= end, height, height * smooth_t))
+    step_value = height * (t * t * (3 - 2 * t))
     # Return the final value
     return step_value.squeeze() + min_y
 
 
 def smooth_step_down(x, start, end, min_y, max_y):
     height = max_y - min_y
-    # Convert x to a numpy array if it's a float
-    if isinstance(x, float):
-        x = np.array([x])
-    # Calculate the normalized value of x
-    t = (x - start) / (end - start)
+    if isinstance(x, numbers.Real):
+        # Scalar fast path, without building arrays
+        t = min(max((x - start) / (end - start), 0), 1)
+        return height * (1 - t * t * (3 - 2 * t)) + min_y
+    # Calculate the normalized value of x, clipped to the step
+    t = np.clip((dual.asarray(x) - start) / (end - start), 0, 1)
     # Apply the smooth step function
-    smooth_t = t * t * (3 - 2 * t)
-    # Calculate the value of the step function
-    step_value = np.where(x < start, height, np.where(
-        x >= end, 0, height * (1 - smooth_t)))
+    step_value = height * (1 - t * t * (3 - 2 * t))
     # Return the final value
     return step_value.squeeze() + min_y
@@ -0,0 +1,138 @@
+from collections import namedtuple
+import numpy as np
+
+DiskSolution = namedtuple('DiskSolution', ['r',
+                                           'radial_stress',
+                                           'hoop_stress',
+                                           'von_misses_stress',
+                                           'thickness'])
+
+
+def get_von_misses_stress(radial_stress, hoop_stress):
+    return np.sqrt(radial_stress**2 + hoop_stress**2 - radial_stress * hoop_stress)
+
+
+def get_uniform_disk_stresses(r, density, poissons_ratio, angular_velocity,
+                              internal_radius, external_radius, rim_load, thickness):
+    """
+    Closed-form radial and hoop stresses of a rotating disk of uniform thickness with
+    a free bore, loaded at the rim by rim_load (the rim force per radian).
+    """
+    v, r_i, r_o = poissons_ratio, internal_radius, external_radius
+    term_1 = density * angular_velocity**2 * (3 + v) / 8
+    term_2 = r_i**2 + r_o**2
+    term_3 = r_i**2 * r_o**2 / r**2
+    term_4 = r**2 * (1 + 3*v) / (3 + v)
+    term_5 = rim_load * r_o / (thickness * (r_o**2 - r_i**2))
+    term_6 = (r_i / r)**2
+    radial_stress = term_1 * (term_2 - term_3 - r**2) + term_5 * (1 - term_6)
+    hoop_stress = term_1 * (term_2 + term_3 - term_4) + term_5 * (1 + term_6)
+    return radial_stress, hoop_stress
+
+
+def get_uniform_strength_thickness(r, density, angular_velocity, external_radius,
+                                   thickness_at_rim, stress):
+    # Thickness profile under which a disk is equally stressed everywhere
+    B = density * angular_velocity**2 / (2 * stress)
+    return thickness_at_rim * np.exp(B * (external_radius**2 - r**2))
+
+
+class DiskSolver:
+    """
+    Rotating HPT disk stresses on radial_points radii from the bore to the rim, for
+    arrays of disks at once (every input must broadcast to the disk shape, e.g.
+    (designs, stages)). The uniform disk is solved in closed form. With
+    variable_thickness, the thickness is set to the uniform-strength profile for the
+    peak von Mises stress, and the plane-stress equations of a disk of varying
+    thickness h(r)
+
+        d(h r s_r)/dr = h s_t - density w^2 h r^2,   s_t = E u / r + v s_r,
+        du/dr = (1 - v^2) s_r / E - v u / r
+
+    are integrated with fourth-order Runge-Kutta for that profile, iterations times.
+    The bore is free and the rim carries rim_load; the stresses do not depend on E.
+    """
+
+    def __init__(self, radial_points=16, variable_thickness=True, iterations=1):
+        if radial_points < 2:
+            raise ValueError('A disk needs at least two radial points.')
+        self.radial_points = radial_points
+        self.variable_thickness = variable_thickness
+        self.iterations = iterations
+        # Fractions of the disk depth at the grid radii and at the step midpoints,
+        # shared by every disk solved
+        self.__fractions = np.linspace(0, 1, radial_points)
+        self.__mid_fractions = 0.5 * \
+            (self.__fractions[1:] + self.__fractions[:-1])
+
+    def get_radii(self, internal_radius, external_radius):
+        depth = (external_radius - internal_radius)[..., None]
+        return internal_radius[..., None] + self.__fractions * depth
+
+    def solve(self, density, poissons_ratio, angular_velocity, internal_radius,
+              external_radius, rim_load, thickness):
+        density, poissons_ratio, angular_velocity, internal_radius, external_radius, rim_load, thickness = \
+            [np.asarray(x, dtype=float)[..., None] for x in np.broadcast_arrays(
+                density, poissons_ratio, angular_velocity, internal_radius,
+                external_radius, rim_load, thickness)]
+        r = self.get_radii(internal_radius[..., 0], external_radius[..., 0])
+        radial_stress, hoop_stress = get_uniform_disk_stresses(r, density, poissons_ratio, angular_velocity,
+                                                               internal_radius, external_radius, rim_load, thickness)
+        von_misses_stress = get_von_misses_stress(radial_stress, hoop_stress)
+        thickness = np.broadcast_to(thickness, r.shape)
+        if not self.variable_thickness:
+            return DiskSolution(r, radial_stress, hoop_stress, von_misses_stress, thickness)
+        r_mid = internal_radius + self.__mid_fractions * \
+            (external_radius - internal_radius)
+        thickness_at_rim = thickness[..., -1:]
+        for _ in range(self.iterations):
+            max_von_misses_stress = np.max(
+                von_misses_stress, axis=-1, keepdims=True)
+            profile = [get_uniform_strength_thickness(radii, density, angular_velocity, external_radius,
+                                                      thickness_at_rim, max_von_misses_stress)
+                       for radii in (r, r_mid)]
+            radial_stress, hoop_stress = self.__integrate(r, r_mid, *profile, density, poissons_ratio,
+                                                          angular_velocity, rim_load)
+            von_misses_stress = get_von_misses_stress(
+                radial_stress, hoop_stress)
+            thickness = profile[0]
+        return DiskSolution(r, radial_stress, hoop_stress, von_misses_stress, thickness)
+
+    @staticmethod
+    def __get_system(r, h, density, poissons_ratio, angular_velocity):
+        # d/dr (u, F, 1) = A (u, F, 1) for F = h r s_r, with E = 1
+        v = poissons_ratio
+        A = np.zeros(r.shape + (3, 3))
+        A[..., 0, 0] = -v / r
+        A[..., 0, 1] = (1 - v**2) / (h * r)
+        A[..., 1, 0] = h / r
+        A[..., 1, 1] = v / r
+        A[..., 1, 2] = -density * angular_velocity**2 * h * r**2
+        return A
+
+    def __integrate(self, r, r_mid, h, h_mid, density, poissons_ratio, angular_velocity, rim_load):
+        step = (r[..., 1:] - r[..., :-1])[..., None, None]
+        A_0, A_mid, A_1 = (self.__get_system(radii, thickness, density, poissons_ratio, angular_velocity)
+                           for radii, thickness in [(r[..., :-1], h[..., :-1]),
+                                                    (r_mid, h_mid),
+                                                    (r[..., 1:], h[..., 1:])])
+        # The system is linear, so every Runge-Kutta step is a matrix, built for all
+        # steps at once
+        k_1 = A_0
+        k_2 = A_mid + 0.5 * step * (A_mid @ k_1)
+        k_3 = A_mid + 0.5 * step * (A_mid @ k_2)
+        k_4 = A_1 + step * (A_1 @ k_3)
+        steps = np.eye(3) + step / 6 * (k_1 + 2 * k_2 + 2 * k_3 + k_4)
+        # Two solutions from the free bore, with bore displacements of 0 and 1
+        states = np.empty(r.shape + (3, 2))
+        states[..., 0, :, :] = [[0, 1], [0, 0], [1, 1]]
+        for i in range(r.shape[-1] - 1):
+            states[..., i + 1, :, :] = steps[..., i, :, :] @ states[..., i, :, :]
+        # Combine them so the rim carries the rim load: F(r_o) = rim_load
+        F_rim = states[..., -1:, 1, :]
+        a = (rim_load - F_rim[..., 0]) / (F_rim[..., 1] - F_rim[..., 0])
+        u = states[..., 0, 0] + a * (states[..., 0, 1] - states[..., 0, 0])
+        F = states[..., 1, 0] + a * (states[..., 1, 1] - states[..., 1, 0])
+        radial_stress = F / (h * r)
+        hoop_stress = u / r + poissons_ratio * radial_stress
+        return radial_stress, hoop_stress
@@ -0,0 +1,383 @@
+import numpy as np
+
+# Derivatives of unary ufuncs as functions of their input and output
+_UNARY_DERIVATIVES = {
+    np.negative: lambda x, y: -np.ones_like(x),
+    np.positive: lambda x, y: np.ones_like(x),
+    np.sqrt: lambda x, y: 0.5 / y,
+    np.exp: lambda x, y: y,
+    np.log: lambda x, y: 1 / x,
+    np.sin: lambda x, y: np.cos(x),
+    np.cos: lambda x, y: -np.sin(x),
+    np.tan: lambda x, y: 1 + y**2,
+    np.arctan: lambda x, y: 1 / (1 + x**2),
+    np.arcsin: lambda x, y: 1 / np.sqrt(1 - x**2),
+    np.arccos: lambda x, y: -1 / np.sqrt(1 - x**2),
+    np.absolute: lambda x, y: np.sign(x),
+    np.square: lambda x, y: 2 * x,
+    np.reciprocal: lambda x, y: -y**2,
+    np.rad2deg: lambda x, y: np.full_like(x, 180 / np.pi),
+    np.deg2rad: lambda x, y: np.full_like(x, np.pi / 180),
+    np.degrees: lambda x, y: np.full_like(x, 180 / np.pi),
+    np.radians: lambda x, y: np.full_like(x, np.pi / 180),
+}
+# Piecewise constant ufuncs, with zero derivative
+_STEP_UFUNCS = {np.ceil, np.floor, np.rint, np.trunc, np.sign}
+# Ufuncs of the values only, such as comparisons, which return plain arrays
+_VALUE_UFUNCS = {np.less, np.less_equal, np.greater, np.greater_equal, np.equal, np.not_equal,
+                 np.isnan, np.isfinite, np.isinf, np.logical_and, np.logical_or, np.logical_not,
+                 np.logical_xor, np.signbit}
+# Array functions implemented for duals
+_FUNCTIONS = {}
+
+
+def _implements(*functions):
+    def register(function):
+        for numpy_function in functions:
+            _FUNCTIONS[numpy_function] = function
+        return function
+    return register
+
+
+class Dual:
+    """
+    Forward-mode dual number: a value, scalar or array, with its gradient with
+    respect to a fixed set of variables in an extra trailing axis of grad. NumPy
+    ufuncs and the array functions used by the engine model (np.linspace,
+    np.concatenate, np.where, np.max, np.interp, ...) propagate the gradient, so
+    formulas written for floats and arrays give derivatives when passed duals.
+    Comparisons, rounding and validity checks act on the value alone, and
+    piecewise-constant functions such as np.ceil have a zero gradient.
+    """
+
+    __slots__ = ('value', 'grad')
+    # Binary operators with ndarrays on the left dispatch to __array_ufunc__
+    __array_priority__ = 100
+
+    def __init__(self, value, grad):
+        self.value = value
+        self.grad = grad
+
+    @property
+    def shape(self):
+        return np.shape(self.value)
+
+    @property
+    def ndim(self):
+        return np.ndim(self.value)
+
+    @property
+    def size(self):
+        return np.size(self.value)
+
+    @property
+    def no_of_variables(self):
+        return self.grad.shape[-1]
+
+    def __repr__(self):
+        return f'Dual({self.value!r}, grad={self.grad!r})'
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, index):
+        index = index if isinstance(index, tuple) else (index,)
+        # An ellipsis would otherwise expand over the gradient axis
+        grad_index = index + (slice(None),) if any(i is Ellipsis for i in index) else index
+        return Dual(self.value[index], self.grad[grad_index])
+
+    def __float__(self):
+        return float(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+
+    def squeeze(self):
+        axes = tuple(i for i, length in enumerate(self.shape) if length == 1)
+        return Dual(np.squeeze(self.value, axis=axes), np.squeeze(self.grad, axis=axes))
+
+    def __array__(self, dtype=None, copy=None):
+        # Converting to a plain array would silently drop the gradient
+        raise TypeError(
+            'Dual numbers cannot be converted to arrays; use get_value.')
+
+    def __add__(self, other): return np.add(self, other)
+    def __radd__(self, other): return np.add(other, self)
+    def __sub__(self, other): return np.subtract(self, other)
+    def __rsub__(self, other): return np.subtract(other, self)
+    def __mul__(self, other): return np.multiply(self, other)
+    def __rmul__(self, other): return np.multiply(other, self)
+    def __truediv__(self, other): return np.true_divide(self, other)
+    def __rtruediv__(self, other): return np.true_divide(other, self)
+    def __pow__(self, other): return np.power(self, other)
+    def __rpow__(self, other): return np.power(other, self)
+    def __neg__(self): return np.negative(self)
+    def __pos__(self): return self
+    def __abs__(self): return np.absolute(self)
+    def __lt__(self, other): return np.less(self, other)
+    def __le__(self, other): return np.less_equal(self, other)
+    def __gt__(self, other): return np.greater(self, other)
+    def __ge__(self, other): return np.greater_equal(self, other)
+    def __eq__(self, other): return np.equal(self, other)
+    def __ne__(self, other): return np.not_equal(self, other)
+    __hash__ = None
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs.get('out') is not None:
+            return NotImplemented
+        values = [get_value(x) for x in inputs]
+        if ufunc in _VALUE_UFUNCS:
+            return ufunc(*values, **kwargs)
+        value = ufunc(*values, **kwargs)
+        if ufunc in _STEP_UFUNCS:
+            return Dual(value, np.zeros(np.shape(value) + (self.no_of_variables,)))
+        if ufunc in _UNARY_DERIVATIVES:
+            x = inputs[0]
+            return Dual(value, _scale(x.grad, _UNARY_DERIVATIVES[ufunc](x.value, value)))
+        a, b = inputs
+        (va, vb), (ga, gb) = values, (get_grad(a), get_grad(b))
+        if ufunc is np.add:
+            return _binary(value, ga, gb)
+        if ufunc is np.subtract:
+            return _binary(value, ga, None if gb is None else -gb)
+        if ufunc is np.multiply:
+            return _binary(value, _scale(ga, vb), _scale(gb, va))
+        if ufunc is np.true_divide:
+            return _binary(value, _scale(ga, 1 / vb), _scale(gb, -value / vb))
+        if ufunc is np.power:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_a = np.log(va) if gb is not None else None
+            return _binary(value, _scale(ga, vb * np.power(va, vb - 1)),
+                           None if gb is None else _scale(gb, value * log_a))
+        if ufunc in (np.maximum, np.minimum, np.fmax, np.fmin):
+            is_a = np.asarray((va >= vb) if ufunc in (np.maximum, np.fmax) else (va <= vb))
+            return _binary(value, _scale(ga, is_a), _scale(gb, ~is_a))
+        if ufunc is np.arctan2:
+            denominator = va**2 + vb**2
+            return _binary(value, _scale(ga, vb / denominator), _scale(gb, -va / denominator))
+        return NotImplemented
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func not in _FUNCTIONS:
+            return NotImplemented
+        return _FUNCTIONS[func](*args, **kwargs)
+
+
+def _scale(grad, factor):
+    return None if grad is None else grad * np.asarray(factor)[..., None]
+
+
+def _add_grads(ga, gb):
+    if ga is None:
+        return gb
+    if gb is None:
+        return ga
+    return ga + gb
+
+
+def _binary(value, ga, gb):
+    # The gradient of a binary ufunc, broadcast to the shape of its value
+    grad = _add_grads(ga, gb)
+    return Dual(value, np.broadcast_to(grad, np.shape(value) + grad.shape[-1:]))
+
+
+def get_value(x):
+    return x.value if isinstance(x, Dual) else x
+
+
+def get_grad(x):
+    return x.grad if isinstance(x, Dual) else None
+
+
+def asarray(x, dtype=None):
+    """
+    np.asarray that leaves duals as they are.
+    """
+    return x if isinstance(x, Dual) else np.asarray(x, dtype=dtype)
+
+
+def variables(var_dict):
+    """
+    Returns the values of var_dict as duals, each with a unit gradient with respect
+    to itself, in the order of the keys.
+    """
+    identity = np.eye(len(var_dict))
+    return {key: Dual(float(value), identity[i]) for i, (key, value) in enumerate(var_dict.items())}
+
+
+def get_gradient_dict(x, keys):
+    """
+    Returns the gradient of a scalar x as {key: derivative}, zero if x is not a dual.
+    """
+    grad = get_grad(x)
+    return {key: 0.0 if grad is None else float(grad[i]) for i, key in enumerate(keys)}
+
+
+def _as_dual(x, no_of_variables):
+    if isinstance(x, Dual):
+        return x
+    x = np.asarray(x)
+    return Dual(x, np.zeros(x.shape + (no_of_variables,)))
+
+
+def _grad_axis(axis):
+    # Negative axes of a value count from before the gradient axis
+    return axis - 1 if axis < 0 else axis
+
+
+def _no_of_variables(*xs):
+    return next(x.no_of_variables for x in xs if isinstance(x, Dual))
+
+
+@_implements(np.broadcast_to)
+def _broadcast_to(x, shape, subok=False):
+    shape = tuple(np.atleast_1d(shape)) if not isinstance(shape, tuple) else shape
+    return Dual(np.broadcast_to(x.value, shape),
+                np.broadcast_to(x.grad, shape + (x.no_of_variables,)))
+
+
+@_implements(np.stack)
+def _stack(arrays, axis=0):
+    n = _no_of_variables(*arrays)
+    arrays = [_as_dual(x, n) for x in arrays]
+    return Dual(np.stack([x.value for x in arrays], axis=axis),
+                np.stack([x.grad for x in arrays], axis=_grad_axis(axis)))
+
+
+@_implements(np.concatenate)
+def _concatenate(arrays, axis=0):
+    n = _no_of_variables(*arrays)
+    arrays = [_as_dual(x, n) for x in arrays]
+    return Dual(np.concatenate([x.value for x in arrays], axis=axis),
+                np.concatenate([x.grad for x in arrays], axis=_grad_axis(axis)))
+
+
+@_implements(np.where)
+def _where(condition, x, y):
+    n = _no_of_variables(x, y)
+    x, y = _as_dual(x, n), _as_dual(y, n)
+    condition = np.asarray(get_value(condition))
+    return Dual(np.where(condition, x.value, y.value),
+                np.where(condition[..., None], x.grad, y.grad))
+
+
+def _select(x, indices, axis, keepdims):
+    # Takes the elements at indices along axis from the value and the gradient
+    if axis is None:
+        x = Dual(np.ravel(x.value), np.reshape(x.grad, (-1, x.no_of_variables)))
+        axis = 0
+    axis = axis % x.ndim
+    indices = np.expand_dims(indices, axis)
+    value = np.take_along_axis(x.value, indices, axis)
+    grad = np.take_along_axis(x.grad, indices[..., None], axis)
+    if not keepdims:
+        value, grad = np.squeeze(value, axis), np.squeeze(grad, axis)
+    return Dual(value, grad)
+
+
+@_implements(np.max, np.amax)
+def _max(x, axis=None, keepdims=False, initial=None):
+    if initial is not None and not x.size:
+        return Dual(np.float64(initial), np.zeros(x.no_of_variables))
+    return _select(x, np.argmax(x.value, axis=axis), axis, keepdims)
+
+
+@_implements(np.min, np.amin)
+def _min(x, axis=None, keepdims=False, initial=None):
+    if initial is not None and not x.size:
+        return Dual(np.float64(initial), np.zeros(x.no_of_variables))
+    return _select(x, np.argmin(x.value, axis=axis), axis, keepdims)
+
+
+@_implements(np.nanmax)
+def _nanmax(x, axis=None, keepdims=False, initial=None):
+    return _select(x, np.nanargmax(x.value, axis=axis), axis, keepdims)
+
+
+@_implements(np.sum)
+def _sum(x, axis=None, keepdims=False):
+    axes = tuple(range(x.ndim)) if axis is None else np.atleast_1d(axis) % x.ndim
+    axes = tuple(int(a) for a in axes)
+    return Dual(np.sum(x.value, axis=axes, keepdims=keepdims),
+                np.sum(x.grad, axis=axes, keepdims=keepdims))
+
+
+@_implements(np.mean)
+def _mean(x, axis=None, keepdims=False):
+    count = x.size if axis is None else np.prod([x.shape[a] for a in np.atleast_1d(axis)])
+    return _sum(x, axis, keepdims) / count
+
+
+@_implements(np.prod)
+def _prod(x, axis=None, keepdims=False):
+    value = np.prod(x.value, axis=axis, keepdims=True)
+    # d(prod) = prod * sum(dx / x), summed over the reduced axes
+    grad = _sum(Dual(x.value, x.grad * (value / x.value)[..., None]), axis, keepdims).grad
+    return Dual(value if keepdims else np.prod(x.value, axis=axis), grad)
+
+
+@_implements(np.linspace)
+def _linspace(start, stop, num=50, endpoint=True):
+    fractions = np.linspace(0, 1, num, endpoint=endpoint)
+    return start + (stop - start) * fractions
+
+
+@_implements(np.clip)
+def _clip(x, a_min, a_max):
+    value = np.clip(x.value, a_min, a_max)
+    is_inside = (x.value >= a_min) & (x.value <= a_max)
+    return Dual(value, x.grad * is_inside[..., None])
+
+
+@_implements(np.interp)
+def _interp(x, xp, fp, left=None, right=None):
+    value = np.interp(x.value, xp, fp, left, right)
+    # Slope of the segment each point falls in; zero outside the table
+    segment = np.clip(np.searchsorted(xp, x.value, side='right') - 1, 0, len(xp) - 2)
+    slope = (fp[segment + 1] - fp[segment]) / (xp[segment + 1] - xp[segment])
+    is_inside = (x.value >= xp[0]) & (x.value <= xp[-1])
+    return Dual(value, x.grad * np.where(is_inside, slope, 0)[..., None])
+
+
+@_implements(np.round, np.around)
+def _round(x, decimals=0):
+    return np.round(x.value, decimals)
+
+
+@_implements(np.unique)
+def _unique(x, **kwargs):
+    return np.unique(x.value, **kwargs)
+
+
+@_implements(np.all)
+def _all(x, axis=None, **kwargs):
+    return np.all(x.value, axis=axis, **kwargs)
+
+
+@_implements(np.any)
+def _any(x, axis=None, **kwargs):
+    return np.any(x.value, axis=axis, **kwargs)
+
+
+@_implements(np.shape)
+def _shape(x):
+    return x.shape
+
+
+@_implements(np.ndim)
+def _ndim(x):
+    return x.ndim
+
+
+@_implements(np.size)
+def _size(x, axis=None):
+    return np.size(x.value, axis)
@@ -0,0 +1,219 @@
+import json
+import os
+import struct
+import numpy as np
+from .formatter import to_dict
+
+MAGIC = b'JEDARC01'
+# Index offset and magic at the end of the file
+TRAILER = struct.Struct('<Q8s')
+# Name of the component holding the engine-level values
+ENGINE_KEY = 'engine'
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serialisable')
+
+
+def _stack(column):
+    # Stacks a column of numbers, or of arrays of one shape, into one array
+    if all(isinstance(v, (bool, int, float, np.number, np.bool_)) for v in column):
+        return np.array(column)
+    if all(isinstance(v, np.ndarray) and v.shape == column[0].shape for v in column):
+        return np.stack(column)
+    return column
+
+
+def _encode(value, arrays):
+    # Numeric arrays are replaced by references to binary blocks and lists of dicts
+    # with the same keys (such as stages) are stored by column. Private fields, such
+    # as name-mangled constants, are left out
+    if isinstance(value, dict):
+        return {k: _encode(v, arrays) for k, v in value.items()
+                if not (isinstance(k, str) and k.startswith('_'))}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) and v.keys() == value[0].keys() for v in value):
+            return {'__records__': len(value),
+                    'columns': _encode({k: _stack([v[k] for v in value]) for k in value[0]}, arrays)}
+        return [_encode(v, arrays) for v in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf':
+        arrays.append(np.ascontiguousarray(value))
+        return {'__array__': len(arrays) - 1}
+    return value
+
+
+def _decode(value, arrays):
+    if isinstance(value, dict):
+        if '__array__' in value:
+            return arrays[value['__array__']]
+        if '__records__' in value:
+            columns = _decode(value['columns'], arrays)
+            return [{k: column[i] for k, column in columns.items()}
+                    for i in range(value['__records__'])]
+        return {k: _decode(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v, arrays) for v in value]
+    return value
+
+
+class EngineArchive:
+    """
+    Many engines in one binary file. Each component of each engine is stored as a
+    compact JSON skeleton, with its stages stored by column, followed by its numeric
+    arrays as raw binary blocks. An index at the end of the file maps every engine and
+    component to its bytes, so loading one engine or one component reads nothing else. mode is 'r' to read,
+    'w' to create a new archive and 'a' to add engines to an existing one. Engines added
+    in 'a' mode are written after the existing index, so an archive that is not closed
+    still opens with the engines it held before.
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"mode must be 'r', 'w' or 'a', not {mode!r}.")
+        if mode == 'a' and not os.path.isfile(path):
+            mode = 'w'
+        self.path = path
+        self.mode = mode
+        if mode == 'w':
+            self.__file = open(path, 'w+b')
+            self.__file.write(MAGIC)
+            self.__index = {}
+            self.__end = len(MAGIC)
+        else:
+            self.__file = open(path, 'rb' if mode == 'r' else 'r+b')
+            # New engines go after the existing trailer, which stays valid until close
+            self.__index, self.__end = self.__read_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, name):
+        return name in self.__index
+
+    def __iter__(self):
+        return iter(self.__index)
+
+    def names(self):
+        return list(self.__index)
+
+    def components(self, name):
+        return list(self.__index[name]['components'])
+
+    def attributes(self, name):
+        """
+        Returns the attributes stored in the index with an engine, without reading it.
+        """
+        return self.__index[name]['attributes']
+
+    def add(self, name, engine, **attributes):
+        """
+        Adds an engine (or its to_dict) under name. Keyword attributes, such as its
+        score or design variables, are kept in the index.
+        """
+        if self.mode == 'r':
+            raise ValueError('The archive is open for reading.')
+        if name in self.__index:
+            raise KeyError(f'An engine named {name!r} is already archived.')
+        engine_dict = to_dict(engine)
+        components = {ENGINE_KEY: {k: v for k, v in engine_dict.items() if not isinstance(v, dict)}}
+        components.update({k: v for k, v in engine_dict.items() if isinstance(v, dict)})
+        self.__file.seek(self.__end)
+        entries = {}
+        for component, values in components.items():
+            arrays = []
+            skeleton = json.dumps({'values': _encode(values, arrays),
+                                   'arrays': [[a.dtype.str, a.shape] for a in arrays]},
+                                  separators=(',', ':'), default=_to_builtin).encode()
+            data = b''.join(a.tobytes() for a in arrays)
+            entries[component] = [self.__end, len(skeleton), len(data)]
+            self.__file.write(skeleton)
+            self.__file.write(data)
+            self.__end += len(skeleton) + len(data)
+        self.__index[name] = {'components': entries,
+                              'attributes': json.loads(json.dumps(attributes, default=_to_builtin))}
+
+    def load(self, name):
+        """
+        Returns the engine stored under name as a dict of its components, with arrays
+        as NumPy arrays.
+        """
+        engine_dict = self.load_component(name, ENGINE_KEY)
+        for component in self.components(name):
+            if component != ENGINE_KEY:
+                engine_dict[component] = self.load_component(name, component)
+        return engine_dict
+
+    def load_component(self, name, component):
+        offset, skeleton_length, data_length = self.__index[name]['components'][component]
+        self.__file.seek(offset)
+        skeleton = json.loads(self.__file.read(skeleton_length))
+        data = self.__file.read(data_length)
+        arrays, position = [], 0
+        for dtype, shape in skeleton['arrays']:
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            arrays.append(np.frombuffer(data, dtype, count, position).reshape(shape))
+            position += count * dtype.itemsize
+        return _decode(skeleton['values'], arrays)
+
+    def close(self):
+        if self.__file.closed:
+            return
+        if self.mode != 'r':
+            self.__file.seek(self.__end)
+            self.__file.write(json.dumps(self.__index, separators=(',', ':')).encode())
+            self.__file.write(TRAILER.pack(self.__end, MAGIC))
+            self.__file.truncate()
+        self.__file.close()
+
+    def __read_index(self):
+        # Returns the index and the end of its trailer
+        self.__file.seek(0, os.SEEK_END)
+        size = self.__file.tell()
+        self.__file.seek(0)
+        if self.__file.read(len(MAGIC)) != MAGIC or size < len(MAGIC) + TRAILER.size:
+            raise ValueError(f'{self.path} is not an engine archive.')
+        index = self.__read_index_before(size)
+        if index is not None:
+            return index, size
+        # An interrupted append leaves the last complete trailer before its blocks
+        chunk_size, end = 1 << 20, size
+        while end > len(MAGIC):
+            start = max(len(MAGIC), end - chunk_size)
+            self.__file.seek(start)
+            chunk = self.__file.read(end - start)
+            i = chunk.rfind(MAGIC)
+            while i >= 0:
+                index = self.__read_index_before(start + i + len(MAGIC))
+                if index is not None:
+                    return index, start + i + len(MAGIC)
+                i = chunk.rfind(MAGIC, 0, i + len(MAGIC) - 1)
+            if start == len(MAGIC):
+                break
+            # Overlap the chunks so a trailer across their boundary is found
+            end = start + len(MAGIC) - 1
+        raise ValueError(f'{self.path} was not closed after writing.')
+
+    def __read_index_before(self, trailer_end):
+        # Returns the index whose trailer ends at trailer_end, or None if there is none
+        trailer_start = trailer_end - TRAILER.size
+        if trailer_start < len(MAGIC):
+            return None
+        self.__file.seek(trailer_start)
+        index_offset, magic = TRAILER.unpack(self.__file.read(TRAILER.size))
+        if magic != MAGIC or not len(MAGIC) <= index_offset <= trailer_start:
+            return None
+        self.__file.seek(index_offset)
+        try:
+            index = json.loads(self.__file.read(trailer_start - index_offset))
+        except ValueError:
+            return None
+        return index if isinstance(index, dict) else None
@@ -1,13 +1,30 @@
 from typing import Dict, Tuple, Set
+from collections import (Counter,
+                         namedtuple)
+from collections.abc import Sequence
+from . import result_store as rs
+import heapq
+import itertools
 import json
 import numpy as np
 import os
 
+# Single-pass summary of a vars file: the top_k rows by score as (score, var dict)
+# pairs, best first, the number of rows, and the min, max and value counts of every
+# column (None for columns with more than max_distinct values)
+VarsFileSummary = namedtuple('VarsFileSummary', ['top',
+                                                 'no_of_rows',
+                                                 'mins',
+                                                 'maxs',
+                                                 'histograms'])
+
 
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.ndarray):
             return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
         return json.JSONEncoder.default(self, obj)
 
 
@@ -21,8 +38,10 @@ def to_dict(obj):
     """
     if isinstance(obj, dict):
         return {k: to_dict(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
+    elif isinstance(obj, (list, tuple)) or (isinstance(obj, Sequence) and not isinstance(obj, str)):
         return [to_dict(e) for e in obj]
+    elif hasattr(obj, 'to_dict'):
+        return to_dict(obj.to_dict())
     elif hasattr(obj, '__dict__'):
         return to_dict(obj.__dict__)
     else:
@@ -37,9 +56,8 @@ def save_obj_to_file(obj, filename):
     """
     Saves a JSON string to a text file.
     """
-    json_str = to_json(obj)
     with open(filename, 'w') as file:
-        json.dump(json.loads(json_str), file, indent=4)
+        json.dump(to_dict(obj), file, indent=4, cls=NumpyEncoder)
 
 
 def format_elapsed_time(elapsed_time: float) -> str:
@@ -72,9 +90,11 @@ def unhash_dict(keys_hash: str, vals_hash: str) -> Dict:
 
 
 def hashed_vals_to_csv(key_hash: str, hashed_vals_set: Set[str], filename: str):
-    with open(filename, 'w') as f:
+    # Write to a temporary file first so an interrupted write can't corrupt the csv
+    with open(f'{filename}.tmp', 'w') as f:
         f.write(f"{key_hash}\n")
         f.writelines(f"{val_hash}\n" for val_hash in hashed_vals_set)
+    os.replace(f'{filename}.tmp', filename)
 
 
 def csv_to_hashed_val_set(filename: str) -> Tuple[str, Set[str]]:
@@ -106,3 +126,73 @@ def read_hashed_file_to_dict_list(filename: str, sort_key: str = None, reverse:
     if sort_key is not None:
         return sorted(dict_list, key=lambda d: d[sort_key], reverse=reverse)
     return dict_list
+
+
+def __iter_vars_file_chunks(filename, chunk_size):
+    # Yields the keys, then chunks of the columns, reading each row once
+    if rs.is_result_store(filename):
+        _, columns = rs.load_results(filename)
+        yield list(columns)
+        no_of_rows = len(next(iter(columns.values()))) if columns else 0
+        for start in range(0, no_of_rows, chunk_size):
+            yield [np.asarray(column[start:start + chunk_size], dtype=float)
+                   for column in columns.values()]
+        return
+    with open(filename, 'r') as f:
+        keys = f.readline().strip().split(',')
+        yield keys
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            vals = np.array(','.join(line.strip() for line in lines).split(','),
+                            dtype=float).reshape(-1, len(keys))
+            yield list(vals.T)
+
+
+def summarise_vars_file(filename: str, top_k: int = 1, sort_key: str = rs.SCORE_KEY,
+                        chunk_size: int = 65536, max_distinct: int = 1024) -> VarsFileSummary:
+    """
+    Reads a vars file (a result store or a csv file) in one pass of chunk_size rows,
+    keeping only a heap of the top_k rows by sort_key and running statistics of every
+    column, so memory does not grow with the file. Rows with a NaN sort_key are
+    never among the top rows.
+    """
+    chunks = __iter_vars_file_chunks(filename, chunk_size)
+    keys = next(chunks)
+    sort_index = keys.index(sort_key) if sort_key in keys else None
+    heap, no_of_rows = [], 0
+    mins, maxs = dict.fromkeys(keys, np.nan), dict.fromkeys(keys, np.nan)
+    histograms = {key: Counter() for key in keys}
+    for columns in chunks:
+        for key, column in zip(keys, columns):
+            values = column[~np.isnan(column)]
+            if values.size:
+                mins[key] = np.fmin(mins[key], values.min())
+                maxs[key] = np.fmax(maxs[key], values.max())
+            if histograms[key] is not None:
+                histograms[key].update(dict(zip(*np.unique(values, return_counts=True))))
+                if len(histograms[key]) > max_distinct:
+                    histograms[key] = None
+        if sort_index is not None and top_k:
+            scores = np.nan_to_num(columns[sort_index], nan=-np.inf)
+            # Only the chunk's own top rows can enter the heap
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k] if len(scores) > top_k \
+                else np.arange(len(scores))
+            for i in candidates:
+                if scores[i] == -np.inf:
+                    continue
+                # Ties go to the first row, as with np.argmax
+                item = (float(scores[i]), -(no_of_rows + int(i)),
+                        {key: float(column[i]) for key, column in zip(keys, columns)})
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+        no_of_rows += len(columns[0]) if columns else 0
+    mins = {key: float(value) for key, value in mins.items()}
+    maxs = {key: float(value) for key, value in maxs.items()}
+    histograms = {key: None if counts is None else {float(v): int(c) for v, c in sorted(counts.items())}
+                  for key, counts in histograms.items()}
+    top = [(score, var_dict) for score, _, var_dict in sorted(heap, reverse=True)]
+    return VarsFileSummary(top, no_of_rows, mins, maxs, histograms)
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from contextlib import (contextmanager,
+                        nullcontext)
+import json
+import time
+
+# Wall time and call count of every timed phase, per process
+_records = defaultdict(lambda: [0, 0.0])
+_enabled = False
+_DISABLED = nullcontext()
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        record = _records[self.name]
+        record[0] += 1
+        record[1] += time.perf_counter() - self.start
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    _records.clear()
+
+
+def timed(name):
+    """
+    Context manager that records the wall time and call count of a phase. It returns
+    a shared no-op context while instrumentation is disabled.
+    """
+    return _Timer(name) if _enabled else _DISABLED
+
+
+@contextmanager
+def recording():
+    """
+    Enables instrumentation for the duration of the block, starting from empty records.
+    """
+    global _enabled
+    was_enabled = _enabled
+    reset()
+    _enabled = True
+    try:
+        yield _records
+    finally:
+        _enabled = was_enabled
+
+
+def to_dict():
+    return {name: {'calls': calls, 'seconds': seconds}
+            for name, (calls, seconds) in sorted(_records.items(), key=lambda item: -item[1][1])}
+
+
+def save(filename):
+    with open(filename, 'w') as f:
+        json.dump(to_dict(), f, indent=4)
+
+
+def summary():
+    """
+    Returns a table of the timed phases, slowest first. Nested phases are included in
+    the time of the phases around them.
+    """
+    rows = [f'{"Phase":40}{"Calls":>12}{"Total (s)":>14}{"Per call (us)":>16}']
+    for name, record in to_dict().items():
+        rows.append(f'{name:40}{record["calls"]:12d}{record["seconds"]:14.4f}'
+                    f'{1e6 * record["seconds"] / record["calls"]:16.2f}')
+    return '\n'.join(rows)
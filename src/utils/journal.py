@@ -0,0 +1,101 @@
+from typing import Set, Tuple
+from . import result_store as rs
+import os
+
+
+class SweepJournal:
+    """
+    Append-only journal of evaluated sweep points. Each record is written as
+    '1,<var_val_hash>,<score>' for valid points and '0,<var_val_hash>' for the
+    rest, below a header holding the key hash of the sweep. Compaction folds
+    the journal into the tried and valid result store snapshots and clears it.
+    """
+
+    def __init__(self,
+                 path: str,
+                 key_hash: str,
+                 tried_vars_path: str,
+                 valid_vars_path: str,
+                 flush_every: int = 1000,
+                 compact_every: int = None):
+        self.path = path
+        self.key_hash = key_hash
+        self.tried_vars_path = tried_vars_path
+        self.valid_vars_path = valid_vars_path
+        self.flush_every = flush_every
+        self.compact_every = compact_every
+        self.no_of_records = 0
+        self.__buffer = []
+        self.__file = None
+
+    def replay(self) -> Tuple[Set[str], Set[str]]:
+        tried_var_vals_hash_set, valid_var_vals_hash_set = set(), set()
+        if not os.path.isfile(self.path):
+            return tried_var_vals_hash_set, valid_var_vals_hash_set
+        with open(self.path, 'r') as file:
+            lines = file.read().split('\n')
+        if lines[0] != self.key_hash:
+            return tried_var_vals_hash_set, valid_var_vals_hash_set
+        # The last line is empty unless a write was cut short, so drop it
+        for line in lines[1:-1]:
+            if line[0] == '1':
+                valid_var_vals_hash_set.add(line[2:])
+                tried_var_vals_hash_set.add(line[2:].rsplit(',', 1)[0])
+            else:
+                tried_var_vals_hash_set.add(line[2:])
+        self.no_of_records = len(lines) - 2
+        return tried_var_vals_hash_set, valid_var_vals_hash_set
+
+    def append(self, var_val_hash: str, is_valid: bool, score=None):
+        self.__buffer.append(f'1,{var_val_hash},{score}\n' if is_valid
+                             else f'0,{var_val_hash}\n')
+        if len(self.__buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.__buffer:
+            return
+        if self.__file is None:
+            self.__open()
+        self.__file.writelines(self.__buffer)
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.no_of_records += len(self.__buffer)
+        self.__buffer = []
+
+    def is_due_for_compaction(self) -> bool:
+        return self.compact_every is not None and self.no_of_records + len(self.__buffer) >= self.compact_every
+
+    def compact(self, tried_var_vals_hash_set: Set[str], valid_var_vals_hash_set: Set[str]):
+        # The snapshots must hold every journalled record before it is cleared
+        self.flush()
+        rs.hashed_vals_to_results(self.key_hash,
+                                  tried_var_vals_hash_set,
+                                  valid_var_vals_hash_set,
+                                  self.tried_vars_path,
+                                  self.valid_vars_path)
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self.no_of_records = 0
+
+    def close(self):
+        self.flush()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __open(self):
+        is_resumable = False
+        if os.path.isfile(self.path):
+            with open(self.path, 'rb+') as file:
+                content = file.read()
+                is_resumable = content.startswith(f'{self.key_hash}\n'.encode())
+                if is_resumable:
+                    # Drop a record that was cut short by a crash
+                    file.truncate(content.rindex(b'\n') + 1)
+        if is_resumable:
+            self.__file = open(self.path, 'a')
+        else:
+            self.__file = open(self.path, 'w')
+            self.__file.write(f'{self.key_hash}\n')
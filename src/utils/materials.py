@@ -0,0 +1,71 @@
+import numpy as np
+from . import dual
+
+# What a lookup does with temperatures outside the table
+OUT_OF_RANGE_POLICIES = ('raise', 'reject', 'clamp', 'extrapolate')
+
+
+class MaterialTable:
+    """
+    Material property tabulated against temperature, sorted once and looked up for
+    arrays of temperatures by linear interpolation. A temperature is in range from the
+    first table temperature up to, but not including, the last one. out_of_range sets
+    what happens to other temperatures:
+        'raise': the stages flag an error and their component raises ValueError
+        'reject': the stages are invalid, with the 'surface_temp' rule broken
+        'clamp': the property is held at its value at the nearest end of the table
+        'extrapolate': the first or last segment of the table is extended linearly
+    """
+
+    def __init__(self, temperature_dict, out_of_range='raise'):
+        if out_of_range not in OUT_OF_RANGE_POLICIES:
+            raise ValueError(
+                f'out_of_range must be one of {OUT_OF_RANGE_POLICIES}, not {out_of_range!r}.')
+        if len(temperature_dict) < 2:
+            raise ValueError('A material table needs at least two temperatures.')
+        temperatures, values = zip(*sorted(temperature_dict.items()))
+        self.temperatures = np.array(temperatures, dtype=float)
+        self.values = np.array(values, dtype=float)
+        self.out_of_range = out_of_range
+        # Slopes of the end segments, used to extrapolate
+        self.__slopes = ((self.values[1] - self.values[0]) /
+                         (self.temperatures[1] - self.temperatures[0]),
+                         (self.values[-1] - self.values[-2]) /
+                         (self.temperatures[-1] - self.temperatures[-2]))
+
+    @classmethod
+    def from_dict(cls, table, out_of_range='raise'):
+        # Tables are passed through, so they are only built once
+        if isinstance(table, cls):
+            return table
+        return cls(table, out_of_range)
+
+    def __call__(self, temperatures):
+        temperatures = dual.asarray(temperatures, dtype=float)
+        values = np.interp(temperatures, self.temperatures, self.values)
+        if self.out_of_range == 'extrapolate':
+            values = np.where(temperatures < self.temperatures[0],
+                              self.values[0] + self.__slopes[0] *
+                              (temperatures - self.temperatures[0]),
+                              values)
+            values = np.where(temperatures > self.temperatures[-1],
+                              self.values[-1] + self.__slopes[1] *
+                              (temperatures - self.temperatures[-1]),
+                              values)
+        return values
+
+    def is_in_range(self, temperatures):
+        temperatures = np.asarray(dual.get_value(temperatures), dtype=float)
+        return ~(temperatures < self.temperatures[0]) & (temperatures < self.temperatures[-1])
+
+    def to_dict(self):
+        return dict(zip(self.temperatures.tolist(), self.values.tolist()))
+
+    def __key(self):
+        return (tuple(self.temperatures), tuple(self.values), self.out_of_range)
+
+    def __eq__(self, other):
+        return isinstance(other, MaterialTable) and self.__key() == other.__key()
+
+    def __hash__(self):
+        return hash(self.__key())
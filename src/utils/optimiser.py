@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class DifferentialEvolution:
+    """
+    DE/rand/1/bin maximiser over a box, driven one generation at a time: ask returns
+    the trial population to evaluate as one batch and tell takes back its scores and
+    feasibility. Feasible points always beat infeasible ones, so the score is only
+    compared between points that are both feasible or both infeasible.
+    """
+
+    def __init__(self,
+                 lower,
+                 upper,
+                 population_size=32,
+                 mutation=0.7,
+                 crossover=0.9,
+                 seed=None,
+                 initial_population=None):
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.population_size = population_size
+        self.mutation = mutation
+        self.crossover = crossover
+        self.__rng = np.random.default_rng(seed)
+        population = self.__rng.uniform(self.lower, self.upper,
+                                        (population_size, len(self.lower)))
+        if initial_population is not None:
+            # Known points replace the first random members
+            initial_population = np.reshape(
+                initial_population, (-1, len(self.lower)))[:population_size]
+            population[:len(initial_population)] = initial_population
+        self.population = population
+        self.scores = None
+        self.is_valid = None
+        self.__trials = population
+
+    @property
+    def best_index(self):
+        return int(np.lexsort((self.__score_key(self.scores), self.is_valid))[-1])
+
+    @property
+    def best(self):
+        i = self.best_index
+        return self.population[i], self.scores[i], bool(self.is_valid[i])
+
+    def ask(self):
+        if self.scores is None:
+            return self.__trials
+        n, d = self.population.shape
+        # Three distinct members other than the target for every trial
+        others = np.argsort(self.__rng.random((n, n)) +
+                            np.eye(n), axis=1)[:, :3]
+        a, b, c = (self.population[others[:, i]] for i in range(3))
+        mutants = np.clip(a + self.mutation * (b - c), self.lower, self.upper)
+        is_crossed = self.__rng.random((n, d)) < self.crossover
+        # At least one variable always comes from the mutant
+        is_crossed[np.arange(n), self.__rng.integers(d, size=n)] = True
+        self.__trials = np.where(is_crossed, mutants, self.population)
+        return self.__trials
+
+    def tell(self, scores, is_valid):
+        scores = np.asarray(scores, dtype=float)
+        is_valid = np.asarray(is_valid, dtype=bool)
+        if self.scores is None:
+            self.scores, self.is_valid = scores, is_valid
+            return
+        is_better = (is_valid > self.is_valid) | ((is_valid == self.is_valid) &
+                                                  (self.__score_key(scores) >= self.__score_key(self.scores)))
+        self.population = np.where(
+            is_better[:, None], self.__trials, self.population)
+        self.scores = np.where(is_better, scores, self.scores)
+        self.is_valid = np.where(is_better, is_valid, self.is_valid)
+
+    @staticmethod
+    def __score_key(scores):
+        # Points that could not be scored rank last
+        return np.where(np.isnan(scores), -np.inf, scores)
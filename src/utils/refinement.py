@@ -0,0 +1,93 @@
+from typing import Dict, List
+import heapq
+import itertools
+import numpy as np
+
+# Cells holding valid and invalid points are refined before cells holding only valid ones
+MIXED_PRIORITY = 0
+VALID_PRIORITY = 1
+
+
+class Cell:
+    def __init__(self, lower, upper, points, depth=0):
+        self.lower = lower
+        self.upper = upper
+        # (point, is_valid) pairs that lie inside the cell
+        self.points = points
+        self.depth = depth
+
+    @property
+    def centre(self):
+        return 0.5 * (self.lower + self.upper)
+
+    @property
+    def is_mixed(self):
+        return len({is_valid for _, is_valid in self.points}) > 1
+
+    @property
+    def has_valid_point(self):
+        return any(is_valid for _, is_valid in self.points)
+
+    def split(self, scale):
+        # Halve the cell along its widest axis, relative to the variable ranges
+        axis = np.argmax((self.upper - self.lower) / scale)
+        mid = self.centre[axis]
+        lower_upper, upper_lower = self.upper.copy(), self.lower.copy()
+        lower_upper[axis] = upper_lower[axis] = mid
+        return [Cell(self.lower, lower_upper,
+                     [p for p in self.points if p[0][axis] <= mid], self.depth + 1),
+                Cell(upper_lower, self.upper,
+                     [p for p in self.points if p[0][axis] > mid], self.depth + 1)]
+
+
+class AdaptiveRefinement:
+    """
+    Adaptive sampler over the design variables. Every known valid point starts a cell
+    one grid spacing wide; each round the centres of the most promising cells are
+    proposed by ask and their validity is reported back with tell. Cells left with
+    only invalid points are dropped, the rest are split, mixed cells first, so
+    sampling concentrates on the feasible region and its boundary.
+    """
+
+    def __init__(self,
+                 var_ranges_dict: Dict[str, np.ndarray],
+                 valid_points: np.ndarray,
+                 max_depth: int = 32):
+        self.keys = list(var_ranges_dict)
+        self.max_depth = max_depth
+        lower = np.array([np.min(var_ranges_dict[k]) for k in self.keys])
+        upper = np.array([np.max(var_ranges_dict[k]) for k in self.keys])
+        self.__scale = np.where(upper > lower, upper - lower, 1)
+        spacing = (upper - lower) / \
+            np.maximum([len(var_ranges_dict[k]) - 1 for k in self.keys], 1)
+        self.__counter = itertools.count()
+        self.__cells = []
+        self.__asked_cells = []
+        for point in np.reshape(valid_points, (-1, len(self.keys))):
+            self.__push(Cell(np.maximum(point - spacing / 2, lower),
+                             np.minimum(point + spacing / 2, upper),
+                             [(point, True)]),
+                        VALID_PRIORITY)
+
+    def __len__(self):
+        return len(self.__cells)
+
+    def ask(self, n: int) -> List[Dict[str, float]]:
+        self.__asked_cells = [heapq.heappop(self.__cells)[-1]
+                              for _ in range(min(n, len(self.__cells)))]
+        return [dict(zip(self.keys, cell.centre)) for cell in self.__asked_cells]
+
+    def tell(self, is_valid: List[bool]):
+        for cell, centre_is_valid in zip(self.__asked_cells, is_valid):
+            cell.points.append((cell.centre, centre_is_valid))
+            if not cell.has_valid_point or cell.depth >= self.max_depth:
+                continue
+            priority = MIXED_PRIORITY if cell.is_mixed else VALID_PRIORITY
+            for child in cell.split(self.__scale):
+                self.__push(child, priority)
+        self.__asked_cells = []
+
+    def __push(self, cell, priority):
+        # Shallow cells first within a priority, then in the order they were found
+        heapq.heappush(self.__cells,
+                       (priority, cell.depth, next(self.__counter), cell))
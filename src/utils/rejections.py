@@ -0,0 +1,74 @@
+from collections import (Counter,
+                         defaultdict)
+import json
+
+
+class RejectionStats:
+    """
+    Counts the rejection codes of a sweep, overall and for every value of every
+    variable. Codes name the component, stage and rule that failed (e.g.
+    'HPT.no_of_stages' or 'HPC.stage_3.diffusion_factor'); exceptions are counted
+    under their type and message.
+    """
+
+    def __init__(self):
+        self.no_evaluated = 0
+        self.reason_counts = Counter()
+        # {key: {value: number of points evaluated}}
+        self.value_counts = defaultdict(Counter)
+        # {key: {value: {reason: number of points rejected}}}
+        self.value_reason_counts = defaultdict(lambda: defaultdict(Counter))
+
+    def record(self, var_dict, rejection):
+        self.no_evaluated += 1
+        for key, value in var_dict.items():
+            self.value_counts[key][value] += 1
+        if rejection is None:
+            return
+        self.reason_counts[rejection] += 1
+        for key, value in var_dict.items():
+            self.value_reason_counts[key][value][rejection] += 1
+
+    @property
+    def no_rejected(self):
+        return sum(self.reason_counts.values())
+
+    def get_value_shares(self, reason):
+        """
+        Returns {key: {value: share of the points with that value rejected by reason}}.
+        """
+        return {key: {value: self.value_reason_counts[key][value][reason] / count
+                      for value, count in sorted(counts.items())}
+                for key, counts in self.value_counts.items()}
+
+    def to_dict(self):
+        return {'no_evaluated': self.no_evaluated,
+                'reasons': dict(self.reason_counts.most_common()),
+                'values': {key: {str(value): {'evaluated': count,
+                                              'reasons': dict(self.value_reason_counts[key][value])}
+                                 for value, count in sorted(counts.items())}
+                           for key, counts in self.value_counts.items()}}
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def summary(self, top=10):
+        """
+        Returns a table of the most common rejection reasons and, for the most common
+        one, the share of points it rejects at each value of each variable.
+        """
+        if not self.no_evaluated:
+            return 'No points evaluated'
+        rows = [f'{self.no_rejected} of {self.no_evaluated} points rejected',
+                f'{"Reason":48}{"Points":>10}{"Share":>10}']
+        for reason, count in self.reason_counts.most_common(top):
+            rows.append(
+                f'{reason:48}{count:10d}{count / self.no_evaluated:10.1%}')
+        if self.reason_counts:
+            reason, _ = self.reason_counts.most_common(1)[0]
+            rows.append(f'Share rejected by {reason} per variable value:')
+            for key, shares in self.get_value_shares(reason).items():
+                rows.append(f'  {key}: ' + ', '.join(f'{value:.4g}: {share:.0%}'
+                                                    for value, share in shares.items()))
+        return '\n'.join(rows)
@@ -0,0 +1,108 @@
+from typing import Dict, Set, Tuple
+import numpy as np
+import os
+import shutil
+
+SCORE_KEY = 'engine_score'
+VALIDITY_KEY = 'is_valid'
+KEYS_FILENAME = 'keys.txt'
+
+
+def is_result_store(path: str) -> bool:
+    return os.path.isfile(f'{path}/{KEYS_FILENAME}') or os.path.isfile(f'{path}.old/{KEYS_FILENAME}')
+
+
+def save_results(path: str, key_hash: str, columns: Dict[str, np.ndarray]):
+    """
+    Saves a columnar result store: a directory holding one .npy file per column
+    and the key hash of the variables. The store is written to a temporary
+    directory first and swapped in, so an interrupted write keeps the old store.
+    """
+    tmp_path, old_path = f'{path}.tmp', f'{path}.old'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for key, column in columns.items():
+        np.save(f'{tmp_path}/{key}.npy', column)
+    with open(f'{tmp_path}/{KEYS_FILENAME}', 'w') as f:
+        f.write(f'{key_hash}\n')
+    if os.path.isdir(path):
+        # A crash after the last swap leaves a stale old store, which would block the rename
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_results(path: str, mmap_mode: str = 'r') -> Tuple[str, Dict[str, np.ndarray]]:
+    """
+    Returns the key hash and the columns of a result store, memory-mapped by default.
+    Legacy comma-joined csv files are parsed into the same columns.
+    """
+    if path.endswith('.csv'):
+        return __load_csv(path)
+    if not os.path.isfile(f'{path}/{KEYS_FILENAME}'):
+        # A crash between the two renames in save_results leaves only the old store
+        path = f'{path}.old'
+    with open(f'{path}/{KEYS_FILENAME}', 'r') as f:
+        key_hash = f.readline().strip()
+    keys = key_hash.split(',') if key_hash else []
+    keys += [key for key in [SCORE_KEY, VALIDITY_KEY]
+             if os.path.isfile(f'{path}/{key}.npy')]
+    return key_hash, {key: np.load(f'{path}/{key}.npy', mmap_mode=mmap_mode) for key in keys}
+
+
+def hashed_vals_to_results(key_hash: str,
+                           tried_var_vals_hash_set: Set[str],
+                           valid_var_vals_hash_set: Set[str],
+                           tried_path: str,
+                           valid_path: str):
+    """
+    Saves the tried and valid hash sets of a sweep as result stores. The tried store
+    holds every point with its validity and score (NaN if invalid), the valid store
+    only the valid points and their scores.
+    """
+    keys = key_hash.split(',')
+    valid_scores = dict(val_hash.rsplit(',', 1)
+                        for val_hash in valid_var_vals_hash_set)
+    tried_var_vals_hashes = list(tried_var_vals_hash_set)
+    tried_vals = __parse_val_hashes(tried_var_vals_hashes, len(keys))
+    tried_scores = np.array([valid_scores.get(val_hash, 'nan') for val_hash in tried_var_vals_hashes],
+                            dtype=float)
+    tried_columns = dict(zip(keys, tried_vals))
+    tried_columns[SCORE_KEY] = tried_scores
+    tried_columns[VALIDITY_KEY] = ~np.isnan(tried_scores)
+    save_results(tried_path, key_hash, tried_columns)
+    valid_vals = __parse_val_hashes(list(valid_var_vals_hash_set), len(keys) + 1)
+    save_results(valid_path, key_hash, dict(zip(keys + [SCORE_KEY], valid_vals)))
+
+
+def results_to_hashed_vals(path: str) -> Tuple[str, Set[str]]:
+    """
+    Returns a result store as the key hash and value hash set used by the sweep.
+    Valid stores keep the score as the last value, as in the csv files.
+    """
+    key_hash, columns = load_results(path, mmap_mode=None)
+    keys = key_hash.split(',')
+    if VALIDITY_KEY not in columns:
+        keys.append(SCORE_KEY)
+        key_hash += f',{SCORE_KEY}'
+    rows = zip(*(columns[key].tolist() for key in keys))
+    return key_hash, {','.join(map(str, row)) for row in rows}
+
+
+def __parse_val_hashes(val_hashes, no_of_keys):
+    # One split over the joined hashes instead of one per row
+    vals = np.array(','.join(val_hashes).split(',') if val_hashes else [],
+                    dtype=float)
+    return vals.reshape(-1, no_of_keys).T
+
+
+def __load_csv(path):
+    with open(path, 'r') as f:
+        key_hash = f.readline().strip()
+        vals = np.loadtxt(f, delimiter=',', ndmin=2)
+    keys = key_hash.split(',')
+    columns = {key: vals[:, i] if vals.size else np.zeros(0)
+               for i, key in enumerate(keys)}
+    # The key hash of a valid csv ends with the score column
+    return key_hash.removesuffix(f',{SCORE_KEY}'), columns
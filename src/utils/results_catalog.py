@@ -0,0 +1,160 @@
+from typing import Dict, List, Tuple
+from . import result_store as rs
+import numpy as np
+import os
+import re
+import sqlite3
+
+# Catalog table recording where every results table was ingested from
+SOURCES_TABLE = 'sources'
+
+
+class ResultsCatalog:
+    """
+    SQLite catalog of sweep result stores (or legacy csv files). Each store is
+    ingested into its own table, named 'tried_<keys>' or 'valid_<keys>' after the
+    store, with an index on the score and on every variable, so top-k and range
+    queries read only the rows they return. Ranges are given as keyword arguments
+    key=(low, high), inclusive, with None for an open end.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute(f'CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} '
+                                  '(name TEXT PRIMARY KEY, path TEXT, key_hash TEXT, modified REAL)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.__connection.close()
+
+    def tables(self) -> List[str]:
+        return [row[0] for row in self.__connection.execute(f'SELECT name FROM {SOURCES_TABLE}')]
+
+    def columns(self, table: str) -> List[str]:
+        return [row[1] for row in self.__connection.execute(f'PRAGMA table_info("{table}")')]
+
+    def ingest(self, results_path: str, table: str = None) -> str:
+        """
+        Copies a result store into the catalog and returns its table name. A store
+        that has not changed since it was last ingested is not read again.
+        """
+        table = table or self.get_table_name(results_path)
+        modified = self.__get_modified_time(results_path)
+        source = self.__connection.execute(f'SELECT path, modified FROM {SOURCES_TABLE} WHERE name = ?',
+                                           (table,)).fetchone()
+        if source == (os.path.abspath(results_path), modified):
+            return table
+        key_hash, columns = rs.load_results(results_path)
+        keys = list(columns)
+        quoted_keys = ', '.join(f'"{key}"' for key in keys)
+        rows = zip(*(self.__to_builtin(columns[key]) for key in keys))
+        # The catalog is rebuilt from the stores if lost, so bulk writes skip syncing
+        self.__connection.execute('PRAGMA synchronous = OFF')
+        with self.__connection:
+            self.__connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.__connection.execute(f'CREATE TABLE "{table}" ({quoted_keys})')
+            self.__connection.executemany(f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(keys))})',
+                                          rows)
+            # Validity is the score not being NULL, so it is not indexed on its own
+            for key in keys:
+                if key != rs.VALIDITY_KEY:
+                    self.__connection.execute(f'CREATE INDEX "{table}.{key}" ON "{table}" ("{key}")')
+            self.__connection.execute(f'INSERT OR REPLACE INTO {SOURCES_TABLE} VALUES (?, ?, ?, ?)',
+                                      (table, os.path.abspath(results_path), key_hash, modified))
+        return table
+
+    def query(self, table: str, order_by: str = rs.SCORE_KEY, descending: bool = True,
+              limit: int = None, valid_only: bool = True, **ranges: Tuple[float, float]) -> List[Dict[str, float]]:
+        """
+        Returns the rows of table within ranges, as dicts of their values, sorted by
+        order_by. Invalid points (with no score) are left out unless valid_only is
+        False.
+        """
+        columns = self.columns(table)
+        if order_by not in columns:
+            raise KeyError(f'{table} has no column {order_by!r}.')
+        where, params = self.__get_conditions(columns, ranges)
+        if valid_only:
+            where.append(f'"{rs.SCORE_KEY}" IS NOT NULL')
+        sql = f'SELECT * FROM "{table}"'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY "{order_by}" {"DESC" if descending else "ASC"}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [dict(zip(columns, row)) for row in self.__connection.execute(sql, params)]
+
+    def top(self, table: str, k: int = 1, **ranges: Tuple[float, float]) -> List[Dict[str, float]]:
+        """
+        Returns the k highest scoring points of table within ranges.
+        """
+        return self.query(table, limit=k, **ranges)
+
+    def count(self, table: str, valid_only: bool = True, **ranges: Tuple[float, float]) -> int:
+        where, params = self.__get_conditions(self.columns(table), ranges)
+        if valid_only:
+            where.append(f'"{rs.SCORE_KEY}" IS NOT NULL')
+        sql = f'SELECT COUNT(*) FROM "{table}"'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self.__connection.execute(sql, params).fetchone()[0]
+
+    def get_ranges(self, table: str, valid_only: bool = True) -> Dict[str, Tuple[float, float]]:
+        """
+        Returns the (min, max) of every column of table.
+        """
+        columns = self.columns(table)
+        keys = [key for key in columns if key != rs.VALIDITY_KEY]
+        # Every point of a valid table is valid, so its ranges come from the indexes
+        condition = f' WHERE "{rs.SCORE_KEY}" IS NOT NULL' if valid_only and rs.VALIDITY_KEY in columns else ''
+        # Separate MIN and MAX subqueries can each be answered by one index lookup
+        return {key: self.__connection.execute(f'SELECT (SELECT MIN("{key}") FROM "{table}"{condition}), '
+                                               f'(SELECT MAX("{key}") FROM "{table}"{condition})').fetchone()
+                for key in keys}
+
+    @staticmethod
+    def get_table_name(results_path: str) -> str:
+        # Tried and valid stores of a sweep share a file name, so their kind is
+        # read from their columns
+        _, columns = rs.load_results(results_path)
+        kind = 'tried' if rs.VALIDITY_KEY in columns else 'valid'
+        name = os.path.basename(results_path.rstrip('/')).split('.')[0]
+        return re.sub(r'\W', '_', f'{kind}_{name}')
+
+    @staticmethod
+    def __get_conditions(columns, ranges):
+        where, params = [], []
+        for key, (low, high) in ranges.items():
+            if key not in columns:
+                raise KeyError(f'Unknown column {key!r}.')
+            if low is not None:
+                where.append(f'"{key}" >= ?')
+                params.append(low)
+            if high is not None:
+                where.append(f'"{key}" <= ?')
+                params.append(high)
+        return where, params
+
+    @staticmethod
+    def __to_builtin(column):
+        # SQLite has no NaN, so missing scores are stored as NULL
+        column = np.asarray(column)
+        if column.dtype.kind == 'f':
+            return [None if value != value else value for value in column.tolist()]
+        return column.tolist()
+
+    @staticmethod
+    def __get_modified_time(results_path):
+        if rs.is_result_store(results_path):
+            keys_path = f'{results_path}/{rs.KEYS_FILENAME}'
+            if not os.path.isfile(keys_path):
+                keys_path = f'{results_path}.old/{rs.KEYS_FILENAME}'
+            return os.path.getmtime(keys_path)
+        return os.path.getmtime(results_path)
@@ -0,0 +1,86 @@
+from collections import namedtuple
+from statistics import NormalDist
+import numpy as np
+
+# First-order and total Sobol indices of every variable, with the half-widths of
+# their confidence intervals, and the number of base samples they were estimated from
+SobolIndices = namedtuple('SobolIndices', ['first_order',
+                                           'first_order_conf',
+                                           'total',
+                                           'total_conf',
+                                           'no_of_samples'])
+
+
+class SobolAnalysis:
+    """
+    Variance-based global sensitivity analysis over a box. The Saltelli sample matrix
+    stacks two independent uniform samples A and B of no_of_samples points and, for
+    every variable i, A with its column i taken from B, so the number of evaluations,
+    no_of_samples * (variables + 2), is fixed before any is run. get_indices takes
+    the outputs at samples, in order, and returns first-order indices (Saltelli 2010)
+    and total indices (Jansen), with bootstrap confidence intervals.
+    """
+
+    def __init__(self, lower, upper, no_of_samples=1024, seed=None):
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.no_of_samples = no_of_samples
+        self.__rng = np.random.default_rng(seed)
+        d = len(self.lower)
+        A, B = self.__rng.uniform(self.lower, self.upper, (2, no_of_samples, d))
+        AB = np.repeat(A[None], d, axis=0)
+        AB[np.arange(d), :, np.arange(d)] = B.T
+        self.samples = np.concatenate([A, B, AB.reshape(-1, d)])
+
+    @property
+    def no_of_evaluations(self):
+        return len(self.samples)
+
+    def get_indices(self, outputs, confidence=0.95, no_of_resamples=200):
+        """
+        Returns the SobolIndices of outputs. Base samples with a NaN output in any of
+        their rows are left out, so outputs may be undefined at a few points.
+        """
+        outputs = np.asarray(outputs, dtype=float)
+        n, d = self.no_of_samples, len(self.lower)
+        f_A, f_B = outputs[:n], outputs[n:2 * n]
+        f_AB = outputs[2 * n:].reshape(d, n)
+        is_defined = ~(np.isnan(f_A) | np.isnan(f_B) |
+                       np.any(np.isnan(f_AB), axis=0))
+        f_A, f_B, f_AB = f_A[is_defined], f_B[is_defined], f_AB[:, is_defined]
+        first_order, total = self.__estimate(f_A, f_B, f_AB)
+        # Resample the base samples with replacement, all resamples at once
+        resamples = self.__rng.integers(len(f_A), size=(no_of_resamples, len(f_A)))
+        first_orders, totals = self.__estimate(f_A[resamples], f_B[resamples],
+                                               f_AB[:, resamples])
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return SobolIndices(first_order,
+                            z * np.std(first_orders, axis=-1),
+                            total,
+                            z * np.std(totals, axis=-1),
+                            len(f_A))
+
+    @staticmethod
+    def __estimate(f_A, f_B, f_AB):
+        # f_A and f_B have shape (..., samples) and f_AB (variables, ..., samples)
+        variance = np.var(np.concatenate([f_A, f_B], axis=-1), axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            first_order = np.mean(f_B * (f_AB - f_A), axis=-1) / variance
+            total = 0.5 * np.mean((f_A - f_AB)**2, axis=-1) / variance
+        return first_order, total
+
+
+def summarise_indices(keys, indices_dict):
+    """
+    Returns a table of the first-order and total indices of every variable for each
+    output in indices_dict, most influential variables first.
+    """
+    rows = []
+    for output, indices in indices_dict.items():
+        rows.append(f'{output} ({indices.no_of_samples} base samples)')
+        rows.append(f'{"Variable":32}{"First order":>20}{"Total":>20}')
+        for i in np.argsort(-np.nan_to_num(indices.total, nan=-np.inf)):
+            rows.append(f'{keys[i]:32}'
+                        f'{indices.first_order[i]:>11.3f} ± {indices.first_order_conf[i]:<6.3f}'
+                        f'{indices.total[i]:>11.3f} ± {indices.total_conf[i]:.3f}')
+    return '\n'.join(rows)
@@ -0,0 +1,109 @@
+from typing import Dict
+import numpy as np
+
+
+class KNNClassifier:
+    """
+    Weighted k-nearest-neighbour estimate of the probability that a point is valid.
+    Variables are scaled to [0, 1] over the training points. At most
+    max_training_points are kept, half of them valid where possible, and each kept
+    point is weighted by how many training points of its class it stands for.
+    """
+
+    def __init__(self, k=8, max_training_points=2000, seed=None):
+        self.k = k
+        self.max_training_points = max_training_points
+        self.__rng = np.random.default_rng(seed)
+
+    def fit(self, points, is_valid):
+        points = np.asarray(points, dtype=float)
+        is_valid = np.asarray(is_valid, dtype=bool)
+        self.lower = points.min(axis=0, initial=np.inf)
+        self.scale = np.where(points.max(axis=0, initial=-np.inf) > self.lower,
+                              points.max(axis=0, initial=-np.inf) - self.lower, 1)
+        valid_indices = np.flatnonzero(is_valid)
+        invalid_indices = np.flatnonzero(~is_valid)
+        no_valid = min(len(valid_indices), self.max_training_points // 2)
+        no_invalid = min(len(invalid_indices),
+                         self.max_training_points - no_valid)
+        indices, weights = [], []
+        for class_indices, no_kept in [(valid_indices, no_valid), (invalid_indices, no_invalid)]:
+            indices.append(self.__rng.choice(
+                class_indices, no_kept, replace=False))
+            weights.append(np.full(no_kept, len(class_indices) / max(no_kept, 1)))
+        indices = np.concatenate(indices)
+        self.points = self.__normalise(points[indices])
+        self.is_valid = is_valid[indices]
+        self.weights = np.concatenate(weights)
+        self.__sq_norms = np.sum(self.points**2, axis=1)
+        return self
+
+    def predict_proba(self, points):
+        points = self.__normalise(np.asarray(points, dtype=float))
+        if not len(self.points):
+            return np.ones(len(points))
+        k = min(self.k, len(self.points))
+        # |x - y|^2 = |x|^2 + |y|^2 - 2 x.y as one matrix product
+        sq_distances = np.sum(points**2, axis=1)[:, None] + \
+            self.__sq_norms - 2 * points @ self.points.T
+        neighbours = np.argpartition(sq_distances, k - 1, axis=1)[:, :k]
+        weights = self.weights[neighbours]
+        return np.sum(weights * self.is_valid[neighbours], axis=1) / np.sum(weights, axis=1)
+
+    def __normalise(self, points):
+        return (points - self.lower) / self.scale
+
+
+class FeasibilityPrefilter:
+    """
+    Skips sweep points whose predicted probability of being valid is below threshold.
+    A random exploration fraction of all points is evaluated regardless, and the
+    valid points among them give an unbiased estimate of the recall kept.
+    """
+
+    def __init__(self,
+                 model: KNNClassifier,
+                 keys,
+                 threshold=0.05,
+                 exploration=0.05,
+                 seed=None):
+        self.model = model
+        self.keys = list(keys)
+        self.threshold = threshold
+        self.exploration = exploration
+        self.no_skipped = 0
+        self.no_explored_valid = 0
+        self.no_explored_valid_kept = 0
+        self.__rng = np.random.default_rng(seed)
+        # Whether each explored point would have passed the threshold
+        self.__explored: Dict[str, bool] = {}
+
+    def filter(self, chunk):
+        if not chunk:
+            return chunk
+        points = np.array([[var_dict[k] for k in self.keys]
+                          for _, var_dict in chunk])
+        is_kept = self.model.predict_proba(points) >= self.threshold
+        is_explored = self.__rng.random(len(chunk)) < self.exploration
+        for (var_val_hash, _), kept, explored in zip(chunk, is_kept, is_explored):
+            if explored:
+                self.__explored[var_val_hash] = bool(kept)
+        is_evaluated = is_kept | is_explored
+        self.no_skipped += int(np.sum(~is_evaluated))
+        return [item for item, evaluated in zip(chunk, is_evaluated) if evaluated]
+
+    def record(self, var_val_hash, is_valid):
+        kept = self.__explored.pop(var_val_hash, None)
+        if kept is not None and is_valid:
+            self.no_explored_valid += 1
+            self.no_explored_valid_kept += kept
+
+    @property
+    def recall(self):
+        if not self.no_explored_valid:
+            return float('nan')
+        return self.no_explored_valid_kept / self.no_explored_valid
+
+    def summary(self):
+        return (f'Prefilter skipped {self.no_skipped} points, estimated recall '
+                f'{self.recall:.1%} from {self.no_explored_valid} valid explored points')
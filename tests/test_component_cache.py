@@ -0,0 +1,73 @@
+import pytest
+import engine_iteration as ei
+from src.turbomach_analyser import Engine, ComponentCache
+
+# A plain dict table raises for HPT stages outside its temperatures
+YIELD_STRENGTH = {300: 1050e6, 600: 1000e6, 800: 800e6}
+VAR_DICT = {'hpt_min_blade_length': 0.019,
+            'hpt_work_coefficient': 1.76,
+            'hpt_angular_velocity': 750,
+            'lpc_diffusion_factor': 0.1,
+            'hpc_diffusion_factor': 0.1,
+            'hpt_lift_coeff': 0.7,
+            'lpc_reaction_mean': 0.3,
+            'hpc_reaction_mean': 0.575}
+
+
+def build(component_cache, **var_dict):
+    return Engine(**ei.get_constants(),
+                  **{**ei.get_engine_constants(), 'hpt_yield_strength_dict': YIELD_STRENGTH},
+                  **{**VAR_DICT, **var_dict},
+                  fail_fast=True,
+                  component_cache=component_cache)
+
+
+def test_engine_raises_without_cache():
+    with pytest.raises(ValueError):
+        build(None)
+
+
+def outcome(component_cache, **var_dict):
+    try:
+        return build(component_cache, **var_dict).is_valid
+    except ValueError:
+        return 'error'
+
+
+def test_cached_turbine_that_raised_raises_again():
+    cache = ComponentCache()
+    with pytest.raises(ValueError):
+        build(cache)
+    # Same HPT arguments, so the HPT comes from the cache
+    for lpc_reaction_mean in [0.3, 0.55, 0.8]:
+        for hpc_reaction_mean in [0.35, 0.575, 0.8]:
+            var_dict = dict(lpc_reaction_mean=lpc_reaction_mean, hpc_reaction_mean=hpc_reaction_mean)
+            assert outcome(cache, **var_dict) == outcome(None, **var_dict)
+
+
+def test_check_components_shares_cache():
+    cache = ComponentCache()
+    kwargs = dict(**ei.get_constants(),
+                  **{**ei.get_engine_constants(), 'hpt_yield_strength_dict': YIELD_STRENGTH},
+                  **VAR_DICT,
+                  fail_fast=True,
+                  component_cache=cache)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            Engine.check_components(['hpt'], **kwargs)
+    with pytest.raises(ValueError):
+        build(cache)
+
+
+def test_failed_component_is_rebuilt():
+    cache = ComponentCache()
+    with pytest.raises(ValueError):
+        build(cache)
+    misses = cache.cache_info().misses
+    for i in range(1, 3):
+        with pytest.raises(ValueError):
+            build(cache)
+        # Only the HPT, whose stages failed, is built again
+        assert cache.cache_info().misses == misses + i
+    assert cache.cache_info().currsize == misses
+
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import engine_iteration as ei
+from src.turbomach_analyser import Engine
+from src.utils import dual
+
+# One of the valid designs of the shipped sweep grid
+VAR_DICT = {'hpt_min_blade_length': 0.021,
+            'hpt_work_coefficient': 2.0,
+            'hpt_angular_velocity': 750.0,
+            'lpc_diffusion_factor': 0.1,
+            'hpc_diffusion_factor': 0.1,
+            'hpt_lift_coeff': 0.8,
+            'lpc_reaction_mean': 0.3,
+            'hpc_reaction_mean': 0.575}
+
+
+def get_central_differences(function, var_dict, relative_step=1e-6):
+    gradients = {}
+    for key, value in var_dict.items():
+        step = relative_step * abs(value)
+        gradients[key] = (function({**var_dict, key: value + step}) -
+                          function({**var_dict, key: value - step})) / (2 * step)
+    return gradients
+
+
+def test_ufunc_gradients_match_central_differences():
+    def function(var_dict):
+        x, y = var_dict['x'], var_dict['y']
+        z = np.sqrt(x) * np.exp(-y) / (1 + x**2) + np.arctan(x * y)
+        z = np.where(z > 0, np.max(np.linspace(z, 2 * z, 3)), -z)
+        return np.interp(z, [0, 1, 2], [0, 3, 4]) + np.sum(np.stack([x, y])**2)
+
+    var_dict = {'x': 0.7, 'y': 1.3}
+    z = function(dual.variables(var_dict))
+    expected = get_central_differences(lambda v: float(function(v)), var_dict)
+    assert dual.get_gradient_dict(z, list(var_dict)) == pytest.approx(expected, rel=1e-6)
+
+
+def test_engine_gradients_match_central_differences():
+    def get_engine(var_dict):
+        return Engine(**ei.get_constants(), **ei.get_engine_constants(), **var_dict)
+
+    score, score_gradient, margins, margin_gradients = ei.get_engine_gradients(VAR_DICT)
+    assert get_engine(VAR_DICT).is_valid and margin_gradients
+    assert score == pytest.approx(get_engine(VAR_DICT).score)
+    assert score_gradient == pytest.approx(
+        get_central_differences(lambda v: get_engine(v).score, VAR_DICT), rel=1e-4, abs=1e-8)
+    for code, margin_gradient in margin_gradients.items():
+        expected = get_central_differences(lambda v: get_engine(v).get_constraint_margins()[code], VAR_DICT)
+        assert margin_gradient == pytest.approx(expected, rel=1e-4, abs=1e-6), code
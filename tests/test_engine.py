@@ -0,0 +1,25 @@
+import pytest
+import engine_design as ed
+import engine_iteration as ei
+from src.turbomach_analyser import Engine
+
+
+def test_component_only_engine_has_no_score():
+    engine = Engine(**ei.get_constants(),
+                    **ei.get_engine_constants(),
+                    **ed.get_engine_variables(),
+                    component_names=['lpc'])
+    assert engine.hpt is None
+    with pytest.raises(ValueError, match='only has the components'):
+        engine.score
+    with pytest.raises(ValueError, match='only has the components'):
+        engine.get_constraint_margins()
+
+
+def test_check_components_matches_component_rejection():
+    is_valid, rejection = Engine.check_components(['lpc'],
+                                                  **ei.get_constants(),
+                                                  **ei.get_engine_constants(),
+                                                  **ed.get_engine_variables())
+    assert not is_valid
+    assert rejection.startswith('LPC.')
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from src.utils.engine_archive import MAGIC, EngineArchive
+
+
+def get_engine(score):
+    return {'score': score,
+            'hpt': {'no_of_stages': 2,
+                    'stages': [{'work_coeff': np.array([1.5, 1.6]), 'rejected': False},
+                               {'work_coeff': np.array([1.7, 1.8]), 'rejected': True}]}}
+
+
+def assert_engine_equal(engine_dict, score):
+    assert engine_dict['score'] == score
+    assert engine_dict['hpt']['no_of_stages'] == 2
+    np.testing.assert_array_equal(engine_dict['hpt']['stages'][1]['work_coeff'], [1.7, 1.8])
+
+
+def test_append_after_garbage_tail(tmp_path):
+    path = str(tmp_path / 'engines.jed')
+    with EngineArchive(path, 'w') as archive:
+        archive.add('a', get_engine(0.5), score=0.5)
+    # An append cut short leaves blocks, and possibly the magic, after the trailer
+    with open(path, 'ab') as file:
+        file.write(b'{"values":{"score":' + MAGIC + b'\x00\x01')
+    with EngineArchive(path, 'a') as archive:
+        assert archive.names() == ['a']
+        archive.add('b', get_engine(0.75), score=0.75)
+    with EngineArchive(path) as archive:
+        assert archive.names() == ['a', 'b']
+        assert archive.attributes('b') == {'score': 0.75}
+        assert_engine_equal(archive.load('a'), 0.5)
+        assert_engine_equal(archive.load('b'), 0.75)
+
+
+def test_archive_without_trailer_raises(tmp_path):
+    path = str(tmp_path / 'engines.jed')
+    with open(path, 'wb') as file:
+        file.write(MAGIC + b'\x00' * 64)
+    with pytest.raises(ValueError, match='was not closed'):
+        EngineArchive(path)
@@ -0,0 +1,55 @@
+from collections import Counter
+import glob
+import itertools
+import json
+import numpy as np
+import engine_iteration as ei
+from src.turbomach_analyser import Engine, EngineBatch
+
+VAR_RANGES = {
+    'hpt_min_blade_length': [0.019, 0.023],
+    'hpt_work_coefficient': [1.76, 2],
+    'hpt_angular_velocity': [600, 900],
+    'lpc_diffusion_factor': [0.1, 0.2],
+    'hpc_diffusion_factor': [0.1, 0.2],
+    'hpt_lift_coeff': [0.7, 0.9],
+    'lpc_reaction_mean': [0.3, 0.55, 0.8],
+    'hpc_reaction_mean': [0.35, 0.575, 0.8],
+}
+
+
+def get_var_dicts():
+    return [dict(zip(VAR_RANGES, p)) for p in itertools.product(*VAR_RANGES.values())]
+
+
+def test_batch_rejections_match_engine():
+    var_dicts = get_var_dicts()
+    engines = EngineBatch(**ei.get_constants(),
+                          **ei.get_engine_constants(),
+                          **{k: np.array([d[k] for d in var_dicts]) for k in VAR_RANGES})
+    rejections = [Engine(**ei.get_constants(),
+                         **ei.get_engine_constants(),
+                         **var_dict).rejection
+                  for var_dict in var_dicts]
+    assert list(engines.rejection) == rejections
+    assert list(engines.is_valid) == [rejection is None for rejection in rejections]
+    # The grid should exercise more than one rule
+    assert len(set(rejections)) > 2
+
+
+def test_batch_run_saves_rejections(tmp_path):
+    tried_vars_dir = tmp_path / 'tried'
+    valid_vars_dir = tmp_path / 'valid'
+    tried_vars_dir.mkdir()
+    valid_vars_dir.mkdir()
+    ei.complete_run(str(tried_vars_dir), str(valid_vars_dir), VAR_RANGES, batch_size=64)
+    [path] = glob.glob(str(tried_vars_dir / '*.rejections.json'))
+    with open(path) as file:
+        saved = json.load(file)
+    rejections = Counter(Engine(**ei.get_constants(),
+                                **ei.get_engine_constants(),
+                                **var_dict).rejection
+                         for var_dict in get_var_dicts())
+    del rejections[None]
+    assert saved['no_evaluated'] == len(get_var_dicts())
+    assert saved['reasons'] == dict(rejections)
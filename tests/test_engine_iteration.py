@@ -0,0 +1,40 @@
+import numpy as np
+import engine_iteration as ei
+from src.utils import result_store as rs
+
+VAR_RANGES = {
+    'hpt_min_blade_length': [0.019, 0.021],
+    'hpt_work_coefficient': [1.88, 2.0],
+    'hpt_angular_velocity': [750.0, 900.0],
+    'lpc_diffusion_factor': [0.1, 0.15],
+    'hpc_diffusion_factor': [0.1, 0.15],
+    'hpt_lift_coeff': [0.7, 0.8],
+    'lpc_reaction_mean': [0.3, 0.55, 0.8],
+    'hpc_reaction_mean': [0.35, 0.575, 0.8],
+}
+
+
+def sweep(tmp_path, **kwargs):
+    tried_vars_dir = tmp_path / 'tried'
+    valid_vars_dir = tmp_path / 'valid'
+    tried_vars_dir.mkdir(parents=True)
+    valid_vars_dir.mkdir(parents=True)
+    ei.complete_run(str(tried_vars_dir), str(valid_vars_dir), VAR_RANGES, **kwargs)
+    [tried_vars_path] = tried_vars_dir.glob('*.results')
+    [valid_vars_path] = valid_vars_dir.glob('*.results')
+    return rs.load_results(str(tried_vars_path))[1], rs.load_results(str(valid_vars_path))[1]
+
+
+def test_factorized_run_records_the_whole_grid(tmp_path):
+    tried_columns, valid_columns = sweep(tmp_path / 'full')
+    factorized_tried_columns, factorized_valid_columns = sweep(tmp_path / 'factorized', factorized=True)
+    assert len(factorized_tried_columns[rs.VALIDITY_KEY]) == ei.get_no_iterations(VAR_RANGES)
+    # The grid should have valid engines for the comparison to mean anything
+    assert np.any(valid_columns[rs.SCORE_KEY])
+    for columns, factorized_columns in [(tried_columns, factorized_tried_columns),
+                                        (valid_columns, factorized_valid_columns)]:
+        order = np.lexsort([columns[k] for k in VAR_RANGES])
+        factorized_order = np.lexsort([factorized_columns[k] for k in VAR_RANGES])
+        assert columns.keys() == factorized_columns.keys()
+        for key in columns:
+            np.testing.assert_array_equal(columns[key][order], factorized_columns[key][factorized_order])
@@ -0,0 +1,46 @@
+from src.utils.journal import SweepJournal
+
+KEY_HASH = 'a,b'
+
+
+def get_journal(tmp_path):
+    return SweepJournal(str(tmp_path / 'sweep.journal'),
+                        KEY_HASH,
+                        str(tmp_path / 'tried.results'),
+                        str(tmp_path / 'valid.results'),
+                        flush_every=1)
+
+
+def test_replay_drops_truncated_last_record(tmp_path):
+    journal = get_journal(tmp_path)
+    journal.append('1,2', True, 0.5)
+    journal.append('1,3', False)
+    journal.close()
+    # A crash cuts the last record short
+    with open(journal.path, 'a') as file:
+        file.write('1,1,4,0.')
+    replayed_journal = get_journal(tmp_path)
+    assert replayed_journal.replay() == ({'1,2', '1,3'}, {'1,2,0.5'})
+    assert replayed_journal.no_of_records == 2
+
+
+def test_append_after_truncated_record_resumes_journal(tmp_path):
+    journal = get_journal(tmp_path)
+    journal.append('1,2', True, 0.5)
+    journal.close()
+    with open(journal.path, 'a') as file:
+        file.write('0,1,')
+    resumed_journal = get_journal(tmp_path)
+    resumed_journal.replay()
+    resumed_journal.append('1,4', False)
+    resumed_journal.close()
+    assert get_journal(tmp_path).replay() == ({'1,2', '1,4'}, {'1,2,0.5'})
+
+
+def test_replay_ignores_journal_of_other_variables(tmp_path):
+    journal = get_journal(tmp_path)
+    journal.append('1,2', False)
+    journal.close()
+    other_journal = SweepJournal(journal.path, 'a,c', journal.tried_vars_path, journal.valid_vars_path)
+    assert other_journal.replay() == (set(), set())
+    assert other_journal.no_of_records == 0
@@ -0,0 +1,70 @@
+import os
+import shutil
+import numpy as np
+import engine_iteration as ei
+from src.utils import formatter as f, result_store as rs
+from tests.test_engine_iteration import VAR_RANGES, sweep
+
+KEY_HASH = 'a,b'
+TRIED_VAR_VALS_HASH_SET = {'0.1,2.0', '0.2,2.0', '0.3,2.5'}
+VALID_VAR_VALS_HASH_SET = {'0.2,2.0,0.75'}
+
+
+def test_save_and_load_results(tmp_path):
+    path = str(tmp_path / 'store.results')
+    columns = {'a': np.array([0.1, 0.2]), 'b': np.array([2.0, 2.5]), rs.SCORE_KEY: np.array([np.nan, 0.75])}
+    rs.save_results(path, KEY_HASH, columns)
+    key_hash, loaded_columns = rs.load_results(path)
+    assert key_hash == KEY_HASH
+    assert loaded_columns.keys() == columns.keys()
+    for key, column in columns.items():
+        np.testing.assert_array_equal(loaded_columns[key], column)
+
+
+def test_load_results_after_interrupted_swap(tmp_path):
+    path = str(tmp_path / 'store.results')
+    rs.save_results(path, KEY_HASH, {'a': np.array([0.1]), 'b': np.array([2.0])})
+    # A crash between the two renames leaves only the old store
+    os.replace(path, f'{path}.old')
+    assert rs.is_result_store(path)
+    _, columns = rs.load_results(path)
+    np.testing.assert_array_equal(columns['a'], [0.1])
+    rs.save_results(path, KEY_HASH, {'a': np.array([0.3]), 'b': np.array([2.5])})
+    assert not os.path.exists(f'{path}.old')
+    _, columns = rs.load_results(path)
+    np.testing.assert_array_equal(columns['a'], [0.3])
+
+
+def test_hashed_vals_round_trip(tmp_path):
+    tried_path, valid_path = str(tmp_path / 'tried.results'), str(tmp_path / 'valid.results')
+    rs.hashed_vals_to_results(KEY_HASH, TRIED_VAR_VALS_HASH_SET, VALID_VAR_VALS_HASH_SET, tried_path, valid_path)
+    _, tried_columns = rs.load_results(tried_path)
+    assert tried_columns[rs.VALIDITY_KEY].sum() == 1
+    assert rs.results_to_hashed_vals(tried_path) == (KEY_HASH, TRIED_VAR_VALS_HASH_SET)
+    assert rs.results_to_hashed_vals(valid_path) == (f'{KEY_HASH},{rs.SCORE_KEY}', VALID_VAR_VALS_HASH_SET)
+
+
+def test_csv_files_are_migrated_to_result_stores(tmp_path):
+    tried_columns, valid_columns = sweep(tmp_path)
+    # Replace the stores with the csv files of an earlier run
+    for vars_dir in ['tried', 'valid']:
+        [path] = (tmp_path / vars_dir).glob('*.results')
+        key_hash, var_vals_hash_set = rs.results_to_hashed_vals(str(path))
+        f.hashed_vals_to_csv(key_hash, var_vals_hash_set, f'{os.path.splitext(path)[0]}.csv')
+        shutil.rmtree(path)
+    [csv_path] = (tmp_path / 'valid').glob('*.csv')
+    _, csv_columns = rs.load_results(str(csv_path))
+    assert len(csv_columns[rs.SCORE_KEY]) == len(valid_columns[rs.SCORE_KEY])
+    rejections_path = next((tmp_path / 'tried').glob('*.rejections.json'))
+    os.remove(rejections_path)
+    ei.complete_run(str(tmp_path / 'tried'), str(tmp_path / 'valid'), VAR_RANGES)
+    # Every point was already tried, so none is evaluated again
+    assert not rejections_path.exists()
+    for vars_dir, columns in [('tried', tried_columns), ('valid', valid_columns)]:
+        [path] = (tmp_path / vars_dir).glob('*.results')
+        _, migrated_columns = rs.load_results(str(path))
+        assert migrated_columns.keys() == columns.keys()
+        order = np.lexsort([columns[k] for k in VAR_RANGES])
+        migrated_order = np.lexsort([migrated_columns[k] for k in VAR_RANGES])
+        for key in columns:
+            np.testing.assert_array_equal(migrated_columns[key][migrated_order], columns[key][order])
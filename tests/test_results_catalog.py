@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from src.utils import result_store as rs
+from src.utils.results_catalog import ResultsCatalog
+
+KEY_HASH = 'a,b'
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    a, b = rng.random(200), rng.random(200)
+    scores = np.where(rng.random(200) < 0.3, rng.random(200), np.nan)
+    path = str(tmp_path / 'a_b.results')
+    rs.save_results(path, KEY_HASH, {'a': a, 'b': b,
+                                     rs.SCORE_KEY: scores,
+                                     rs.VALIDITY_KEY: ~np.isnan(scores)})
+    return path, a, b, scores
+
+
+def test_top_k_within_range(store):
+    path, a, b, scores = store
+    with ResultsCatalog() as catalog:
+        table = catalog.ingest(path)
+        assert table == 'tried_a_b'
+        rows = catalog.top(table, k=5, a=(0.2, 0.6))
+    is_selected = ~np.isnan(scores) & (a >= 0.2) & (a <= 0.6)
+    expected = np.sort(scores[is_selected])[::-1][:5]
+    assert [row[rs.SCORE_KEY] for row in rows] == expected.tolist()
+    assert all(0.2 <= row['a'] <= 0.6 for row in rows)
+
+
+def test_range_queries(store):
+    path, a, b, scores = store
+    with ResultsCatalog() as catalog:
+        table = catalog.ingest(path)
+        rows = catalog.query(table, order_by='b', descending=False, valid_only=False, a=(None, 0.5), b=(0.25, None))
+        assert catalog.count(table, valid_only=False, a=(None, 0.5), b=(0.25, None)) == len(rows)
+        assert catalog.count(table) == np.sum(~np.isnan(scores))
+        ranges = catalog.get_ranges(table)
+        with pytest.raises(KeyError):
+            catalog.query(table, c=(0, 1))
+    is_selected = (a <= 0.5) & (b >= 0.25)
+    assert [row['b'] for row in rows] == np.sort(b[is_selected]).tolist()
+    assert ranges['a'] == (a[~np.isnan(scores)].min(), a[~np.isnan(scores)].max())
+    assert ranges[rs.SCORE_KEY] == (np.nanmin(scores), np.nanmax(scores))
+
+
+def test_unchanged_store_is_not_ingested_again(store, tmp_path):
+    path, *_ = store
+    with ResultsCatalog(str(tmp_path / 'catalog.db')) as catalog:
+        table = catalog.ingest(path)
+    with ResultsCatalog(str(tmp_path / 'catalog.db')) as catalog:
+        assert catalog.tables() == [table]
+        assert catalog.ingest(path) == table
+        assert catalog.count(table, valid_only=False) == 200